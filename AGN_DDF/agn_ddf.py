@@ -1,18 +1,16 @@
 import numpy as np
-import matplotlib.pylab as plt
-import healpy as hp
-from lsst.sims.featureScheduler.modelObservatory import Model_observatory
 from lsst.sims.featureScheduler.schedulers import Core_scheduler, simple_filter_sched
 from lsst.sims.featureScheduler.utils import standard_goals, create_season_offset
 import lsst.sims.featureScheduler.basis_functions as bf
 from lsst.sims.featureScheduler.surveys import (Greedy_survey,
                                                 Blob_survey)
-from lsst.sims.featureScheduler import sim_runner
 import lsst.sims.featureScheduler.detailers as detailers
 import sys
 import subprocess
 import os
 import argparse
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+from run_utils import sim_runner, add_runner_args, runner_kwargs, get_observatory, cached_footprint
 from lsst.sims.featureScheduler.surveys import Deep_drilling_survey
 import lsst.sims.featureScheduler.basis_functions as basis_functions
 
@@ -209,7 +207,7 @@ def gen_greedy_surveys(nside=32, nexp=1, exptime=30., filters=['r', 'i', 'z', 'y
                            'seed': 42, 'camera': 'LSST', 'dither': True,
                            'survey_name': 'greedy'}
 
-    footprints = standard_goals(nside=nside)
+    footprints = cached_footprint(standard_goals, nside=nside)
     sum_footprints = 0
     for key in footprints:
         sum_footprints += np.sum(footprints[key])
@@ -303,7 +301,7 @@ def generate_blobs(nside, nexp=1, exptime=30., filter1s=['u', 'u', 'u', 'g', 'r'
                           'smoothing_kernel': None, 'nside': nside, 'seed': 42, 'dither': True,
                           'twilight_scale': True}
 
-    footprints = standard_goals(nside=nside)
+    footprints = cached_footprint(standard_goals, nside=nside)
     sum_footprints = 0
     for key in footprints:
         sum_footprints += np.sum(footprints[key])
@@ -394,18 +392,18 @@ def generate_blobs(nside, nexp=1, exptime=30., filter1s=['u', 'u', 'u', 'g', 'r'
 
 
 def run_sched(surveys, survey_length=365.25, nside=32, fileroot='baseline_', verbose=False,
-              extra_info=None, illum_limit=15.):
+              extra_info=None, illum_limit=15., **kwargs):
     years = np.round(survey_length/365.25)
     scheduler = Core_scheduler(surveys, nside=nside)
     n_visit_limit = None
     filter_sched = simple_filter_sched(illum_limit=illum_limit)
-    observatory = Model_observatory(nside=nside)
+    observatory = get_observatory(nside=nside)
     observatory, scheduler, observations = sim_runner(observatory, scheduler,
                                                       survey_length=survey_length,
                                                       filename=fileroot+'%iyrs.db' % years,
                                                       delete_past=True, n_visit_limit=n_visit_limit,
                                                       verbose=verbose, extra_info=extra_info,
-                                                      filter_scheduler=filter_sched)
+                                                      filter_scheduler=filter_sched, **kwargs)
 
 
 if __name__ == "__main__":
@@ -417,6 +415,7 @@ if __name__ == "__main__":
     parser.add_argument("--outDir", type=str, default="")
     parser.add_argument("--maxDither", type=float, default=0.7, help="Dither size for DDFs (deg)")
     parser.add_argument("--moon_illum_limit", type=float, default=15., help="illumination limit to remove u-band")
+    add_runner_args(parser)
 
     args = parser.parse_args()
     survey_length = args.survey_length  # Days
@@ -456,4 +455,4 @@ if __name__ == "__main__":
     surveys = [ddfs, blobs, greedy]
     run_sched(surveys, survey_length=survey_length, verbose=verbose,
               fileroot=os.path.join(outDir, fileroot+file_end), extra_info=extra_info,
-              nside=nside, illum_limit=illum_limit)
+              nside=nside, illum_limit=illum_limit, **runner_kwargs(args))
@@ -1,22 +1,22 @@
 import numpy as np
-import matplotlib.pylab as plt
-import healpy as hp
-from lsst.sims.featureScheduler.modelObservatory import Model_observatory
 from lsst.sims.featureScheduler.schedulers import Core_scheduler
 from lsst.sims.featureScheduler.utils import standard_goals, create_season_offset, ra_dec_hp_map
 import lsst.sims.featureScheduler.basis_functions as bf
 from lsst.sims.featureScheduler.surveys import (generate_dd_surveys, Greedy_survey,
                                                 Blob_survey)
-from lsst.sims.featureScheduler import sim_runner
 import lsst.sims.featureScheduler.detailers as detailers
 import sys
 import subprocess
 import os
 import argparse
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+from run_utils import (sim_runner, add_runner_args, runner_kwargs, get_observatory, footprint_cache,
+                       alternating_maps)
 
 from lsst.utils import getPackageDir
 
 
+@footprint_cache
 def big_sky_dust(nside=32, weights={'u': [0.31, 0.15, False], 'g': [0.44, 0.15],
                  'r': [1., 0.3], 'i': [1., 0.3], 'z': [0.9, 0.3],
                  'y': [0.9, 0.3, False]}, dust_limit=0.19):
@@ -62,83 +62,10 @@ def wfd_half(target_map=None):
     if target_map is None:
         sg = big_sky_dust()
         target_map = sg['r'] + 0
-    wfd_pix = np.where(target_map == 1)[0]
-    wfd_map = target_map*0
-    wfd_map[wfd_pix] = 1
-    wfd_halves = slice_wfd_area(2, {'r': wfd_map}, scale_down_factor=0)
-    result = [-wfd_halves[0]['r'], -wfd_halves[1]['r']]
+    result = list(alternating_maps(target_map, nslice=2))
     return result
 
 
-def slice_wfd_area(nslice, target_map, scale_down_factor=0.2):
-    """
-    Slice the WFD area into even dec bands
-    """
-    # Make it so things still sum to one.
-    scale_up_factor = nslice - scale_down_factor*(nslice-1)
-
-    wfd = target_map['r'] * 0
-    wfd_indices = np.where(target_map['r'] == 1)[0]
-    wfd[wfd_indices] = 1
-    wfd_accum = np.cumsum(wfd)
-    split_wfd_indices = np.floor(np.max(wfd_accum)/nslice*(np.arange(nslice)+1)).astype(int)
-    split_wfd_indices = split_wfd_indices.tolist()
-    split_wfd_indices = [0] + split_wfd_indices
-
-    all_scaled_down = {}
-    for filtername in target_map:
-        all_scaled_down[filtername] = target_map[filtername]+0
-        all_scaled_down[filtername][wfd_indices] *= scale_down_factor
-
-    scaled_maps = []
-    for i in range(len(split_wfd_indices)-1):
-        new_map = {}
-        indices = wfd_indices[split_wfd_indices[i]:split_wfd_indices[i+1]]
-        for filtername in all_scaled_down:
-            new_map[filtername] = all_scaled_down[filtername] + 0
-            new_map[filtername][indices] = target_map[filtername][indices]*scale_up_factor
-        scaled_maps.append(new_map)
-
-    return scaled_maps
-
-
-def slice_wfd_area_quad(target_map, scale_down_factor=0.2):
-    """
-    Make a fancy 4-stripe target map
-    """
-    # Make it so things still sum to one.
-    nslice = 2
-    scale_up_factor = nslice - scale_down_factor*(nslice-1)
-    nslice2 = nslice * 2
-
-    wfd = target_map['r'] * 0
-    wfd_indices = np.where(target_map['r'] == 1)[0]
-    wfd[wfd_indices] = 1
-    wfd_accum = np.cumsum(wfd)
-    split_wfd_indices = np.floor(np.max(wfd_accum)/nslice2*(np.arange(nslice2)+1)).astype(int)
-    split_wfd_indices = split_wfd_indices.tolist()
-    split_wfd_indices = [0] + split_wfd_indices
-
-    all_scaled_down = {}
-    for filtername in target_map:
-        all_scaled_down[filtername] = target_map[filtername]+0
-        all_scaled_down[filtername][wfd_indices] *= scale_down_factor
-
-    scaled_maps = []
-    for i in range(nslice):
-        new_map = {}
-        indices = wfd_indices[split_wfd_indices[i]:split_wfd_indices[i+1]]
-        for filtername in all_scaled_down:
-            new_map[filtername] = all_scaled_down[filtername] + 0
-            new_map[filtername][indices] = target_map[filtername][indices]*scale_up_factor
-        indices = wfd_indices[split_wfd_indices[i+2]:split_wfd_indices[i+2+1]]
-        for filtername in all_scaled_down:
-            new_map[filtername][indices] = target_map[filtername][indices]*scale_up_factor
-        scaled_maps.append(new_map)
-
-    return scaled_maps
-
-
 def gen_greedy_surveys(nside=32, footprints=None,
                        nexp=1, exptime=30., filters=['r', 'i', 'z', 'y'],
                        camera_rot_limits=[-80., 80.],
@@ -374,16 +301,17 @@ def generate_blobs(nside, nexp=1, footprints=None,
 
 
 def run_sched(surveys, survey_length=365.25, nside=32, fileroot='baseline_', verbose=False,
-              extra_info=None):
+              extra_info=None, observatory=None, **kwargs):
     years = np.round(survey_length/365.25)
     scheduler = Core_scheduler(surveys, nside=nside)
     n_visit_limit = None
-    observatory = Model_observatory(nside=nside)
+    if observatory is None:
+        observatory = get_observatory(nside=nside)
     observatory, scheduler, observations = sim_runner(observatory, scheduler,
                                                       survey_length=survey_length,
                                                       filename=fileroot+'%iyrs.db' % years,
                                                       delete_past=True, n_visit_limit=n_visit_limit,
-                                                      verbose=verbose, extra_info=extra_info)
+                                                      verbose=verbose, extra_info=extra_info, **kwargs)
 
 
 if __name__ == "__main__":
@@ -394,6 +322,7 @@ if __name__ == "__main__":
     parser.add_argument("--survey_length", type=float, default=365.25*10)
     parser.add_argument("--outDir", type=str, default="")
     parser.add_argument("--maxDither", type=float, default=0.7, help="Dither size for DDFs (deg)")
+    add_runner_args(parser)
 
     args = parser.parse_args()
     survey_length = args.survey_length  # Days
@@ -423,7 +352,7 @@ if __name__ == "__main__":
     file_end = 'v1.4_'
 
     # Mark position of the sun at the start of the survey. Usefull for rolling cadence.
-    observatory = Model_observatory(nside=nside)
+    observatory = get_observatory(nside=nside)
     conditions = observatory.return_conditions()
     sun_ra_0 = conditions.sunRA  # radians
 
@@ -442,4 +371,5 @@ if __name__ == "__main__":
     surveys = [ddfs, blobs, greedy]
     run_sched(surveys, survey_length=survey_length, verbose=verbose,
               fileroot=os.path.join(outDir, fileroot+file_end), extra_info=extra_info,
-              nside=nside)
+              nside=nside, observatory=observatory,
+              **runner_kwargs(args))
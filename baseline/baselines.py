@@ -1,25 +1,24 @@
 import numpy as np
-import matplotlib.pylab as plt
-import healpy as hp
-from lsst.sims.featureScheduler.modelObservatory import Model_observatory
 from lsst.sims.featureScheduler.schedulers import Core_scheduler, simple_filter_sched
 from lsst.sims.featureScheduler.utils import standard_goals, create_season_offset
 import lsst.sims.featureScheduler.basis_functions as bf
 from lsst.sims.featureScheduler.surveys import (generate_dd_surveys, Greedy_survey,
                                                 Blob_survey)
-from lsst.sims.featureScheduler import sim_runner
 import lsst.sims.featureScheduler.detailers as detailers
 import sys
 import subprocess
 import os
 import argparse
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+from run_utils import (sim_runner, add_runner_args, runner_kwargs, get_observatory, cached_footprint,
+                       multires_bf, slew_table, blob_slew_params)
 
 
 def gen_greedy_surveys(nside=32, nexp=1, exptime=30., filters=['r', 'i', 'z', 'y'],
                        camera_rot_limits=[-80., 80.],
                        shadow_minutes=60., max_alt=76., moon_distance=30., ignore_obs='DD',
                        m5_weight=3., footprint_weight=0.3, slewtime_weight=3.,
-                       stayfilter_weight=3.):
+                       stayfilter_weight=3., coarse_nside=None):
     """
     Make a quick set of greedy surveys
 
@@ -56,6 +55,8 @@ def gen_greedy_surveys(nside=32, nexp=1, exptime=30., filters=['r', 'i', 'z', 'y
         The weight on the slewtime basis function
     stayfilter_weight : float (3.)
         The weight on basis function that tries to stay avoid filter changes.
+    coarse_nside : int (None)
+        If set, compute the depth, slewtime and mask basis functions at this coarser nside.
     """
     # Define the extra parameters that are used in the greedy survey. I
     # think these are fairly set, so no need to promote to utility func kwargs
@@ -63,7 +64,7 @@ def gen_greedy_surveys(nside=32, nexp=1, exptime=30., filters=['r', 'i', 'z', 'y
                            'seed': 42, 'camera': 'LSST', 'dither': True,
                            'survey_name': 'greedy'}
 
-    footprints = standard_goals(nside=nside)
+    footprints = cached_footprint(standard_goals, nside=nside)
     sum_footprints = 0
     for key in footprints:
         sum_footprints += np.sum(footprints[key])
@@ -73,20 +74,23 @@ def gen_greedy_surveys(nside=32, nexp=1, exptime=30., filters=['r', 'i', 'z', 'y
 
     for filtername in filters:
         bfs = []
-        bfs.append((bf.M5_diff_basis_function(filtername=filtername, nside=nside), m5_weight))
+        bfs.append((multires_bf(bf.M5_diff_basis_function, nside=nside, coarse_nside=coarse_nside,
+                                filtername=filtername), m5_weight))
         bfs.append((bf.Footprint_basis_function(filtername=filtername,
                                                 footprint=footprints[filtername],
                                                 out_of_bounds_val=np.nan, nside=nside,
                                                 all_footprints_sum=sum_footprints), footprint_weight))
-        bfs.append((bf.Slewtime_basis_function(filtername=filtername, nside=nside), slewtime_weight))
+        bfs.append((multires_bf(bf.Slewtime_basis_function, nside=nside, coarse_nside=coarse_nside,
+                                filtername=filtername), slewtime_weight))
         bfs.append((bf.Strict_filter_basis_function(filtername=filtername), stayfilter_weight))
         # Masks, give these 0 weight
-        bfs.append((bf.Zenith_shadow_mask_basis_function(nside=nside, shadow_minutes=shadow_minutes,
-                                                         max_alt=max_alt), 0))
-        bfs.append((bf.Moon_avoidance_basis_function(nside=nside, moon_distance=moon_distance), 0))
+        bfs.append((multires_bf(bf.Zenith_shadow_mask_basis_function, nside=nside, coarse_nside=coarse_nside,
+                                shadow_minutes=shadow_minutes, max_alt=max_alt), 0))
+        bfs.append((multires_bf(bf.Moon_avoidance_basis_function, nside=nside, coarse_nside=coarse_nside,
+                                moon_distance=moon_distance), 0))
 
         bfs.append((bf.Filter_loaded_basis_function(filternames=filtername), 0))
-        bfs.append((bf.Planet_mask_basis_function(nside=nside), 0))
+        bfs.append((multires_bf(bf.Planet_mask_basis_function, nside=nside, coarse_nside=coarse_nside), 0))
 
         weights = [val[1] for val in bfs]
         basis_functions = [val[0] for val in bfs]
@@ -103,7 +107,7 @@ def generate_blobs(nside, nexp=1, exptime=30., filter1s=['u', 'u', 'u', 'g', 'r'
                    season=300., season_start_hour=-4., season_end_hour=2.,
                    shadow_minutes=60., max_alt=76., moon_distance=30., ignore_obs='DD',
                    m5_weight=6., footprint_weight=0.6, slewtime_weight=3.,
-                   stayfilter_weight=3., template_weight=12.):
+                   stayfilter_weight=3., template_weight=12., coarse_nside=None, slew_table=None):
     """
     Generate surveys that take observations in blobs.
 
@@ -149,6 +153,10 @@ def generate_blobs(nside, nexp=1, exptime=30., filter1s=['u', 'u', 'u', 'g', 'r'
         The weight on basis function that tries to stay avoid filter changes.
     template_weight : float (12.)
         The weight to place on getting image templates every season
+    coarse_nside : int (None)
+        If set, compute the depth, slewtime and mask basis functions at this coarser nside.
+    slew_table : Slew_table (None)
+        If set, take the blob slew, filter change and read time estimates from this table.
     """
 
     blob_survey_params = {'slew_approx': 7.5, 'filter_change_approx': 140.,
@@ -156,8 +164,10 @@ def generate_blobs(nside, nexp=1, exptime=30., filter1s=['u', 'u', 'u', 'g', 'r'
                           'alt_max': 85., 'az_range': 90., 'flush_time': 30.,
                           'smoothing_kernel': None, 'nside': nside, 'seed': 42, 'dither': True,
                           'twilight_scale': True}
+    if slew_table is not None:
+        blob_survey_params.update(blob_slew_params(slew_table, nside=nside))
 
-    footprints = standard_goals(nside=nside)
+    footprints = cached_footprint(standard_goals, nside=nside)
     sum_footprints = 0
     for key in footprints:
         sum_footprints += np.sum(footprints[key])
@@ -174,11 +184,14 @@ def generate_blobs(nside, nexp=1, exptime=30., filter1s=['u', 'u', 'u', 'g', 'r'
         bfs = []
 
         if filtername2 is not None:
-            bfs.append((bf.M5_diff_basis_function(filtername=filtername, nside=nside), m5_weight/2.))
-            bfs.append((bf.M5_diff_basis_function(filtername=filtername2, nside=nside), m5_weight/2.))
+            bfs.append((multires_bf(bf.M5_diff_basis_function, nside=nside, coarse_nside=coarse_nside,
+                                    filtername=filtername), m5_weight/2.))
+            bfs.append((multires_bf(bf.M5_diff_basis_function, nside=nside, coarse_nside=coarse_nside,
+                                    filtername=filtername2), m5_weight/2.))
 
         else:
-            bfs.append((bf.M5_diff_basis_function(filtername=filtername, nside=nside), m5_weight))
+            bfs.append((multires_bf(bf.M5_diff_basis_function, nside=nside, coarse_nside=coarse_nside,
+                                    filtername=filtername), m5_weight))
 
         if filtername2 is not None:
             bfs.append((bf.Footprint_basis_function(filtername=filtername,
@@ -195,7 +208,8 @@ def generate_blobs(nside, nexp=1, exptime=30., filter1s=['u', 'u', 'u', 'g', 'r'
                                                     out_of_bounds_val=np.nan, nside=nside,
                                                     all_footprints_sum=sum_footprints), footprint_weight))
 
-        bfs.append((bf.Slewtime_basis_function(filtername=filtername, nside=nside), slewtime_weight))
+        bfs.append((multires_bf(bf.Slewtime_basis_function, nside=nside, coarse_nside=coarse_nside,
+                                filtername=filtername), slewtime_weight))
         bfs.append((bf.Strict_filter_basis_function(filtername=filtername), stayfilter_weight))
 
         if filtername2 is not None:
@@ -216,9 +230,11 @@ def generate_blobs(nside, nexp=1, exptime=30., filter1s=['u', 'u', 'u', 'g', 'r'
                                                          season_start_hour=season_start_hour,
                                                          season_end_hour=season_end_hour), template_weight))
         # Masks, give these 0 weight
-        bfs.append((bf.Zenith_shadow_mask_basis_function(nside=nside, shadow_minutes=shadow_minutes, max_alt=max_alt,
-                                                         penalty=np.nan, site='LSST'), 0.))
-        bfs.append((bf.Moon_avoidance_basis_function(nside=nside, moon_distance=moon_distance), 0.))
+        bfs.append((multires_bf(bf.Zenith_shadow_mask_basis_function, nside=nside, coarse_nside=coarse_nside,
+                                shadow_minutes=shadow_minutes, max_alt=max_alt, penalty=np.nan,
+                                site='LSST'), 0.))
+        bfs.append((multires_bf(bf.Moon_avoidance_basis_function, nside=nside, coarse_nside=coarse_nside,
+                                moon_distance=moon_distance), 0.))
         filternames = [fn for fn in [filtername, filtername2] if fn is not None]
         bfs.append((bf.Filter_loaded_basis_function(filternames=filternames), 0))
         if filtername2 is None:
@@ -227,7 +243,7 @@ def generate_blobs(nside, nexp=1, exptime=30., filter1s=['u', 'u', 'u', 'g', 'r'
             time_needed = times_needed[1]
         bfs.append((bf.Time_to_twilight_basis_function(time_needed=time_needed), 0.))
         bfs.append((bf.Not_twilight_basis_function(), 0.))
-        bfs.append((bf.Planet_mask_basis_function(nside=nside), 0.))
+        bfs.append((multires_bf(bf.Planet_mask_basis_function, nside=nside, coarse_nside=coarse_nside), 0.))
 
         # unpack the basis functions and weights
         weights = [val[1] for val in bfs]
@@ -248,18 +264,19 @@ def generate_blobs(nside, nexp=1, exptime=30., filter1s=['u', 'u', 'u', 'g', 'r'
 
 
 def run_sched(surveys, survey_length=365.25, nside=32, fileroot='baseline_', verbose=False,
-              extra_info=None, illum_limit=15.):
+              extra_info=None, illum_limit=15., observatory=None, **kwargs):
     years = np.round(survey_length/365.25)
     scheduler = Core_scheduler(surveys, nside=nside)
     n_visit_limit = None
     filter_sched = simple_filter_sched(illum_limit=illum_limit)
-    observatory = Model_observatory(nside=nside)
+    if observatory is None:
+        observatory = get_observatory(nside=nside)
     observatory, scheduler, observations = sim_runner(observatory, scheduler,
                                                       survey_length=survey_length,
                                                       filename=fileroot+'%iyrs.db' % years,
                                                       delete_past=True, n_visit_limit=n_visit_limit,
                                                       verbose=verbose, extra_info=extra_info,
-                                                      filter_scheduler=filter_sched)
+                                                      filter_scheduler=filter_sched, **kwargs)
 
 
 if __name__ == "__main__":
@@ -271,6 +288,13 @@ if __name__ == "__main__":
     parser.add_argument("--outDir", type=str, default="")
     parser.add_argument("--maxDither", type=float, default=0.7, help="Dither size for DDFs (deg)")
     parser.add_argument("--moon_illum_limit", type=float, default=15., help="illumination limit to remove u-band")
+    parser.add_argument("--nside", type=int, default=32)
+    parser.add_argument("--coarse_nside", type=int, default=None,
+                        help="Compute the smooth basis functions at this lower nside")
+    parser.add_argument("--slew_table", dest='slew_table', action='store_true',
+                        help="Take the blob slew time estimates from the observatory's kinematic model")
+    parser.set_defaults(slew_table=False)
+    add_runner_args(parser)
 
     args = parser.parse_args()
     survey_length = args.survey_length  # Days
@@ -278,8 +302,9 @@ if __name__ == "__main__":
     verbose = args.verbose
     max_dither = args.maxDither
     illum_limit = args.moon_illum_limit
+    nside = args.nside
+    coarse_nside = args.coarse_nside
 
-    nside = 32
     per_night = True  # Dither DDF per night
     nexp = 1  # All observations
     mixed_pairs = True  # For the blob scheduler
@@ -305,9 +330,13 @@ if __name__ == "__main__":
     details = [detailers.Camera_rot_detailer(min_rot=-camera_ddf_rot_limit, max_rot=camera_ddf_rot_limit), dither_detailer]
     ddfs = generate_dd_surveys(nside=nside, nexp=nexp, detailers=details)
 
-    greedy = gen_greedy_surveys(nside, nexp=nexp)
-    blobs = generate_blobs(nside, nexp=nexp)
+    observatory = get_observatory(nside=nside)
+    table = None
+    if args.slew_table:
+        table = slew_table(observatory.observatory)
+    greedy = gen_greedy_surveys(nside, nexp=nexp, coarse_nside=coarse_nside)
+    blobs = generate_blobs(nside, nexp=nexp, coarse_nside=coarse_nside, slew_table=table)
     surveys = [ddfs, blobs, greedy]
     run_sched(surveys, survey_length=survey_length, verbose=verbose,
               fileroot=os.path.join(outDir, fileroot+file_end), extra_info=extra_info,
-              nside=nside, illum_limit=illum_limit)
+              nside=nside, illum_limit=illum_limit, observatory=observatory, **runner_kwargs(args))
@@ -0,0 +1,75 @@
+import argparse
+import os
+import tempfile
+from run_utils import (run_benchmarks, write_benchmarks, compare_benchmarks, benchmark_configs, profile_startup,
+                       startup_report, compare_tour_solvers)
+
+
+if __name__ == "__main__":
+    """
+    Run short simulations of each experiment family and record the throughput.
+
+    e.g.,
+    python benchmark.py --outfile bench_new.txt --compare bench_old.txt
+    or, to see where each configuration spends its startup time:
+    python benchmark.py --startup --names baseline,rolling
+    or, to compare the blob tour solvers:
+    python benchmark.py --tours
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--survey_lengths", type=str, default='3,30',
+                        help="Comma separated survey lengths to run (days)")
+    parser.add_argument("--names", type=str, default=None,
+                        help="Comma separated configuration names to run (default all)")
+    parser.add_argument("--n_workers", type=int, default=1)
+    parser.add_argument("--outfile", type=str, default='benchmarks.txt')
+    parser.add_argument("--compare", type=str, default=None, help="Earlier benchmark file to compare to")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Fractional drop in visits/s to flag as a regression")
+    parser.add_argument("--startup", dest='startup', action='store_true',
+                        help="Profile the imports and setup of each configuration instead")
+    parser.add_argument("--tours", dest='tours', action='store_true',
+                        help="Compare the blob tour solvers on random blobs instead")
+    parser.add_argument("--tour_moves", type=int, default=None,
+                        help="Most improving moves per tour for the 2-opt/Or-opt solver")
+    parser.add_argument("--tour_budget", type=float, default=None,
+                        help="Optional time limit per tour for the 2-opt/Or-opt solver (s)")
+    parser.add_argument("--preload_observatory", dest='preload_observatory', action='store_true',
+                        help="Share one observatory built before the runs, as sweeps do (default each run loads its own)")
+    parser.set_defaults(startup=False, tours=False, preload_observatory=False)
+    args = parser.parse_args()
+
+    survey_lengths = [float(val) for val in args.survey_lengths.split(',')]
+    names = None
+    if args.names is not None:
+        names = args.names.split(',')
+
+    if args.tours:
+        compare_tour_solvers(max_moves=args.tour_moves, time_budget=args.tour_budget)
+        raise SystemExit(0)
+
+    if args.startup:
+        repo_dir = os.path.dirname(os.path.realpath(__file__))
+        out_dir = tempfile.mkdtemp(prefix='fbs_startup_')
+        for name, script, script_args in benchmark_configs:
+            if names is not None and name not in names:
+                continue
+            result = profile_startup(os.path.join(repo_dir, script), list(script_args) + ['--outDir', out_dir])
+            print('%s\n%s\n' % (name, startup_report(result['phases'], total=result['total'],
+                                                     imports=result['imports'])))
+        os.rmdir(out_dir)
+        raise SystemExit(0)
+
+    results = run_benchmarks(survey_lengths=survey_lengths, names=names, n_workers=args.n_workers,
+                             preload_observatory=args.preload_observatory)
+    write_benchmarks(results, args.outfile)
+    for row in results:
+        if 'visits_per_sec' in row:
+            print('%s %.0f days: startup %.1f s, %.1f visits/s, %.1f nights/hour, %.0f MB' %
+                  (row['name'], row['survey_length'], row['startup_time'], row['visits_per_sec'],
+                   row['nights_per_hour'], row['peak_rss']))
+        else:
+            print('%s %.0f days: %s' % (row['name'], row['survey_length'], row['status']))
+    if args.compare is not None:
+        regressions = compare_benchmarks(results, args.compare, tolerance=args.tolerance)
+        print('%i configurations slower than %s' % (len(regressions), args.compare))
@@ -1,23 +1,20 @@
 import numpy as np
-import matplotlib.pylab as plt
-import healpy as hp
-from lsst.sims.featureScheduler.modelObservatory import Model_observatory
 from lsst.sims.featureScheduler.schedulers import Core_scheduler, simple_filter_sched
 from lsst.sims.featureScheduler.utils import standard_goals, create_season_offset
 import lsst.sims.featureScheduler.basis_functions as bf
 from lsst.sims.featureScheduler.surveys import (generate_dd_surveys, Greedy_survey,
                                                 Blob_survey)
-from lsst.sims.featureScheduler import sim_runner
 import lsst.sims.featureScheduler.detailers as detailers
-from lsst.sims.utils import _hpid2RaDec
-from astropy.coordinates import SkyCoord
-from astropy import units as u
 import sys
 import subprocess
 import os
 import argparse
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+from run_utils import (sim_runner, add_runner_args, runner_kwargs, get_observatory, footprint_cache,
+                       ra_dec_hp_map, galactic_hp_map)
 
 
+@footprint_cache
 def big_sky(nside=32, weights={'u': [0.31, 0.15, False], 'g': [0.44, 0.15],
                                'r': [1., 0.3], 'i': [1., 0.3], 'z': [0.9, 0.3],
                                'y': [0.9, 0.3, False]}):
@@ -31,10 +28,9 @@ def big_sky(nside=32, weights={'u': [0.31, 0.15, False], 'g': [0.44, 0.15],
     full_north = np.radians(30.)
     g_lat_limit = np.radians(8.)
 
-    ra, dec = _hpid2RaDec(nside, np.arange(hp.nside2npix(nside)))
+    ra, dec = ra_dec_hp_map(nside=nside)
     total_map = np.zeros(ra.size)
-    coord = SkyCoord(ra=ra*u.rad, dec=dec*u.rad)
-    g_long, g_lat = coord.galactic.l.radian, coord.galactic.b.radian
+    g_long, g_lat = galactic_hp_map(nside=nside)
 
     # let's make a first pass here
 
@@ -56,12 +52,13 @@ def big_sky(nside=32, weights={'u': [0.31, 0.15, False], 'g': [0.44, 0.15],
     return result
 
 
+@footprint_cache
 def bulge_footprint(nside=32, bulge_frac=1., ll_frac=1., i_heavy=False):
     sg = big_sky(nside=nside)
     wfd_north = np.radians(12.4)
     wfd_south = np.radians(-72.25)
 
-    ra, dec = _hpid2RaDec(nside, np.arange(hp.nside2npix(nside)))
+    ra, dec = ra_dec_hp_map(nside=nside)
     wfd_pix = np.where(sg['r'] == 1)
 
     # Zero out the bulge as it is now
@@ -69,8 +66,7 @@ def bulge_footprint(nside=32, bulge_frac=1., ll_frac=1., i_heavy=False):
     for key in sg:
         sg[key][bulge_pix] = 0
 
-    coord = SkyCoord(ra=ra*u.rad, dec=dec*u.rad)
-    g_long, g_lat = coord.galactic.l.deg, coord.galactic.b.deg
+    g_long, g_lat = np.degrees(galactic_hp_map(nside=nside))
     bulge_pix = np.where((g_long > -20) & (g_long < 20.) & (g_lat > -10) & (g_lat < 10.))
 
     lo_lat_pix = np.where((np.abs(g_lat) < 10.) & (dec < wfd_north))
@@ -328,18 +324,18 @@ def generate_blobs(nside, nexp=1, exptime=30., filter1s=['u', 'u', 'u', 'g', 'r'
 
 
 def run_sched(surveys, survey_length=365.25, nside=32, fileroot='baseline_', verbose=False,
-              extra_info=None, illum_limit=15.):
+              extra_info=None, illum_limit=15., **kwargs):
     years = np.round(survey_length/365.25)
     scheduler = Core_scheduler(surveys, nside=nside)
     n_visit_limit = None
     filter_sched = simple_filter_sched(illum_limit=illum_limit)
-    observatory = Model_observatory(nside=nside)
+    observatory = get_observatory(nside=nside)
     observatory, scheduler, observations = sim_runner(observatory, scheduler,
                                                       survey_length=survey_length,
                                                       filename=fileroot+'%iyrs.db' % years,
                                                       delete_past=True, n_visit_limit=n_visit_limit,
                                                       verbose=verbose, extra_info=extra_info,
-                                                      filter_scheduler=filter_sched)
+                                                      filter_scheduler=filter_sched, **kwargs)
 
 
 if __name__ == "__main__":
@@ -352,6 +348,7 @@ if __name__ == "__main__":
     parser.add_argument("--maxDither", type=float, default=0.7, help="Dither size for DDFs (deg)")
     parser.add_argument("--moon_illum_limit", type=float, default=15., help="illumination limit to remove u-band")
     parser.add_argument("--strat_name", type=str, default='bs')
+    add_runner_args(parser)
 
     args = parser.parse_args()
     survey_length = args.survey_length  # Days
@@ -402,4 +399,4 @@ if __name__ == "__main__":
     surveys = [ddfs, blobs, greedy]
     run_sched(surveys, survey_length=survey_length, verbose=verbose,
               fileroot=os.path.join(outDir, fileroot+file_end), extra_info=extra_info,
-              nside=nside, illum_limit=illum_limit)
+              nside=nside, illum_limit=illum_limit, **runner_kwargs(args))
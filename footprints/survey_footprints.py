@@ -1,14 +1,17 @@
 import numpy as np
 import healpy as hp
-from astropy.coordinates import SkyCoord
-from astropy import units as u
 import lsst.sims.featureScheduler.utils as utils
 from lsst.sims.featureScheduler.utils import generate_goal_map
 from lsst.sims.featureScheduler.utils import standard_goals
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+from run_utils import cached_footprint, footprint_cache, ra_dec_hp_map, galactic_hp_map, rolling_footprints
 
 # OK, what are the footprints we'd like to try?
 
 
+@footprint_cache
 def big_wfd(nside=32):
     """
     A quick function to generate the "standard" goal maps. This is the traditional WFD/mini survey footprint.
@@ -43,6 +46,7 @@ def big_wfd(nside=32):
     return result
 
 
+@footprint_cache
 def bluer_footprint(nside=32):
     """Try a bluer filter dist. May want to turn this into a larger parameter search.
     """
@@ -82,6 +86,7 @@ def bluer_footprint(nside=32):
     return result
 
 
+@footprint_cache
 def gp_smooth(nside=32):
     # Treat the galactic plane as just part of the WFD
     result = {}
@@ -118,6 +123,7 @@ def gp_smooth(nside=32):
     return result
 
 
+@footprint_cache
 def no_gp_north(nside=32):
     result = {}
     gl1 = 290.
@@ -163,7 +169,7 @@ def no_gp_north(nside=32):
 
 def add_mag_clouds(inmap=None, nside=32):
     if inmap is None:
-        result = standard_goals(nside=nside)
+        result = cached_footprint(standard_goals, nside=nside)
     else:
         result = inmap
     mag_clouds_hpix = utils.magellanic_clouds_healpixels(nside)
@@ -172,6 +178,7 @@ def add_mag_clouds(inmap=None, nside=32):
     return result
 
 
+@footprint_cache
 def big_sky(nside=32, weights={'u': [0.31, 0.15, False], 'g': [0.44, 0.15],
                                'r': [1., 0.3], 'i': [1., 0.3], 'z': [0.9, 0.3],
                                'y': [0.9, 0.3, False]}):
@@ -187,7 +194,7 @@ def big_sky(nside=32, weights={'u': [0.31, 0.15, False], 'g': [0.44, 0.15],
     bigsky = utils.WFD_no_gp_healpixels(nside, dec_min=wfd_south, dec_max=wfd_north,
                                         center_width=gal_lat_limit, gal_long1=0, gal_long2=360)
     # Add extention to the north, up to 30 deg.
-    ra, dec = utils.ra_dec_hp_map(nside=nside)
+    ra, dec = ra_dec_hp_map(nside=nside)
     bigsky = np.where((dec > np.radians(wfd_north)) & (dec < np.radians(full_north)), 1.e-6, bigsky)
 
     # Now let's break it down by filter
@@ -201,6 +208,7 @@ def big_sky(nside=32, weights={'u': [0.31, 0.15, False], 'g': [0.44, 0.15],
     return result
 
 
+@footprint_cache
 def big_sky_nouiy(nside=32, weights={'u': [0.31, 0., False], 'g': [0.44, 0.15],
                                      'r': [1., 0.3], 'i': [1., 0.0, False], 'z': [0.9, 0.3],
                                      'y': [0.9, 0.0, False]}):
@@ -208,6 +216,7 @@ def big_sky_nouiy(nside=32, weights={'u': [0.31, 0., False], 'g': [0.44, 0.15],
     return result
 
 
+@footprint_cache
 def big_sky_dust(nside=32, weights={'u': [0.31, 0.15, False], 'g': [0.44, 0.15],
                  'r': [1., 0.3], 'i': [1., 0.3], 'z': [0.9, 0.3],
                  'y': [0.9, 0.3, False]}, dust_limit=0.19):
@@ -222,7 +231,7 @@ def big_sky_dust(nside=32, weights={'u': [0.31, 0.15, False], 'g': [0.44, 0.15],
     bigsky = utils.WFD_no_dust_healpixels(nside, dec_min=wfd_south, dec_max=wfd_north,
                                           dust_limit=dust_limit)
     # Add extention to the north, up to 30 deg.
-    ra, dec = utils.ra_dec_hp_map(nside=nside)
+    ra, dec = ra_dec_hp_map(nside=nside)
     bigsky = np.where((dec > np.radians(wfd_north)) & (dec < np.radians(full_north)), 1.e-6, bigsky)
 
     # Now let's break it down by filter
@@ -236,10 +245,10 @@ def big_sky_dust(nside=32, weights={'u': [0.31, 0.15, False], 'g': [0.44, 0.15],
     return result
 
 
+@footprint_cache
 def new_regions(nside=32, north_limit=2.25):
-    ra, dec = utils.ra_dec_hp_map(nside=nside)
-    coord = SkyCoord(ra=ra*u.rad, dec=dec*u.rad)
-    g_long, g_lat = coord.galactic.l.radian, coord.galactic.b.radian
+    ra, dec = ra_dec_hp_map(nside=nside)
+    g_long, g_lat = galactic_hp_map(nside=nside)
 
     # OK, let's just define the regions
     north = np.where((dec > np.radians(north_limit)) & (dec < np.radians(30.)))[0]
@@ -260,6 +269,7 @@ def new_regions(nside=32, north_limit=2.25):
     return footprints
 
 
+@footprint_cache
 def newA(nside=32):
     """
     From https://github.com/rhiannonlynne/notebooks/blob/master/New%20Footprints.ipynb
@@ -295,6 +305,7 @@ def newA(nside=32):
     return results
 
 
+@footprint_cache
 def newB(nside=32):
     """
     From https://github.com/rhiannonlynne/notebooks/blob/master/New%20Footprints.ipynb
@@ -330,50 +341,14 @@ def newB(nside=32):
     return results
 
 
-def slice_wfd_area(nslice, target_map, scale_down_factor=0.2):
-    """
-    Slice the WFD area into even dec bands
-    """
-    # Make it so things still sum to one.
-    scale_up_factor = nslice - scale_down_factor*(nslice-1)
-
-    wfd = target_map['r'] * 0
-    wfd_indices = np.where(target_map['r'] == 1)[0]
-    wfd[wfd_indices] = 1
-    wfd_accum = np.cumsum(wfd)
-    split_wfd_indices = np.floor(np.max(wfd_accum)/nslice*(np.arange(nslice)+1)).astype(int)
-    split_wfd_indices = split_wfd_indices.tolist()
-    split_wfd_indices = [0] + split_wfd_indices
-
-    all_scaled_down = {}
-    for filtername in target_map:
-        all_scaled_down[filtername] = target_map[filtername]+0
-        all_scaled_down[filtername][wfd_indices] *= scale_down_factor
-
-    scaled_maps = []
-    for i in range(len(split_wfd_indices)-1):
-        new_map = {}
-        indices = wfd_indices[split_wfd_indices[i]:split_wfd_indices[i+1]]
-        for filtername in all_scaled_down:
-            new_map[filtername] = all_scaled_down[filtername] + 0
-            new_map[filtername][indices] = target_map[filtername][indices]*scale_up_factor
-        scaled_maps.append(new_map)
-
-    return scaled_maps
-
-
+@footprint_cache
 def stuck_rolling(nside=32, scale_down_factor=0.2):
     """A bit of a trolling footprint. See what happens if we use a rolling footprint, but don't roll it. 
     """
-    sg = standard_goals()
-    footprints = slice_wfd_area(2, sg, scale_down_factor=scale_down_factor)
+    sg = cached_footprint(standard_goals)
+    footprints = rolling_footprints(sg, nslice=2, scale_down_factor=scale_down_factor, include_full=False)
     # Only take the first set
     footprints = footprints[0]
     return footprints
 
 
-
-
-
-
-
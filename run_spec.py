@@ -0,0 +1,59 @@
+import numpy as np
+import argparse
+import os
+import subprocess
+import sys
+import yaml
+from lsst.sims.featureScheduler.schedulers import Core_scheduler, simple_filter_sched
+from run_utils import read_spec, load_surveys, sim_runner, add_runner_args, runner_kwargs, get_observatory
+
+
+if __name__ == "__main__":
+    """
+    Run an experiment described by a spec file (see specs/baseline.yaml).
+
+    e.g.,
+    python run_spec.py specs/baseline.yaml --outDir baseline
+    python run_spec.py specs/baseline.yaml --set max_dither=1.0 --set name=baseline_dither1
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("spec", type=str, help="YAML or JSON experiment spec")
+    parser.add_argument("--set", type=str, action='append', default=[],
+                        help="Override a spec var, e.g., max_dither=1.0. Can be repeated.")
+    parser.add_argument("--rebuild", dest='rebuild', action='store_true',
+                        help="Compile the spec even if there is a cached copy")
+    parser.set_defaults(rebuild=False)
+    parser.add_argument("--verbose", dest='verbose', action='store_true')
+    parser.set_defaults(verbose=False)
+    parser.add_argument("--survey_length", type=float, default=365.25*10)
+    parser.add_argument("--outDir", type=str, default="")
+    add_runner_args(parser)
+    args = parser.parse_args()
+
+    overrides = {}
+    for item in args.set:
+        key, val = item.split('=', 1)
+        overrides[key] = yaml.safe_load(val)
+    spec = read_spec(args.spec, overrides=overrides)
+    nside = spec.get('nside', 32)
+
+    extra_info = {}
+    extra_info['exec command'] = ' '.join(sys.argv)
+    try:
+        extra_info['git hash'] = subprocess.check_output(['git', 'rev-parse', 'HEAD'])
+    except subprocess.CalledProcessError:
+        extra_info['git hash'] = 'Not in git repo'
+    extra_info['file executed'] = os.path.realpath(args.spec)
+
+    surveys = load_surveys(spec, rebuild=args.rebuild)
+    scheduler = Core_scheduler(surveys, nside=nside)
+    filter_sched = simple_filter_sched(illum_limit=spec.get('illum_limit', 15.))
+    observatory = get_observatory(nside=nside)
+    years = np.round(args.survey_length/365.25)
+    fileroot = os.path.join(args.outDir, '%s_v1.4_' % spec.get('name', 'spec'))
+    observatory, scheduler, observations = sim_runner(observatory, scheduler,
+                                                      survey_length=args.survey_length,
+                                                      filename=fileroot+'%iyrs.db' % years,
+                                                      delete_past=True, verbose=args.verbose,
+                                                      extra_info=extra_info,
+                                                      filter_scheduler=filter_sched, **runner_kwargs(args))
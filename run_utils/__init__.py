@@ -0,0 +1,34 @@
+"""
+Shared helpers for running the experiment scripts in this repo.
+
+The experiment scripts live in their own directories and are run directly, so they add the
+repo root to sys.path before importing this package.
+"""
+from .utils import *
+from .startup import *
+from .checkpoint import *
+from .fork import *
+from .observatory import *
+from .timing import *
+from .dryrun import *
+from .writer import *
+from .conditions_cache import *
+from .footprint_cache import *
+from .coords import *
+from .shared_bf import *
+from .feature_store import *
+from .batch import *
+from .rolling_footprints import *
+from .compact import *
+from .multires import *
+from .tours import *
+from .sky_index import *
+from .smoothing import *
+from .slew_table import *
+from .incremental import *
+from .masks import *
+from .spec import *
+from .sim_runner import *
+from .sweep import *
+from .benchmark import *
+from .cli import *
@@ -0,0 +1,79 @@
+import numpy as np
+from .utils import iter_surveys
+
+__all__ = ['add_observations', 'replay_database']
+
+
+def _pointing_indices(scheduler, observations):
+    """
+    HEALpix indices covered by each observation, found with one KD-tree query for the batch.
+    Falls back to one query per observation if the pointing function doesn't take arrays.
+    """
+    if observations.size > 1:
+        try:
+            indx = scheduler.pointing2hpindx(observations['RA'], observations['dec'],
+                                             rotSkyPos=observations['rotSkyPos'])
+            if len(indx) == observations.size:
+                return list(indx)
+        except (TypeError, ValueError):
+            pass
+    return [scheduler.pointing2hpindx(obs['RA'], obs['dec'], rotSkyPos=obs['rotSkyPos'])
+            for obs in observations]
+
+
+def add_observations(scheduler, observations, filter_scheduler=None):
+    """
+    Add a batch of completed observations to a scheduler.
+
+    Gives the same state as calling scheduler.add_observation on each observation in turn. The
+    footprint indices for the whole batch come from one KD-tree query. Each survey then takes
+    the whole batch in one go: through its own add_observations(observations, indx=...) if it
+    has one, otherwise one observation at a time. Surveys don't read each other's state when
+    adding observations, so the survey-by-survey order doesn't change the result.
+
+    Parameters
+    ----------
+    scheduler : Core_scheduler
+    observations : np.array
+        Structured array of observations, in the order they were taken
+    filter_scheduler : simple_filter_sched (None)
+        Also add the observations to this
+    """
+    observations = np.atleast_1d(observations)
+    if observations.size == 0:
+        return
+    indx = _pointing_indices(scheduler, observations)
+    for i, survey in iter_surveys(scheduler):
+        if hasattr(survey, 'add_observations'):
+            survey.add_observations(observations, indx=indx)
+        else:
+            for obs, obs_indx in zip(observations, indx):
+                survey.add_observation(obs, indx=obs_indx)
+    if filter_scheduler is not None:
+        for obs in observations:
+            filter_scheduler.add_observation(obs)
+
+
+def replay_database(scheduler, filename, n_max=None, filter_scheduler=None):
+    """
+    Bring a scheduler up to date with the visits in an output database.
+
+    Parameters
+    ----------
+    scheduler : Core_scheduler
+    filename : str
+        An output database written by sim_runner
+    n_max : int (None)
+        Only replay the first n_max visits
+
+    Returns
+    -------
+    observations : np.array
+        The visits replayed
+    """
+    from lsst.sims.featureScheduler.utils import schema_converter
+    observations = schema_converter().opsim2obs(filename)
+    if n_max is not None:
+        observations = observations[0:n_max]
+    add_observations(scheduler, observations, filter_scheduler=filter_scheduler)
+    return observations
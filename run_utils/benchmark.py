@@ -0,0 +1,178 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from .sweep import run_sweep
+
+__all__ = ['benchmark_configs', 'run_benchmarks', 'write_benchmarks', 'read_benchmarks',
+           'compare_benchmarks']
+
+# One representative configuration per experiment family, relative to the repo root.
+benchmark_configs = [('baseline', 'baseline/baselines.py', []),
+                     ('baseline_2snap', 'baseline/baseline_2snap.py', []),
+                     ('rolling', 'rolling/rolling.py', ['--splits', '2']),
+                     ('alt_dust', 'alt_roll_dust/alt_dust.py', []),
+                     ('roll_dust', 'alt_roll_dust/roll_dust.py', []),
+                     ('alt_roll_dust', 'alt_roll_dust/alt_roll_dust.py', []),
+                     ('agn_ddf', 'AGN_DDF/agn_ddf.py', []),
+                     ('desc_ddf', 'DESC_DDF/desc_ddf.py', []),
+                     ('euclid_ddf', 'euclid_DDF/euclid_ddf.py', []),
+                     ('dark_ddf', 'DDF_experiment/dark_ddf.py', []),
+                     ('flex_ddf', 'DDF_experiment/flex_ddf.py', []),
+                     ('short_ddf', 'shorter_ddf/short_ddf.py', []),
+                     ('bulge', 'bulge/bulges.py', ['--strat_name', 'bs']),
+                     ('smooth_reward', 'contiguous_blobs/smooth_reward.py', ['--kernel_fwhm', '10']),
+                     ('dcr', 'DCR/dcr.py', ['--nham', '1']),
+                     ('footprints', 'footprints/footprints.py', ['--footprint_name', 'big_wfd']),
+                     ('goodseeing', 'good_seeing/goodseeing.py', ['--good_seeing_filts', 'gi']),
+                     ('nopairs', 'no_pairs/nopairs.py', []),
+                     ('pair_strat', 'pair_strat/pair_strat.py', ['--pair_strat', '0']),
+                     ('short_exp', 'short_exp/short_exp.py', ['--nshort', '2', '--short_time', '1']),
+                     ('spiders', 'spiders/spiders.py', []),
+                     ('third_obs', 'third_obs/third_obs.py', ['--pair_time', '120']),
+                     ('twi_filters', 'twilight_filters/twi_filters.py', ['--nfilters', '1']),
+                     ('twilight_neo', 'twilight_neo/twilight_neo.py', ['--night_mod', '1']),
+                     ('u60', 'u60/u60.py', []),
+                     ('upairs', 'u_pairs/upairs.py', ['--u_scaleup', '1']),
+                     ('var_expt', 'var_expt/var_expt.py', []),
+                     ('weather', 'weather/weather.py', ['--cloud_limit', '0.3']),
+                     ('wfd_depth', 'wfd_depth/wfd_depth.py', ['--wfd_scale', '0.65']),
+                     ('wfd_vary', 'wfd_vary/wfd_vary.py', ['--fp', '1'])]
+
+_columns = ['name', 'survey_length', 'preloaded', 'status', 'startup_time', 'runtime', 'n_obs', 'visits_per_sec',
+            'nights_per_hour', 'peak_rss']
+
+
+def run_benchmarks(survey_lengths=[3., 30.], configs=None, names=None, n_workers=1, repo_dir=None,
+                   preload_observatory=False):
+    """
+    Run short, fixed-length simulations of each experiment configuration.
+
+    Parameters
+    ----------
+    survey_lengths : list of float ([3., 30.])
+        The survey lengths to run each configuration for (days)
+    configs : list of tuple (None)
+        (name, script, args) for each configuration. Defaults to benchmark_configs.
+    names : list of str (None)
+        Only run the configurations with these names.
+    n_workers : int (1)
+        How many to run at once. Leave at 1 for the most repeatable timing.
+    repo_dir : str (None)
+        The repo root the script paths are relative to. Defaults to the parent of run_utils.
+    preload_observatory : bool (False)
+        Build the observatory before forking the runs, as run_sweep does by default. Left off,
+        each run loads its own, so the startup time and peak RSS are those of a real launch.
+
+    Returns
+    -------
+    results : list of dict
+    """
+    if configs is None:
+        configs = benchmark_configs
+    if names is not None:
+        configs = [config for config in configs if config[0] in names]
+    if repo_dir is None:
+        repo_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..')
+    out_dir = tempfile.mkdtemp(prefix='fbs_bench_')
+
+    runs = []
+    labels = {}
+    for name, script, args in configs:
+        for survey_length in survey_lengths:
+            argv = list(args) + ['--survey_length', str(survey_length), '--outDir', out_dir]
+            script_path = os.path.join(repo_dir, script)
+            runs.append((script_path, argv))
+            labels[(script_path, ' '.join(argv))] = (name, survey_length)
+
+    try:
+        observatory_kwargs = {'nside': 32} if preload_observatory else None
+        sweep_results = run_sweep(runs, n_workers=n_workers, observatory_kwargs=observatory_kwargs,
+                                  verbose=False)
+    finally:
+        shutil.rmtree(out_dir)
+
+    results = []
+    for res in sweep_results:
+        name, survey_length = labels[(res['script'], res['args'])]
+        row = {'name': name, 'survey_length': survey_length, 'status': res['status'],
+               'peak_rss': res['peak_rss'], 'preloaded': preload_observatory}
+        if 'runtime' in res:
+            row['startup_time'] = res['startup_time']
+            row['runtime'] = res['runtime']
+            row['n_obs'] = res['n_obs']
+            row['visits_per_sec'] = res['n_obs']/res['runtime']
+            row['nights_per_hour'] = res['sim_days']/res['runtime']*3600.
+        results.append(row)
+    results.sort(key=lambda row: (row['name'], row['survey_length']))
+    return results
+
+
+def write_benchmarks(results, filename):
+    """
+    Write benchmark results to a tab separated file, with a header noting the date and git hash.
+    """
+    try:
+        git_hash = subprocess.check_output(['git', 'rev-parse', 'HEAD']).decode().strip()
+    except (subprocess.CalledProcessError, OSError):
+        git_hash = 'Not in git repo'
+    with open(filename, 'w') as f:
+        f.write('# %s %s\n' % (time.strftime('%Y-%m-%d %H:%M:%S'), git_hash))
+        f.write('\t'.join(_columns) + '\n')
+        for row in results:
+            f.write('\t'.join([str(row.get(col, '')) for col in _columns]) + '\n')
+
+
+def read_benchmarks(filename):
+    """
+    Read a file written by write_benchmarks.
+
+    Returns
+    -------
+    results : dict
+        Keyed by (name, survey_length)
+    """
+    results = {}
+    with open(filename) as f:
+        lines = [line.rstrip('\n') for line in f if not line.startswith('#')]
+    columns = lines[0].split('\t')
+    for line in lines[1:]:
+        row = dict(zip(columns, line.split('\t')))
+        results[(row['name'], float(row['survey_length']))] = row
+    return results
+
+
+def compare_benchmarks(results, reference_file, tolerance=0.1):
+    """
+    Compare benchmark results to an earlier run.
+
+    Parameters
+    ----------
+    results : list of dict
+        From run_benchmarks
+    reference_file : str
+        Earlier results, from write_benchmarks
+    tolerance : float (0.1)
+        Fractional drop in visits per second to flag as a regression.
+
+    Returns
+    -------
+    regressions : list of str
+        The (name, survey_length) configurations that got slower than the tolerance.
+    """
+    reference = read_benchmarks(reference_file)
+    regressions = []
+    for row in results:
+        key = (row['name'], float(row['survey_length']))
+        if key not in reference or 'visits_per_sec' not in row or reference[key]['visits_per_sec'] == '':
+            continue
+        ref_rate = float(reference[key]['visits_per_sec'])
+        ratio = row['visits_per_sec']/ref_rate
+        flag = ''
+        if ratio < 1. - tolerance:
+            flag = ' <-- slower'
+            regressions.append(key)
+        print('%s %.0f days: %.1f visits/s vs %.1f (%.2fx)%s' % (key[0], key[1], row['visits_per_sec'],
+                                                                ref_rate, ratio, flag))
+    return regressions
@@ -0,0 +1,106 @@
+import numpy as np
+import os
+import pickle
+
+__all__ = ['observatory_state', 'restore_observatory_state', 'save_checkpoint', 'load_checkpoint',
+           'checkpoint_filename']
+
+# Lightweight attributes of Model_observatory that need to carry over. The sky brightness,
+# seeing, cloud and almanac data are read-only and get re-loaded when the observatory is rebuilt.
+_observatory_attrs = ['mjd', 'night', 'obsID_counter', 'mjd_start', 'cloud_limit', 'downtimes']
+
+
+def checkpoint_filename(filename):
+    """Where to put the checkpoint for a given output database filename
+    """
+    return filename + '.ckpt'
+
+
+def observatory_state(observatory):
+    """
+    Pull out the mutable state of a Model_observatory.
+
+    Parameters
+    ----------
+    observatory : lsst.sims.featureScheduler.modelObservatory.Model_observatory
+
+    Returns
+    -------
+    state : dict
+        The attributes needed to put a freshly built observatory back where this one is.
+    """
+    state = {}
+    for attr in _observatory_attrs:
+        if hasattr(observatory, attr):
+            state[attr] = getattr(observatory, attr)
+    # The kinematic model is small and holds the current pointing, rotator angle and mounted filters.
+    state['kinematic_model'] = observatory.observatory
+    return state
+
+
+def restore_observatory_state(observatory, state):
+    """
+    Restore state captured with observatory_state onto a freshly built Model_observatory.
+    """
+    # Set the kinematic model first, setting the mjd updates it.
+    observatory.observatory = state['kinematic_model']
+    for attr in _observatory_attrs:
+        if attr in state:
+            setattr(observatory, attr, state[attr])
+    return observatory
+
+
+def save_checkpoint(filename, observatory, scheduler, filter_scheduler, observations, runner_state):
+    """
+    Write a checkpoint to disk.
+
+    The file is written to a temporary name and then moved into place, so a job killed while
+    writing leaves the previous checkpoint intact.
+
+    Parameters
+    ----------
+    filename : str
+        Where to write the checkpoint
+    observatory : Model_observatory
+        Only the light-weight state is saved (see observatory_state)
+    scheduler : lsst.sims.featureScheduler.schedulers.Core_scheduler
+        Pickled whole, so all survey and basis function feature state goes with it.
+    filter_scheduler : lsst.sims.featureScheduler.schedulers.simple_filter_sched
+    observations : list
+        The completed observations so far
+    runner_state : dict
+        Loop variables from sim_runner (mjd_start, end_mjd, nskip, etc)
+    """
+    checkpoint = {'observatory': observatory_state(observatory),
+                  'scheduler': scheduler,
+                  'filter_scheduler': filter_scheduler,
+                  'observations': observations,
+                  'runner_state': runner_state,
+                  'random_state': np.random.get_state()}
+    temp_name = filename + '.tmp'
+    with open(temp_name, 'wb') as f:
+        pickle.dump(checkpoint, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_name, filename)
+
+
+def load_checkpoint(filename, observatory):
+    """
+    Load a checkpoint written by save_checkpoint.
+
+    Parameters
+    ----------
+    filename : str
+        The checkpoint file
+    observatory : Model_observatory
+        A freshly built observatory that gets the saved state put back in.
+
+    Returns
+    -------
+    observatory, scheduler, filter_scheduler, observations, runner_state
+    """
+    with open(filename, 'rb') as f:
+        checkpoint = pickle.load(f)
+    observatory = restore_observatory_state(observatory, checkpoint['observatory'])
+    np.random.set_state(checkpoint['random_state'])
+    return (observatory, checkpoint['scheduler'], checkpoint['filter_scheduler'],
+            checkpoint['observations'], checkpoint['runner_state'])
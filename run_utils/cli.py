@@ -0,0 +1,97 @@
+__all__ = ['add_runner_args', 'runner_kwargs']
+
+
+def add_runner_args(parser):
+    """
+    Add the command line options that every experiment script passes through to sim_runner.
+
+    Parameters
+    ----------
+    parser : argparse.ArgumentParser
+    """
+    parser.add_argument("--checkpoint_every", type=int, default=None,
+                        help="Write a checkpoint every N simulated nights")
+    parser.add_argument("--resume", dest='resume', action='store_true',
+                        help="Resume from the last checkpoint if one exists")
+    parser.set_defaults(resume=False)
+    parser.add_argument("--snapshot", type=str, default=None,
+                        help="Write a snapshot of the final state to this file for variants to fork from")
+    parser.add_argument("--fork_from", type=str, default=None,
+                        help="Start from a snapshot written with --snapshot rather than from scratch")
+    parser.add_argument("--verify_nights", type=int, default=None,
+                        help="When forking, check the first N nights match the snapshot prefix")
+    parser.add_argument("--timing", dest='timing', action='store_true',
+                        help="Time each basis function, survey, detailer and tier")
+    parser.add_argument("--timing_info", dest='timing_in_info', action='store_true',
+                        help="Also put the timing summary in the output database info table")
+    parser.set_defaults(timing=False, timing_in_info=False)
+    parser.add_argument("--dry_run", "--dry-run", dest='dry_run', action='store_true',
+                        help="Build the surveys and check them at sampled conditions without simulating")
+    parser.set_defaults(dry_run=False)
+    parser.add_argument("--stream", dest='stream', action='store_true',
+                        help="Write each night to the output database as the simulation runs")
+    parser.set_defaults(stream=False)
+    parser.add_argument("--conditions_cache", type=float, default=None,
+                        help="Reuse per-pixel condition maps computed within this many seconds")
+    parser.add_argument("--share_bfs", dest='share_bfs', action='store_true',
+                        help="Share identical basis functions between surveys")
+    parser.set_defaults(share_bfs=False)
+    parser.add_argument("--feature_store", dest='feature_store', action='store_true',
+                        help="Keep one shared copy of each distinct survey feature")
+    parser.set_defaults(feature_store=False)
+    parser.add_argument("--batch_obs", dest='batch_obs', action='store_true',
+                        help="Add the visits of a queued block to the scheduler as one batch")
+    parser.set_defaults(batch_obs=False)
+    parser.add_argument("--compact", dest='compact', action='store_true',
+                        help="Store basis function footprints as float32")
+    parser.set_defaults(compact=False)
+    parser.add_argument("--startup_profile", dest='startup_profile', action='store_true',
+                        help="Report where the startup time goes, then stop before simulating")
+    parser.set_defaults(startup_profile=False)
+    parser.add_argument("--tour_solver", dest='tour_solver', action='store_true',
+                        help="Order blob pointings with the 2-opt/Or-opt solver")
+    parser.set_defaults(tour_solver=False)
+    parser.add_argument("--tour_moves", type=int, default=None,
+                        help="Most improving moves per tour for the solver (default 10 per pointing)")
+    parser.add_argument("--tour_budget", type=float, default=None,
+                        help="Optional time limit per tour for the solver (s), makes runs machine dependent")
+    parser.add_argument("--sky_index", dest='sky_index', action='store_true',
+                        help="Find the pixels within a blob's search radius with a KD-tree")
+    parser.set_defaults(sky_index=False)
+    parser.add_argument("--sparse_smoothing", dest='sparse_smoothing', action='store_true',
+                        help="Smooth rewards with a precomputed sparse kernel rather than spherical harmonics")
+    parser.set_defaults(sparse_smoothing=False)
+    parser.add_argument("--incremental_rewards", dest='incremental_rewards', action='store_true',
+                        help="Only recompute reward terms that can change between visits")
+    parser.set_defaults(incremental_rewards=False)
+    parser.add_argument("--verify_rewards", dest='verify_rewards', action='store_true',
+                        help="Check the cached reward terms against a full recomputation on every call")
+    parser.set_defaults(verify_rewards=False)
+    parser.add_argument("--fuse_masks", dest='fuse_masks', action='store_true',
+                        help="Compute each distinct survey mask once per conditions")
+    parser.set_defaults(fuse_masks=False)
+    return parser
+
+
+def runner_kwargs(args):
+    """
+    Convert parsed command line arguments into kwargs for sim_runner.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        Arguments from a parser that has had add_runner_args called on it.
+    """
+    result = {'checkpoint_every': args.checkpoint_every, 'resume': args.resume,
+              'snapshot_file': args.snapshot, 'fork_from': args.fork_from,
+              'verify_nights': args.verify_nights, 'timing': args.timing,
+              'timing_in_info': args.timing_in_info, 'dry_run': args.dry_run,
+              'stream': args.stream, 'conditions_cache': args.conditions_cache,
+              'share_bfs': args.share_bfs, 'feature_store': args.feature_store,
+              'batch_obs': args.batch_obs, 'compact': args.compact,
+              'startup_profile': args.startup_profile, 'tour_solver': args.tour_solver,
+              'tour_moves': args.tour_moves, 'tour_budget': args.tour_budget,
+              'sky_index': args.sky_index, 'sparse_smoothing': args.sparse_smoothing,
+              'incremental_rewards': args.incremental_rewards, 'verify_rewards': args.verify_rewards,
+              'fuse_masks': args.fuse_masks}
+    return result
@@ -0,0 +1,140 @@
+import numpy as np
+from .utils import iter_surveys
+
+__all__ = ['Level_map', 'compact_map', 'compact_basis_functions']
+
+# Basis function attributes that hold footprint weights (never times, so float32 is plenty)
+_footprint_attrs = ['footprint', 'footprints', 'target_map', 'target_maps']
+
+
+class Level_map(object):
+    """
+    A HEALpix map that only takes a few distinct values, stored as a small table of levels and
+    a uint8 (or uint16) level index per pixel.
+
+    Footprints are mostly 0 plus a handful of weights, so this is 8x smaller than float64.
+    Indexing returns the values, and np.asarray(level_map) gives the full map.
+
+    Parameters
+    ----------
+    levels : np.array
+        The distinct values
+    codes : np.array
+        Index into levels for every pixel
+    """
+    def __init__(self, levels, codes):
+        self.levels = levels
+        self.codes = codes
+
+    @classmethod
+    def from_array(cls, values, dtype=np.float32):
+        levels, codes = np.unique(values, return_inverse=True)
+        if levels.size > 65535:
+            raise ValueError('Too many distinct values (%i) for a Level_map' % levels.size)
+        code_type = np.uint8 if levels.size <= 256 else np.uint16
+        return cls(levels.astype(dtype), codes.astype(code_type))
+
+    def __len__(self):
+        return self.codes.size
+
+    @property
+    def size(self):
+        return self.codes.size
+
+    @property
+    def nbytes(self):
+        return self.levels.nbytes + self.codes.nbytes
+
+    def __getitem__(self, indx):
+        return self.levels[self.codes[indx]]
+
+    def __array__(self, dtype=None):
+        result = self.levels[self.codes]
+        if dtype is not None:
+            result = result.astype(dtype)
+        return result
+
+    def toarray(self, dtype=None):
+        return self.__array__(dtype=dtype)
+
+    def pixels(self, value):
+        """Indices of the pixels with a given value"""
+        match = np.where(self.levels == value)[0]
+        if match.size == 0:
+            return np.array([], dtype=int)
+        return np.where(self.codes == match[0])[0]
+
+
+def compact_map(values, dtype=np.float32, max_levels=256):
+    """
+    Return the most compact form of a footprint map.
+
+    Parameters
+    ----------
+    values : np.array or dict of np.array
+        A HEALpix map, or a dict of them (e.g., keyed by filter)
+    dtype : np.dtype (np.float32)
+        Type to store the values as
+    max_levels : int (256)
+        Use a Level_map if there are at most this many distinct values, otherwise a dtype array.
+
+    Returns
+    -------
+    result : Level_map, np.array, or a dict of them
+    """
+    if isinstance(values, dict):
+        return dict([(key, compact_map(values[key], dtype=dtype, max_levels=max_levels)) for key in values])
+    values = np.asarray(values)
+    if np.unique(values).size <= max_levels:
+        return Level_map.from_array(values, dtype=dtype)
+    return values.astype(dtype)
+
+
+def _downcast(value, dtype, converted):
+    """Convert a float array (or list of them) to dtype, converting each distinct array only once
+    """
+    if isinstance(value, list):
+        return [_downcast(val, dtype, converted) for val in value]
+    if not isinstance(value, np.ndarray) or value.dtype.kind != 'f' or value.dtype.itemsize <= np.dtype(dtype).itemsize:
+        return value
+    if value.base is not None:
+        # A view of a shared array (e.g., Stacked_footprints), copying it would lose the sharing
+        return value
+    if id(value) not in converted:
+        converted[id(value)] = (value, value.astype(dtype))
+    return converted[id(value)][1]
+
+
+def compact_basis_functions(scheduler, dtype=np.float32, verbose=True):
+    """
+    Store the footprint weights held by every basis function as float32.
+
+    The basis functions compute rewards with plain numpy, so they work on the smaller arrays
+    unchanged; the weights are at most a few significant figures, so float32 doesn't change the
+    rewards meaningfully. Arrays shared between basis functions stay shared. Views of stacked
+    arrays are left alone (build those as float32 to begin with, see rolling_footprints), and
+    so are survey features, which include MJDs.
+
+    Parameters
+    ----------
+    scheduler : Core_scheduler
+    dtype : np.dtype (np.float32)
+    verbose : bool (True)
+
+    Returns
+    -------
+    saved : int
+        Bytes saved
+    """
+    converted = {}
+    for i, survey in iter_surveys(scheduler):
+        for basis_function in getattr(survey, 'basis_functions', []):
+            basis_function = getattr(basis_function, '_shared', basis_function)
+            for attr in _footprint_attrs:
+                value = getattr(basis_function, attr, None)
+                if value is not None:
+                    setattr(basis_function, attr, _downcast(value, dtype, converted))
+    saved = int(np.sum([old.nbytes - new.nbytes for old, new in converted.values()]))
+    if verbose:
+        print('Compacted %i footprint arrays, saving %.1f MB' % (len(converted), saved/1e6))
+    return saved
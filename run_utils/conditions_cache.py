@@ -0,0 +1,194 @@
+import numpy as np
+import hashlib
+import time
+from collections import OrderedDict
+
+__all__ = ['Conditions_cache', 'install_conditions_cache']
+
+
+def _args_key(value):
+    """A hashable stand-in for call arguments, arrays by their contents
+    """
+    if isinstance(value, np.ndarray):
+        return ('array', value.dtype.str, value.shape,
+                hashlib.sha1(np.ascontiguousarray(value).tobytes()).hexdigest())
+    if isinstance(value, dict):
+        return ('dict',) + tuple([(key, _args_key(value[key])) for key in sorted(value, key=str)])
+    if isinstance(value, (list, tuple)):
+        return (type(value).__name__,) + tuple([_args_key(val) for val in value])
+    try:
+        hash(value)
+    except TypeError:
+        return repr(value)
+    return value
+
+
+class Conditions_cache(object):
+    """
+    A time-quantized LRU cache for the per-pixel maps that go into Conditions.
+
+    Values are keyed on (name, floor(mjd/tolerance)) and the arguments of the call, so any
+    two requests with the same arguments within the same tolerance bin share a result.
+
+    Parameters
+    ----------
+    tolerance : float (30.)
+        Width of the time bins (seconds)
+    maxsize : int (64)
+        Most entries to keep before evicting the least recently used
+    """
+    def __init__(self, tolerance=30., maxsize=64):
+        self.tolerance = tolerance/3600./24.
+        self.maxsize = maxsize
+        self.cache = OrderedDict()
+        self.hits = {}
+        self.misses = {}
+        self.compute_time = {}
+        self.patches = []
+        self.attached = False
+
+    def get(self, name, mjd, compute, args=()):
+        """
+        Return the cached value for name at mjd, calling compute() to make it on a miss.
+
+        args are whatever else the value depends on (e.g., the args and kwargs of the call),
+        arrays compared by their contents.
+        """
+        key = (name, int(np.floor(mjd/self.tolerance)), _args_key(args))
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.hits[name] = self.hits.get(name, 0) + 1
+            return self.cache[key]
+        t0 = time.time()
+        value = compute()
+        self.compute_time[name] = self.compute_time.get(name, 0.) + time.time() - t0
+        self.misses[name] = self.misses.get(name, 0) + 1
+        self.cache[key] = value
+        if len(self.cache) > self.maxsize:
+            self.cache.popitem(last=False)
+        return value
+
+    def clear(self):
+        self.cache.clear()
+
+    def patch(self, obj, attr, wrapper):
+        """Replace obj.attr with a cached wrapper, remembering how to undo it
+        """
+        was_instance_attr = attr in obj.__dict__
+        self.patches.append((obj, attr, getattr(obj, attr), wrapper, was_instance_attr))
+        setattr(obj, attr, wrapper)
+        self.attached = True
+
+    def detach(self):
+        """
+        Put back the uncached methods.
+
+        The wrappers are closures, so this needs to be done before pickling anything that
+        references the patched objects (e.g., the scheduler holding the conditions). Does
+        nothing if already detached.
+        """
+        if not self.attached:
+            return
+        self.attached = False
+        for obj, attr, original, wrapper, was_instance_attr in self.patches:
+            if was_instance_attr:
+                setattr(obj, attr, original)
+            else:
+                delattr(obj, attr)
+
+    def attach(self):
+        """Re-install the cached wrappers after a detach
+        """
+        self.attached = True
+        for obj, attr, original, wrapper, was_instance_attr in self.patches:
+            setattr(obj, attr, wrapper)
+
+    def stats(self):
+        """
+        Returns
+        -------
+        result : dict
+            Keyed by name, with hits, misses, hit rate and estimated time saved (s)
+        """
+        result = {}
+        for name in self.misses:
+            hits = self.hits.get(name, 0)
+            misses = self.misses[name]
+            result[name] = {'hits': hits, 'misses': misses, 'hit_rate': hits/float(hits+misses),
+                            'time_saved': self.compute_time[name]/misses*hits}
+        return result
+
+    def print_stats(self):
+        stats = self.stats()
+        for name in stats:
+            print('conditions cache %s: %.1f%% hits, saved ~%.1f s' % (name, stats[name]['hit_rate']*100,
+                                                                     stats[name]['time_saved']))
+
+
+def install_conditions_cache(observatory, tolerance=30., maxsize=64):
+    """
+    Cache the per-pixel maps Model_observatory.return_conditions computes.
+
+    Sky brightness, seeing and the alt/az/airmass maps are reused for any request within the
+    same tolerance bin. Things that depend on the telescope state (slew times, current filter)
+    are still computed every time.
+
+    Parameters
+    ----------
+    observatory : Model_observatory
+    tolerance : float (30.)
+        Width of the time bins (seconds)
+    maxsize : int (64)
+        Most entries to keep
+
+    Returns
+    -------
+    cache : Conditions_cache
+    """
+    cache = Conditions_cache(tolerance=tolerance, maxsize=maxsize)
+
+    # Sky brightness for every pixel, returnMags(mjd)
+    sky_model = observatory.sky_model
+    if hasattr(sky_model, 'returnMags'):
+        return_mags = sky_model.returnMags
+
+        def cached_mags(mjd, *args, **kwargs):
+            return cache.get('skybrightness', mjd, lambda: return_mags(mjd, *args, **kwargs),
+                             args=(args, kwargs))
+        cache.patch(sky_model, 'returnMags', cached_mags)
+
+    # The seeing model is evaluated on the airmass of every visible pixel
+    if hasattr(observatory, 'seeing_model'):
+        seeing_model = observatory.seeing_model
+
+        class Cached_seeing(object):
+            # Keep the attributes the observatory reads off the seeing model
+            def __getattr__(self, attr):
+                return getattr(seeing_model, attr)
+
+            def __call__(self, *args, **kwargs):
+                return cache.get('seeing', observatory.mjd, lambda: seeing_model(*args, **kwargs),
+                                 args=(args, kwargs))
+        cache.patch(observatory, 'seeing_model', Cached_seeing())
+
+    # alt, az and airmass of every pixel are computed by the conditions object
+    conditions = getattr(observatory, 'conditions', None)
+    if conditions is not None and hasattr(conditions, 'calc_altaz'):
+        calc_altaz = conditions.calc_altaz
+
+        def cached_altaz():
+            def compute():
+                calc_altaz()
+                return conditions._alt, conditions._az
+            conditions._alt, conditions._az = cache.get('altaz', conditions.mjd, compute)
+        cache.patch(conditions, 'calc_altaz', cached_altaz)
+    if conditions is not None and hasattr(conditions, 'calc_airmass'):
+        calc_airmass = conditions.calc_airmass
+
+        def cached_airmass():
+            def compute():
+                calc_airmass()
+                return conditions._airmass
+            conditions._airmass = cache.get('airmass', conditions.mjd, compute)
+        cache.patch(conditions, 'calc_airmass', cached_airmass)
+    return cache
@@ -0,0 +1,77 @@
+import numpy as np
+import os
+from .footprint_cache import footprint_cache_dir, _save, _load
+
+__all__ = ['coordinate_table', 'ra_dec_hp_map', 'galactic_hp_map', 'ecliptic_hp_map']
+
+# nside -> dict of coordinate arrays
+_tables = {}
+
+
+def _compute_table(nside):
+    import healpy as hp
+    from astropy.coordinates import SkyCoord
+    from astropy import units as u
+    from lsst.sims.utils import _hpid2RaDec
+
+    ra, dec = _hpid2RaDec(nside, np.arange(hp.nside2npix(nside)))
+    coord = SkyCoord(ra=ra*u.rad, dec=dec*u.rad)
+    galactic = coord.galactic
+    ecliptic = coord.barycentrictrueecliptic
+    return {'ra': ra, 'dec': dec,
+            'gal_l': galactic.l.radian, 'gal_b': galactic.b.radian,
+            'eclip_lon': ecliptic.lon.radian, 'eclip_lat': ecliptic.lat.radian}
+
+
+def coordinate_table(nside=32):
+    """
+    RA, dec, galactic and ecliptic coordinates of every HEALpix center.
+
+    The astropy transforms are done once per nside and saved next to the footprint cache,
+    so later processes just memory map the arrays. The arrays are shared, so they are
+    read-only.
+
+    Parameters
+    ----------
+    nside : int (32)
+
+    Returns
+    -------
+    table : dict
+        'ra', 'dec', 'gal_l', 'gal_b', 'eclip_lon' and 'eclip_lat' arrays (radians). Galactic
+        longitude runs from 0 to 2pi, as astropy returns it.
+    """
+    if nside not in _tables:
+        path = os.path.join(footprint_cache_dir(), 'coordinates_nside%i' % nside)
+        if os.path.isdir(path):
+            table = _load(path)
+        else:
+            table = _compute_table(nside)
+            os.makedirs(footprint_cache_dir(), exist_ok=True)
+            _save(table, path)
+        for key in table:
+            table[key] = np.asarray(table[key])
+            table[key].flags.writeable = False
+        _tables[nside] = table
+    return _tables[nside]
+
+
+def ra_dec_hp_map(nside=32):
+    """Return ra, dec (radians) of every HEALpix center
+    """
+    table = coordinate_table(nside)
+    return table['ra'], table['dec']
+
+
+def galactic_hp_map(nside=32):
+    """Return galactic l, b (radians) of every HEALpix center
+    """
+    table = coordinate_table(nside)
+    return table['gal_l'], table['gal_b']
+
+
+def ecliptic_hp_map(nside=32):
+    """Return ecliptic lon, lat (radians) of every HEALpix center
+    """
+    table = coordinate_table(nside)
+    return table['eclip_lon'], table['eclip_lat']
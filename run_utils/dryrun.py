@@ -0,0 +1,121 @@
+import numpy as np
+import time
+from .utils import survey_label, iter_surveys
+
+__all__ = ['preflight']
+
+
+def _footprint_total(fp):
+    """
+    Sum of the absolute values in a footprint, going into dicts (e.g., per filter), lists and
+    structured arrays. None if there is something in it that isn't numeric.
+    """
+    if isinstance(fp, dict):
+        fp = list(fp.values())
+    elif isinstance(fp, np.ndarray) and fp.dtype.names is not None:
+        fp = [fp[name] for name in fp.dtype.names]
+    if isinstance(fp, (list, tuple)):
+        totals = [_footprint_total(value) for value in fp]
+        if any([total is None for total in totals]):
+            return None
+        return np.sum(totals)
+    try:
+        return np.nansum(np.abs(np.asarray(fp, dtype=float)))
+    except (TypeError, ValueError):
+        return None
+
+
+def _footprint_checks(survey):
+    """Return warnings for basis functions in a survey with an empty footprint
+    """
+    warns = []
+    for basis_function in getattr(survey, 'basis_functions', []):
+        for attr in ['footprint', 'footprints']:
+            fp = getattr(basis_function, attr, None)
+            if fp is None:
+                continue
+            total = _footprint_total(fp)
+            if total is None:
+                warns.append('%s %s could not be checked' % (type(basis_function).__name__, attr))
+            elif total == 0:
+                warns.append('%s has an empty %s' % (type(basis_function).__name__, attr))
+    return warns
+
+
+def preflight(observatory, scheduler, survey_length=365.25, n_samples=30, sun_alt_limit=-12., seed=42):
+    """
+    Check a scheduler configuration without running the simulation.
+
+    Evaluates every survey's reward at a set of randomly sampled night-time conditions across
+    the survey, and reports which surveys are ever feasible, the range of rewards, and the
+    cost of evaluating each survey.
+
+    Parameters
+    ----------
+    observatory : Model_observatory
+    scheduler : Core_scheduler
+    survey_length : float (365.25)
+        The span to sample conditions from (days)
+    n_samples : int (30)
+        How many night-time conditions to evaluate
+    sun_alt_limit : float (-12.)
+        Only sample times with the sun below this altitude (degrees)
+    seed : int (42)
+
+    Returns
+    -------
+    report : list of dict
+        One per survey, with the tier, name, number of samples feasible, min and max finite
+        reward, mean evaluation time (ms), and any warnings.
+    """
+    rng = np.random.RandomState(seed)
+    mjd_start = observatory.mjd + 0
+    t0 = time.time()
+
+    report = []
+    for i, survey in iter_surveys(scheduler):
+        report.append({'tier': i, 'name': survey_label(survey), 'survey': survey,
+                       'n_feasible': 0, 'reward_min': np.inf, 'reward_max': -np.inf,
+                       'time': 0., 'warnings': _footprint_checks(survey)})
+
+    n_done = 0
+    n_tries = 0
+    while n_done < n_samples and n_tries < n_samples*20:
+        n_tries += 1
+        observatory.mjd = mjd_start + rng.uniform(0, survey_length)
+        conditions = observatory.return_conditions()
+        if conditions.sunAlt > np.radians(sun_alt_limit):
+            continue
+        n_done += 1
+        scheduler.update_conditions(conditions)
+        for row in report:
+            t1 = time.time()
+            reward = row['survey'].calc_reward_function(conditions)
+            row['time'] += time.time() - t1
+            finite = np.asarray(reward, dtype=float)
+            finite = finite[np.isfinite(finite)]
+            if finite.size > 0:
+                row['n_feasible'] += 1
+                row['reward_min'] = min(row['reward_min'], np.min(finite))
+                row['reward_max'] = max(row['reward_max'], np.max(finite))
+
+    # Put the observatory back where it was
+    observatory.mjd = mjd_start
+    scheduler.update_conditions(observatory.return_conditions())
+
+    print('Dry run: evaluated %i conditions in %.1f s' % (n_done, time.time() - t0))
+    per_decision = 0.
+    for row in report:
+        del row['survey']
+        row['time'] = row['time']/max(n_done, 1)*1e3
+        per_decision += row['time']
+        if row['n_feasible'] == 0:
+            row['warnings'].append('never feasible')
+            print('tier %i, %s: never feasible, %.2f ms/eval %s' % (row['tier'], row['name'], row['time'],
+                                                                 '; '.join(row['warnings'])))
+        else:
+            print('tier %i, %s: feasible %i/%i, reward %.3g to %.3g, %.2f ms/eval %s' %
+                  (row['tier'], row['name'], row['n_feasible'], n_done, row['reward_min'], row['reward_max'],
+                   row['time'], '; '.join(row['warnings'])))
+    print('Estimated cost per decision if every survey is evaluated: %.1f ms' % per_decision)
+    return report
@@ -0,0 +1,187 @@
+import numpy as np
+import hashlib
+from .utils import iter_surveys
+from .shared_bf import _fingerprint
+
+__all__ = ['Shared_feature', 'Feature_store', 'build_feature_store']
+
+
+class Shared_feature(object):
+    """
+    Stands in for a survey feature that several basis functions keep identical copies of.
+
+    Each observation is only added once, however many basis functions pass it on. Everything
+    else (e.g., .feature) goes through to the one real feature.
+
+    Parameters
+    ----------
+    feature : BaseSurveyFeature
+    """
+    def __init__(self, feature):
+        self._shared = feature
+        self._last_mjd = -np.inf
+        self.n_users = 1
+        self.updates = 0
+        self.skipped = 0
+
+    def __getattr__(self, attr):
+        shared = self.__dict__.get('_shared')
+        if shared is None or attr.startswith('__'):
+            raise AttributeError(attr)
+        return getattr(shared, attr)
+
+    def add_observation(self, observation, **kwargs):
+        # Observations arrive in time order, but maybe survey by survey for a batch
+        if observation['mjd'] <= self._last_mjd:
+            self.skipped += 1
+            return
+        self._last_mjd = observation['mjd']
+        self.updates += 1
+        self._shared.add_observation(observation, **kwargs)
+
+
+def _owner_key(owner, features):
+    """
+    Class and parameters of what holds a dict of features, leaving out the features themselves
+    (and, for a survey, its basis functions). Owners can filter the observations they pass on,
+    so features are only shared between owners that would pass them the same ones.
+    """
+    hasher = hashlib.sha1()
+    state = dict([(key, value) for key, value in vars(owner).items()
+                  if value is not features and key not in ('basis_functions', 'extra_features')])
+    hasher.update(('<%s.%s>' % (type(owner).__module__, type(owner).__qualname__)).encode())
+    _fingerprint(state, hasher, set())
+    return hasher.hexdigest()
+
+
+def _feature_key(feature, survey, owner_key):
+    hasher = hashlib.sha1()
+    hasher.update(repr(getattr(survey, 'ignore_obs', None)).encode())
+    hasher.update(owner_key.encode())
+    _fingerprint(feature, hasher, set())
+    return hasher.hexdigest()
+
+
+def _feature_dicts(survey):
+    """(owner, features) for all the dicts of features a survey and its basis functions hold
+    """
+    result = []
+    if isinstance(getattr(survey, 'extra_features', None), dict):
+        result.append((survey, survey.extra_features))
+    for basis_function in getattr(survey, 'basis_functions', []):
+        basis_function = getattr(basis_function, '_shared', basis_function)
+        if isinstance(getattr(basis_function, 'survey_features', None), dict):
+            result.append((basis_function, basis_function.survey_features))
+    return result
+
+
+class Feature_store(object):
+    """
+    One copy of each distinct survey feature, with the per-pixel arrays stacked by feature class.
+
+    Use build_feature_store to make one from a scheduler.
+
+    Attributes
+    ----------
+    features : list of Shared_feature
+    arrays : dict
+        Keyed by feature class name, a (n_features, npix) array. Row i is the .feature array of
+        rows[name][i].
+    rows : dict
+        Keyed by feature class name, the list of Shared_feature in each stacked array
+    """
+    def __init__(self):
+        self.features = []
+        self.arrays = {}
+        self.rows = {}
+        self.n_replaced = 0
+
+    def stack(self):
+        """Move the per-pixel feature arrays into one array per feature class, leaving views behind
+        """
+        groups = {}
+        for shared in self.features:
+            value = getattr(shared._shared, 'feature', None)
+            if not isinstance(value, np.ndarray) or value.ndim != 1:
+                continue
+            key = (type(shared._shared).__name__, value.dtype.str, value.size)
+            groups.setdefault(key, []).append(shared)
+        for (name, dtype, size) in groups:
+            members = groups[(name, dtype, size)]
+            if name in self.arrays:
+                # Same class with a different dtype or size, keep it separate
+                name = '%s_%s_%i' % (name, dtype, size)
+            array = np.zeros((len(members), size), dtype=dtype)
+            for i, shared in enumerate(members):
+                array[i] = shared._shared.feature
+                shared._shared.feature = array[i]
+            self.arrays[name] = array
+            self.rows[name] = members
+
+    def check_views(self):
+        """
+        Returns the features that have rebound their .feature array rather than updating it in
+        place, so no longer share memory with the stacked array.
+        """
+        result = []
+        for name in self.rows:
+            for i, shared in enumerate(self.rows[name]):
+                if not np.shares_memory(shared._shared.feature, self.arrays[name][i]):
+                    result.append(shared)
+        return result
+
+    def nbytes(self):
+        return np.sum([self.arrays[name].nbytes for name in self.arrays])
+
+    def print_stats(self):
+        updates = np.sum([shared.updates for shared in self.features])
+        skipped = np.sum([shared.skipped for shared in self.features])
+        print('Feature store: %i features in place of %i, %i updates done, %i skipped' %
+              (len(self.features), self.n_replaced, updates, skipped))
+
+
+def build_feature_store(scheduler, stack=True, verbose=True):
+    """
+    Replace identical survey features across all surveys and basis functions with shared ones.
+
+    Features are matched by class and full state, plus the class and parameters of the basis
+    function (or survey) holding them and what observations their survey ignores, so features
+    are only merged when they are passed the same observations. Every match gets one Shared_feature, so a visit updates it once rather than once per basis
+    function. Call this before the scheduler has seen any observations (features with different
+    state are never merged).
+
+    Parameters
+    ----------
+    scheduler : Core_scheduler
+    stack : bool (True)
+        Also put the per-pixel arrays into one (n_features, npix) array per feature class, with
+        each feature holding a view of its row.
+    verbose : bool (True)
+
+    Returns
+    -------
+    store : Feature_store
+    """
+    store = Feature_store()
+    by_key = {}
+    for i, survey in iter_surveys(scheduler):
+        for owner, features in _feature_dicts(survey):
+            owner_key = _owner_key(owner, features)
+            for name in features:
+                feature = features[name]
+                if isinstance(feature, Shared_feature):
+                    continue
+                key = _feature_key(feature, survey, owner_key)
+                if key not in by_key:
+                    by_key[key] = Shared_feature(feature)
+                    store.features.append(by_key[key])
+                else:
+                    by_key[key].n_users += 1
+                features[name] = by_key[key]
+                store.n_replaced += 1
+    if stack:
+        store.stack()
+    if verbose:
+        print('Feature store: %i features in place of %i, %.1f MB stacked' %
+              (len(store.features), store.n_replaced, store.nbytes()/1e6))
+    return store
@@ -0,0 +1,193 @@
+import numpy as np
+import copy
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import shutil
+import tempfile
+from .startup import startup_phase
+
+__all__ = ['footprint_cache', 'cached_footprint', 'clear_footprint_cache', 'footprint_cache_dir']
+
+# In-process memo, cache key -> result
+_memo = {}
+# Bump when the way results are keyed or stored changes, so old entries are not read
+_cache_version = 1
+# Packages whose changes can change a footprint without changing the generator's source
+_versioned_packages = ['lsst.sims.featureScheduler', 'healpy']
+_versions = None
+
+
+def footprint_cache_dir():
+    """Where footprints are cached on disk. Set FBS_FOOTPRINT_CACHE to override.
+    """
+    default = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'footprint_cache')
+    return os.environ.get('FBS_FOOTPRINT_CACHE', default)
+
+
+def _hash_value(value, hasher):
+    """Feed a hashable description of value into hasher
+    """
+    if isinstance(value, np.ndarray):
+        hasher.update(str((value.dtype.str, value.shape)).encode())
+        hasher.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        hasher.update(b'{')
+        for key in sorted(value.keys(), key=str):
+            hasher.update(repr(key).encode())
+            _hash_value(value[key], hasher)
+        hasher.update(b'}')
+    elif isinstance(value, (list, tuple)):
+        hasher.update(b'[')
+        for val in value:
+            _hash_value(val, hasher)
+        hasher.update(b']')
+    else:
+        hasher.update(repr(value).encode())
+
+
+def _func_id(func):
+    """Identify a generator by its name and source, so identical copies in different scripts share entries
+    """
+    try:
+        source = inspect.getsource(func)
+    except (OSError, TypeError):
+        source = '%s.%s' % (func.__module__, func.__qualname__)
+    return func.__name__ + '\n' + source
+
+
+def _package_versions():
+    """
+    The cache format version and the installed versions of the packages footprints are built
+    with, as a string. Packages that aren't installed count as 'none'.
+    """
+    global _versions
+    if _versions is None:
+        import importlib
+        versions = ['cache format %i' % _cache_version]
+        for name in _versioned_packages:
+            try:
+                module = importlib.import_module(name)
+            except ImportError:
+                versions.append('%s none' % name)
+                continue
+            version = getattr(module, '__version__', None)
+            if version is None:
+                try:
+                    version = getattr(importlib.import_module(name + '.version'), '__version__', 'unknown')
+                except ImportError:
+                    version = 'unknown'
+            versions.append('%s %s' % (name, version))
+        _versions = '\n'.join(versions)
+    return _versions
+
+
+def _cache_key(func, args, kwargs):
+    try:
+        bound = inspect.signature(func).bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = dict(bound.arguments)
+    except (TypeError, ValueError):
+        arguments = {'args': args, 'kwargs': kwargs}
+    hasher = hashlib.sha1()
+    hasher.update(_package_versions().encode())
+    hasher.update(_func_id(func).encode())
+    _hash_value(arguments, hasher)
+    return func.__name__ + '_' + hasher.hexdigest()
+
+
+def _save(result, path):
+    """Write a result as memory-mappable .npy files. Anything that isn't an array or dict of arrays is pickled.
+    """
+    temp_dir = tempfile.mkdtemp(dir=os.path.dirname(path))
+    if isinstance(result, np.ndarray):
+        np.save(os.path.join(temp_dir, 'array.npy'), result)
+    elif isinstance(result, dict) and all([isinstance(val, np.ndarray) for val in result.values()]):
+        with open(os.path.join(temp_dir, 'keys.pkl'), 'wb') as f:
+            pickle.dump(list(result.keys()), f)
+        for i, key in enumerate(result):
+            np.save(os.path.join(temp_dir, '%i.npy' % i), result[key])
+    else:
+        with open(os.path.join(temp_dir, 'result.pkl'), 'wb') as f:
+            pickle.dump(result, f)
+    try:
+        os.rename(temp_dir, path)
+    except OSError:
+        # Another process got there first
+        shutil.rmtree(temp_dir)
+
+
+def _load(path):
+    """Load a cached result, memory mapping the arrays read-only
+    """
+    if os.path.isfile(os.path.join(path, 'array.npy')):
+        return np.load(os.path.join(path, 'array.npy'), mmap_mode='r')
+    if os.path.isfile(os.path.join(path, 'keys.pkl')):
+        with open(os.path.join(path, 'keys.pkl'), 'rb') as f:
+            keys = pickle.load(f)
+        return dict([(key, np.load(os.path.join(path, '%i.npy' % i), mmap_mode='r')) for i, key in enumerate(keys)])
+    with open(os.path.join(path, 'result.pkl'), 'rb') as f:
+        return pickle.load(f)
+
+
+def _copy(result):
+    """Hand out a private, writeable copy so callers can modify maps in place
+    """
+    if isinstance(result, np.ndarray):
+        return np.array(result)
+    if isinstance(result, dict):
+        return dict([(key, _copy(val)) for key, val in result.items()])
+    if isinstance(result, list):
+        return [_copy(val) for val in result]
+    return copy.deepcopy(result)
+
+
+def cached_footprint(func, *args, **kwargs):
+    """
+    Call a footprint generator, using the on-disk and in-process caches.
+
+    Results are keyed on the generator's name and source code plus all its arguments (with
+    defaults filled in), the installed scheduler and healpy versions and the cache format
+    version, so changing any of those makes a new entry.
+    Arrays are stored as .npy files and memory mapped when loaded. Every call returns a
+    fresh copy, so it is safe to modify the result.
+
+    Parameters
+    ----------
+    func : callable
+        The footprint generator, e.g., standard_goals
+    *args, **kwargs
+        Passed to func
+    """
+    with startup_phase('footprints'):
+        key = _cache_key(func, args, kwargs)
+        if key not in _memo:
+            cache_dir = footprint_cache_dir()
+            path = os.path.join(cache_dir, key)
+            if os.path.isdir(path):
+                _memo[key] = _load(path)
+            else:
+                result = func(*args, **kwargs)
+                os.makedirs(cache_dir, exist_ok=True)
+                _save(result, path)
+                _memo[key] = _copy(result)
+        return _copy(_memo[key])
+
+
+def footprint_cache(func):
+    """Decorator to send calls of a footprint generator through cached_footprint
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return cached_footprint(func, *args, **kwargs)
+    return wrapper
+
+
+def clear_footprint_cache(disk=False):
+    """Empty the in-process memo, and optionally the on-disk cache
+    """
+    _memo.clear()
+    if disk and os.path.isdir(footprint_cache_dir()):
+        shutil.rmtree(footprint_cache_dir())
@@ -0,0 +1,100 @@
+import numpy as np
+import copy
+from .checkpoint import load_checkpoint
+from .batch import add_observations
+
+__all__ = ['fork_from_snapshot', 'compare_observations']
+
+
+def compare_observations(obs1, obs2, keys=['RA', 'dec', 'filter', 'mjd'], tol=1e-5):
+    """
+    Check that two arrays of completed observations are the same.
+
+    Parameters
+    ----------
+    obs1 : np.array
+        Observations, as returned by sim_runner
+    obs2 : np.array
+    keys : list of str
+        Which columns to compare
+    tol : float (1e-5)
+        Tolerance for float columns (days for mjd, radians otherwise)
+
+    Returns
+    -------
+    n_match : int
+        The number of observations that match before the first difference. Equal to
+        obs1.size if everything matches.
+    """
+    n_check = min(obs1.size, obs2.size)
+    match = np.ones(n_check, dtype=bool)
+    for key in keys:
+        if obs1.dtype[key].kind in 'SU':
+            match &= obs1[key][:n_check] == obs2[key][:n_check]
+        else:
+            match &= np.abs(obs1[key][:n_check] - obs2[key][:n_check]) <= tol
+    mismatch = np.where(~match)[0]
+    if mismatch.size > 0:
+        return mismatch[0]
+    return n_check
+
+
+def fork_from_snapshot(snapshot_file, observatory, scheduler, filter_scheduler, verify_nights=None):
+    """
+    Start a variant simulation from a snapshot of a shared prefix run.
+
+    The snapshot is a checkpoint written by sim_runner(snapshot_file=...) at the end of the prefix.
+    The variant's own surveys are kept, and brought up to date by replaying the prefix visits
+    through add_observations.
+
+    Parameters
+    ----------
+    snapshot_file : str
+        The snapshot written at the end of the prefix run
+    observatory : Model_observatory
+        A freshly built observatory, at the same start mjd as the prefix run.
+    scheduler : Core_scheduler
+        The variant's freshly built scheduler
+    filter_scheduler : simple_filter_sched
+        The variant's filter scheduler
+    verify_nights : int (None)
+        If set, simulate this many nights of the variant from scratch and raise a ValueError
+        if the visits do not match the prefix run. This is the check that the variant really
+        is identical to the prefix over that span.
+
+    Returns
+    -------
+    observatory, scheduler, filter_scheduler, observations, runner_state
+    """
+    if verify_nights is not None:
+        # Import here to avoid a circular import
+        from .sim_runner import sim_runner
+        mjd0 = observatory.mjd + 0
+        trial_scheduler = copy.deepcopy(scheduler)
+        trial_filter_sched = copy.deepcopy(filter_scheduler)
+        # Keep the global random state the same for the real run.
+        random_state = np.random.get_state()
+        observatory, trial_scheduler, trial_obs = sim_runner(observatory, trial_scheduler,
+                                                             filter_scheduler=trial_filter_sched,
+                                                             survey_length=verify_nights, filename=None,
+                                                             verbose=False)
+        np.random.set_state(random_state)
+    observatory, _prefix_scheduler, _prefix_filter_sched, observations, runner_state = load_checkpoint(snapshot_file,
+                                                                                                    observatory)
+    if verify_nights is not None:
+        if np.abs(runner_state['mjd_start'] - mjd0) > 1e-5:
+            raise ValueError('Snapshot starts at mjd %f, variant starts at mjd %f' %
+                             (runner_state['mjd_start'], mjd0))
+        prefix_obs = np.array(observations)[:, 0]
+        prefix_obs = prefix_obs[np.where(prefix_obs['mjd'] < mjd0 + verify_nights)]
+        n_match = compare_observations(prefix_obs, trial_obs)
+        if n_match != prefix_obs.size:
+            raise ValueError('Variant diverges from the snapshot prefix at visit %i of %i' %
+                             (n_match, prefix_obs.size))
+        print('Verified first %i visits match the snapshot prefix' % n_match)
+
+    # Bring the variant's surveys up to date
+    if len(observations) > 0:
+        add_observations(scheduler, np.array(observations)[:, 0], filter_scheduler=filter_scheduler)
+    scheduler.update_conditions(observatory.return_conditions())
+    return observatory, scheduler, filter_scheduler, observations, runner_state
@@ -0,0 +1,174 @@
+import numpy as np
+from .utils import survey_label, iter_surveys, full_sky_call
+
+__all__ = ['reward_kind', 'Cached_reward_terms', 'incremental_rewards', 'print_incremental_stats']
+
+# How often the value of a basis function can change:
+# 'static' never, 'observations' only when it is given an observation, 'night' also when the
+# night changes, 'conditions' whenever the conditions do (pointing, time, filter).
+_kinds = ['static', 'observations', 'night', 'conditions']
+
+# Kinds of the basis functions the experiment scripts use, where it isn't 'conditions'. A
+# basis function can also declare its own with a reward_kind attribute.
+_class_kinds = {'Footprint_basis_function': 'observations',
+                'Map_modulo_basis_function': 'night'}
+
+
+def _unwrap(basis_function):
+    """The basis function inside any run_utils wrappers (Shared_basis_function, Coarse_basis_function)
+    """
+    while '_shared' in getattr(basis_function, '__dict__', {}):
+        basis_function = basis_function.__dict__['_shared']
+    return basis_function
+
+
+def reward_kind(basis_function):
+    """
+    How often a basis function's value can change, one of 'static', 'observations', 'night'
+    or 'conditions'.
+
+    Uses the basis function's reward_kind attribute if it has one, then the known classes,
+    then the scheduler's own update_on_mjd/update_on_newobs flags. Anything else is taken to
+    depend on the conditions, which is always safe.
+    """
+    inner = _unwrap(basis_function)
+    kind = getattr(inner, 'reward_kind', None)
+    if kind is None:
+        kind = _class_kinds.get(type(inner).__name__)
+    if kind is None and getattr(inner, 'update_on_mjd', True) is False:
+        kind = 'observations' if getattr(inner, 'update_on_newobs', True) else 'static'
+    if kind is None:
+        kind = 'conditions'
+    if kind not in _kinds:
+        raise ValueError('reward_kind should be one of %s, not %s' % (_kinds, kind))
+    return kind
+
+
+class Cached_reward_terms(object):
+    """
+    Stands in for the basis functions of a survey whose values only change with new
+    observations or a new night, holding their weighted sum.
+
+    The sum is recomputed only after an observation is added or the night changes. With
+    verify=True it is recomputed on every call anyway, and an AssertionError is raised if it
+    doesn't match the cached one.
+
+    Parameters
+    ----------
+    basis_functions : list of Base_basis_function
+    weights : list of float
+    verify : bool (False)
+    """
+    def __init__(self, basis_functions, weights, verify=False):
+        self.basis_functions = list(basis_functions)
+        self.weights = list(weights)
+        self.kinds = [reward_kind(basis_function) for basis_function in self.basis_functions]
+        self.verify = verify
+        self._n_obs = 0
+        self._key = None
+        self._value = None
+        self.nside = getattr(self.basis_functions[0], 'nside', None)
+        self.calls = 0
+        self.evaluations = 0
+
+    def _sum(self, conditions, **kwargs):
+        total = 0
+        for basis_function, weight in zip(self.basis_functions, self.weights):
+            total = total + basis_function(conditions, **kwargs)*weight
+        return total
+
+    def _value_key(self, conditions):
+        key = []
+        if 'observations' in self.kinds or 'night' in self.kinds:
+            key.append(self._n_obs)
+        if 'night' in self.kinds:
+            key.append(conditions.night)
+        return tuple(key)
+
+    def __call__(self, conditions, **kwargs):
+        self.calls += 1
+        # The cached sum is for the full sky, work out a subset of pixels separately
+        if not full_sky_call(kwargs, self.nside):
+            self.evaluations += 1
+            return self._sum(conditions, **kwargs)
+        key = self._value_key(conditions)
+        if key != self._key:
+            self.evaluations += 1
+            self._value = self._sum(conditions, **kwargs)
+            self._key = key
+        elif self.verify:
+            full = self._sum(conditions, **kwargs)
+            if not np.array_equal(np.asarray(full), np.asarray(self._value), equal_nan=True):
+                raise AssertionError('Cached reward terms %s changed without a new observation or night' %
+                                     [type(_unwrap(bf)).__name__ for bf in self.basis_functions])
+        # The survey adds it to its reward, copy so the cached sum can't be modified in place
+        if isinstance(self._value, np.ndarray):
+            return self._value.copy()
+        return self._value
+
+    def check_feasibility(self, conditions):
+        return all([basis_function.check_feasibility(conditions) for basis_function in self.basis_functions])
+
+    def add_observation(self, observation, **kwargs):
+        self._n_obs += 1
+        for basis_function in self.basis_functions:
+            basis_function.add_observation(observation, **kwargs)
+
+
+def incremental_rewards(scheduler, verify=False, verbose=True):
+    """
+    Cache the part of each survey's reward that only changes with new observations or a new
+    night.
+
+    The basis functions of every survey are split by reward_kind. Those that aren't
+    'conditions' are replaced, in the survey's basis_functions and basis_weights, by one
+    Cached_reward_terms holding their weighted sum with weight 1. The survey sums its reward
+    as before, but the cached part is only recomputed when it can have changed. The terms are
+    added in a different order, so rewards can differ from the full sum in the last bits.
+
+    Parameters
+    ----------
+    scheduler : Core_scheduler
+    verify : bool (False)
+        Recompute the cached sums on every call and raise an AssertionError if any differ.
+    verbose : bool (True)
+
+    Returns
+    -------
+    cached : list of Cached_reward_terms
+    """
+    cached = []
+    for i, survey in iter_surveys(scheduler):
+        basis_functions = getattr(survey, 'basis_functions', None)
+        weights = getattr(survey, 'basis_weights', None)
+        if basis_functions is None or weights is None:
+            continue
+        if any([isinstance(basis_function, Cached_reward_terms) for basis_function in basis_functions]):
+            continue
+        kinds = [reward_kind(basis_function) for basis_function in basis_functions]
+        slow = [j for j, kind in enumerate(kinds) if kind != 'conditions']
+        if len(slow) < 1:
+            continue
+        terms = Cached_reward_terms([basis_functions[j] for j in slow], [weights[j] for j in slow],
+                                    verify=verify)
+        keep = [j for j, kind in enumerate(kinds) if kind == 'conditions']
+        survey.basis_functions = [terms] + [basis_functions[j] for j in keep]
+        new_weights = [1.] + [weights[j] for j in keep]
+        survey.basis_weights = np.array(new_weights, dtype=float) if isinstance(weights, np.ndarray) else new_weights
+        terms.label = 'tier %i, %s' % (i, survey_label(survey))
+        cached.append(terms)
+    if verbose:
+        n_terms = np.sum([len(terms.basis_functions) for terms in cached])
+        print('Caching %i slowly changing reward terms in %i surveys' % (n_terms, len(cached)))
+    return cached
+
+
+def print_incremental_stats(scheduler):
+    calls = 0
+    evaluations = 0
+    for i, survey in iter_surveys(scheduler):
+        for basis_function in getattr(survey, 'basis_functions', []):
+            if isinstance(basis_function, Cached_reward_terms):
+                calls += basis_function.calls
+                evaluations += basis_function.evaluations
+    print('Cached reward terms: %i of %i sums recomputed' % (evaluations, calls))
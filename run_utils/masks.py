@@ -0,0 +1,192 @@
+import numpy as np
+from .utils import iter_surveys, full_sky_call
+from .shared_bf import Shared_basis_function, _bf_key
+
+__all__ = ['Mask_layer', 'Fused_mask', 'fuse_masks', 'print_mask_stats']
+
+# Basis functions that only mask pixels, returning NaN where masked
+_mask_classes = ['Zenith_shadow_mask_basis_function', 'Zenith_mask_basis_function',
+                 'Moon_avoidance_basis_function', 'Planet_mask_basis_function']
+
+
+def _is_mask(basis_function, weight):
+    """A mask whose only effect on the reward is the NaNs (it has zero weight)
+    """
+    inner = basis_function
+    while '_shared' in getattr(inner, '__dict__', {}):
+        inner = inner.__dict__['_shared']
+    return type(inner).__name__ in _mask_classes and weight == 0
+
+
+class Mask_layer(object):
+    """
+    Computes each distinct mask once per conditions, for all the surveys that use it.
+
+    Each mask is reduced to a boolean array of the pixels it leaves open, and each
+    combination of masks the surveys ask for is kept bit-packed (np.packbits) until the
+    conditions change.
+    """
+    def __init__(self):
+        self.masks = {}
+        self._mjd = None
+        self._good = {}
+        self._packed = {}
+        self._values = {}
+        self.npix = None
+        self.calls = 0
+        self.evaluations = 0
+
+    def add(self, key, basis_function):
+        """Register a mask under key, returning the one already registered if there is one
+        """
+        return self.masks.setdefault(key, basis_function)
+
+    def _check_conditions(self, conditions):
+        if conditions.mjd != self._mjd:
+            self._mjd = conditions.mjd
+            self._good = {}
+            self._packed = {}
+            self._values = {}
+
+    def _mask_good(self, key, conditions):
+        if key not in self._good:
+            self.evaluations += 1
+            good = np.isfinite(self.masks[key](conditions))
+            if np.ndim(good) > 0:
+                self.npix = good.size
+            self._good[key] = good
+        return self._good[key]
+
+    def packed(self, conditions, keys):
+        """
+        Bit-packed array of the pixels none of the masks in keys cover.
+
+        Parameters
+        ----------
+        conditions : Conditions
+        keys : tuple of str
+        """
+        self._check_conditions(conditions)
+        if keys not in self._packed:
+            good = np.logical_and.reduce(np.broadcast_arrays(*[self._mask_good(key, conditions)
+                                                               for key in keys]))
+            self._packed[keys] = np.packbits(np.atleast_1d(good))
+        return self._packed[keys]
+
+    def good(self, conditions, keys):
+        """Boolean array of the pixels none of the masks in keys cover
+        """
+        packed = self.packed(conditions, keys)
+        return np.unpackbits(packed, count=self.npix if self.npix is not None else 1).astype(bool)
+
+    def value(self, conditions, keys):
+        """0 where none of the masks in keys cover a pixel, NaN where any does
+        """
+        self.calls += 1
+        self._check_conditions(conditions)
+        if keys not in self._values:
+            good = self.good(conditions, keys)
+            value = np.where(good, 0., np.nan)
+            if self.npix is None:
+                value = value[0]
+            self._values[keys] = value
+        if isinstance(self._values[keys], np.ndarray):
+            return self._values[keys].copy()
+        return self._values[keys]
+
+
+class Fused_mask(object):
+    """
+    Stands in for all the zero weight masks of a survey, taking their combined value from a
+    Mask_layer.
+
+    Parameters
+    ----------
+    layer : Mask_layer
+    keys : tuple of str
+        The survey's masks in the layer
+    basis_functions : list of Base_basis_function
+        The masks it replaces, for their feasibility checks and observations
+    """
+    def __init__(self, layer, keys, basis_functions):
+        self.layer = layer
+        self.keys = keys
+        self.basis_functions = list(basis_functions)
+        self.nside = getattr(self.basis_functions[0], 'nside', None)
+
+    def __call__(self, conditions, **kwargs):
+        # The layer has full-sky masks, only work out a subset of pixels separately
+        if not full_sky_call(kwargs, self.nside):
+            result = 0.
+            for basis_function in self.basis_functions:
+                result = result + basis_function(conditions, **kwargs)*0
+            return result
+        return self.layer.value(conditions, self.keys)
+
+    def check_feasibility(self, conditions):
+        return all([basis_function.check_feasibility(conditions) for basis_function in self.basis_functions])
+
+    def add_observation(self, observation, **kwargs):
+        for basis_function in self.basis_functions:
+            basis_function.add_observation(observation, **kwargs)
+
+
+def fuse_masks(scheduler, verbose=True):
+    """
+    Compute the masks of all the surveys once per conditions.
+
+    The zero weight zenith, moon and planet masks of each survey are replaced by a single
+    Fused_mask, in the place of the first one. Identical masks (same class and parameters)
+    across surveys are computed once per conditions by a shared Mask_layer, and each survey
+    gets the combination it uses. Masks only add 0 or NaN, so the rewards are unchanged.
+
+    Parameters
+    ----------
+    scheduler : Core_scheduler
+    verbose : bool (True)
+
+    Returns
+    -------
+    layer : Mask_layer
+    """
+    layer = Mask_layer()
+    n_replaced = 0
+    n_surveys = 0
+    for i, survey in iter_surveys(scheduler):
+        basis_functions = getattr(survey, 'basis_functions', None)
+        weights = getattr(survey, 'basis_weights', None)
+        if basis_functions is None or weights is None:
+            continue
+        if any([isinstance(basis_function, Fused_mask) for basis_function in basis_functions]):
+            continue
+        masks = [j for j in range(len(basis_functions)) if _is_mask(basis_functions[j], weights[j])]
+        if len(masks) < 1:
+            continue
+        keys = []
+        for j in masks:
+            basis_function = basis_functions[j]
+            # Counters on the shared wrapper aren't part of what the mask is
+            inner = basis_function._shared if isinstance(basis_function, Shared_basis_function) else basis_function
+            key = _bf_key(inner, None)
+            layer.add(key, basis_function)
+            keys.append(key)
+        fused = Fused_mask(layer, tuple(sorted(set(keys))), [basis_functions[j] for j in masks])
+        keep = [j for j in range(len(basis_functions)) if j not in masks or j == masks[0]]
+        survey.basis_functions = [fused if j == masks[0] else basis_functions[j] for j in keep]
+        new_weights = [weights[j] for j in keep]
+        survey.basis_weights = np.array(new_weights) if isinstance(weights, np.ndarray) else new_weights
+        n_replaced += len(masks)
+        n_surveys += 1
+    if verbose:
+        print('Fusing %i masks in %i surveys into %i distinct masks' % (n_replaced, n_surveys, len(layer.masks)))
+    return layer
+
+
+def print_mask_stats(scheduler):
+    layers = {}
+    for i, survey in iter_surveys(scheduler):
+        for basis_function in getattr(survey, 'basis_functions', []):
+            if isinstance(basis_function, Fused_mask):
+                layers[id(basis_function.layer)] = basis_function.layer
+    for layer in layers.values():
+        print('Fused masks: %i mask evaluations for %i survey calls' % (layer.evaluations, layer.calls))
@@ -0,0 +1,159 @@
+import numpy as np
+import copy
+import healpy as hp
+
+__all__ = ['degrade_conditions', 'Coarse_basis_function', 'multires_bf']
+
+# (nside_in, nside_out) -> for each nside_out pixel, the nside_in pixel at its center
+_center_maps = {}
+# nside_out -> (snapshot of the conditions attributes, degraded conditions)
+_degraded = {}
+
+
+def _pixel_map(nside_in, nside_out):
+    """For every nside_out pixel, the nside_in pixel that contains its center
+    """
+    key = (nside_in, nside_out)
+    if key not in _center_maps:
+        theta, phi = hp.pix2ang(nside_out, np.arange(hp.nside2npix(nside_out)))
+        _center_maps[key] = hp.ang2pix(nside_in, theta, phi)
+    return _center_maps[key]
+
+
+def _resample(value, indx, npix_in):
+    if isinstance(value, np.ndarray) and value.ndim > 0 and value.shape[-1] == npix_in:
+        return value[..., indx]
+    if isinstance(value, dict):
+        return dict([(key, _resample(value[key], indx, npix_in)) for key in value])
+    return value
+
+
+def _snapshot(value):
+    """What _same compares against: containers are copied, arrays and scalars kept as they are
+    """
+    if isinstance(value, dict):
+        return dict([(key, _snapshot(value[key])) for key in value])
+    if isinstance(value, (list, tuple)):
+        return type(value)([_snapshot(val) for val in value])
+    return value
+
+
+def _same(snapshot, value):
+    """Whether a conditions attribute is unchanged since its snapshot. Arrays have to be the
+    same object, everything else equal.
+    """
+    if isinstance(snapshot, np.ndarray) or isinstance(value, np.ndarray):
+        return snapshot is value
+    if isinstance(snapshot, dict) and isinstance(value, dict):
+        return snapshot.keys() == value.keys() and all([_same(snapshot[key], value[key]) for key in value])
+    if isinstance(snapshot, (list, tuple)) and isinstance(value, (list, tuple)):
+        return (type(snapshot) == type(value) and len(snapshot) == len(value) and
+                all([_same(snap, val) for snap, val in zip(snapshot, value)]))
+    if snapshot is value:
+        return True
+    try:
+        return bool(snapshot == value)
+    except (TypeError, ValueError):
+        return False
+
+
+def degrade_conditions(conditions, nside_out):
+    """
+    A copy of a Conditions object with every per-pixel map sampled at the pixel centers of a
+    coarser HEALpix grid.
+
+    The result is cached until any attribute of the conditions changes, so any number of coarse
+    basis functions share one degraded copy per decision. Model_observatory updates one
+    Conditions object in place, so the copy is checked against every attribute it was made
+    from: scalars, lists and dicts by value, arrays by identity (the conditions replace their
+    maps rather than writing into them).
+
+    Parameters
+    ----------
+    conditions : Conditions
+    nside_out : int
+
+    Returns
+    -------
+    coarse : Conditions
+    """
+    if conditions.nside == nside_out:
+        return conditions
+    state = vars(conditions)
+    cached = _degraded.get(nside_out)
+    if cached is not None and _same(cached[0], state):
+        return cached[1]
+    npix_in = hp.nside2npix(conditions.nside)
+    indx = _pixel_map(conditions.nside, nside_out)
+    coarse = copy.copy(conditions)
+    for attr, value in state.items():
+        setattr(coarse, attr, _resample(value, indx, npix_in))
+    coarse.nside = nside_out
+    _degraded[nside_out] = (_snapshot(state), coarse)
+    return coarse
+
+
+class Coarse_basis_function(object):
+    """
+    Use a basis function built at a coarse nside in a survey running at a finer nside.
+
+    The basis function sees conditions sampled at its own resolution, and its value is spread
+    back over the fine pixels. Observations are passed on with their footprint converted to
+    coarse pixels. This suits terms that vary smoothly over the sky (depth, slew time, moon and
+    zenith masks), while footprint terms stay at the full resolution, so the cost of a decision
+    is close to that of the coarse nside with the footprint edges of the fine one.
+
+    Parameters
+    ----------
+    basis_function : Base_basis_function
+        Built with nside=coarse nside
+    nside : int
+        The nside of the survey it is used in
+    """
+    def __init__(self, basis_function, nside):
+        self._shared = basis_function
+        self.nside = nside
+        self.coarse_nside = basis_function.nside
+        # For every fine pixel, the coarse pixel containing it
+        self._parent = _pixel_map(self.coarse_nside, nside)
+
+    def __getattr__(self, attr):
+        shared = self.__dict__.get('_shared')
+        if shared is None or attr.startswith('__'):
+            raise AttributeError(attr)
+        return getattr(shared, attr)
+
+    def _upsample(self, value):
+        if isinstance(value, np.ndarray) and value.ndim > 0 and value.shape[-1] == hp.nside2npix(self.coarse_nside):
+            return value[..., self._parent]
+        return value
+
+    def __call__(self, conditions, **kwargs):
+        return self._upsample(self._shared(degrade_conditions(conditions, self.coarse_nside), **kwargs))
+
+    def check_feasibility(self, conditions):
+        return self._shared.check_feasibility(degrade_conditions(conditions, self.coarse_nside))
+
+    def add_observation(self, observation, indx=None):
+        if indx is not None:
+            indx = np.unique(self._parent[indx])
+        self._shared.add_observation(observation, indx=indx)
+
+
+def multires_bf(bf_class, nside=32, coarse_nside=None, **kwargs):
+    """
+    Make a basis function, at coarse_nside if that is set and coarser than nside.
+
+    Parameters
+    ----------
+    bf_class : class
+        e.g., bf.M5_diff_basis_function
+    nside : int (32)
+        The nside of the survey
+    coarse_nside : int (None)
+    **kwargs
+        Passed to bf_class
+    """
+    if coarse_nside is None or coarse_nside >= nside:
+        return bf_class(nside=nside, **kwargs)
+    return Coarse_basis_function(bf_class(nside=coarse_nside, **kwargs), nside)
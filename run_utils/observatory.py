@@ -0,0 +1,161 @@
+import copy
+import sys
+from lsst.sims.featureScheduler.modelObservatory import Model_observatory
+from .startup import startup_phase
+
+__all__ = ['preload_observatory', 'get_observatory', 'clear_preloaded', 'Lazy_component',
+           'load_components']
+
+# Model_observatory objects built before forking worker processes, keyed on their kwargs.
+_preloaded = {}
+
+# (module attribute or None, class name) of the data sets Model_observatory loads up front but
+# only uses once it is asked for conditions. None means the name is in the module itself.
+_lazy_classes = [('sb', 'SkyModelPre'), (None, 'SeeingData'), (None, 'CloudData'),
+                 (None, 'seeing_data'), (None, 'cloud_data')]
+
+
+def _key(nside, kwargs):
+    return (nside,) + tuple(sorted(kwargs.items()))
+
+
+class Lazy_component(object):
+    """
+    Stand in for a heavy observatory component, building it the first time it is used.
+
+    Attribute access, calls and pickling all go through to the real object, so the observatory
+    holding it doesn't know the difference. The time to build it is added to the startup
+    profile (see startup_phase).
+
+    Parameters
+    ----------
+    name : str
+        For the startup profile
+    factory : callable
+        Builds the component
+    args, kwargs
+        Passed to factory
+    """
+    def __init__(self, name, factory, args, kwargs):
+        self.__dict__['_lazy'] = (name, factory, args, kwargs)
+        self.__dict__['_shared'] = None
+
+    def _load(self):
+        if self.__dict__.get('_shared') is None:
+            name, factory, args, kwargs = self.__dict__['_lazy']
+            with startup_phase('observatory: %s' % name):
+                self.__dict__['_shared'] = factory(*args, **kwargs)
+        return self.__dict__['_shared']
+
+    def __getattr__(self, attr):
+        if attr.startswith('__') or ('_lazy' not in self.__dict__ and '_shared' not in self.__dict__):
+            raise AttributeError(attr)
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __delattr__(self, attr):
+        delattr(self._load(), attr)
+
+    def __call__(self, *args, **kwargs):
+        return self._load()(*args, **kwargs)
+
+    def __getstate__(self):
+        return {'_shared': self._load()}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+
+def _lazy_factory(name, cls):
+    def factory(*args, **kwargs):
+        return Lazy_component(name, cls, args, kwargs)
+    return factory
+
+
+def _build(nside, kwargs, lazy):
+    """Build a Model_observatory, with its data sets replaced by Lazy_components if lazy
+    """
+    if not lazy:
+        with startup_phase('observatory'):
+            return Model_observatory(nside=nside, **kwargs)
+    module = sys.modules[Model_observatory.__module__]
+    patches = []
+    for holder_name, name in _lazy_classes:
+        holder = module if holder_name is None else getattr(module, holder_name, None)
+        cls = getattr(holder, name, None)
+        if cls is not None:
+            patches.append((holder, name, cls))
+    try:
+        for holder, name, cls in patches:
+            setattr(holder, name, _lazy_factory(name, cls))
+        with startup_phase('observatory'):
+            return Model_observatory(nside=nside, **kwargs)
+    finally:
+        for holder, name, cls in patches:
+            setattr(holder, name, cls)
+
+
+def load_components(observatory):
+    """
+    Build any lazy components of an observatory now, e.g., before forking worker processes
+    so they share the loaded data.
+    """
+    for value in vars(observatory).values():
+        if isinstance(value, Lazy_component):
+            value._load()
+    return observatory
+
+
+def preload_observatory(nside=32, **kwargs):
+    """
+    Build a Model_observatory to be shared by processes forked after this call.
+
+    The sky brightness, seeing, cloud and almanac data are read-only during a simulation, so
+    forked workers share those pages with the parent rather than each loading a copy.
+
+    Parameters
+    ----------
+    nside : int (32)
+    **kwargs
+        Passed to Model_observatory
+    """
+    key = _key(nside, kwargs)
+    if key not in _preloaded:
+        _preloaded[key] = _build(nside, kwargs, False)
+    return _preloaded[key]
+
+
+def clear_preloaded():
+    """Drop any preloaded observatories
+    """
+    _preloaded.clear()
+
+
+def get_observatory(nside=32, lazy=True, **kwargs):
+    """
+    Get a Model_observatory, using a preloaded one if it matches.
+
+    A preloaded observatory is handed out as a shallow copy with its own kinematic model and
+    conditions, so the large data arrays are shared and the preloaded object stays untouched.
+    If nothing was preloaded with these kwargs, a new Model_observatory is built.
+
+    Parameters
+    ----------
+    nside : int (32)
+    lazy : bool (True)
+        When building a new observatory, only load the sky brightness, seeing and cloud data
+        when they are first used (the first return_conditions), so runs that stop before
+        simulating, like startup profiles, don't pay for them.
+    **kwargs
+        Passed to Model_observatory
+    """
+    key = _key(nside, kwargs)
+    if key not in _preloaded:
+        return _build(nside, kwargs, lazy)
+    result = copy.copy(_preloaded[key])
+    for attr in ['observatory', 'conditions']:
+        if hasattr(result, attr):
+            setattr(result, attr, copy.deepcopy(getattr(result, attr)))
+    return result
@@ -0,0 +1,144 @@
+import numpy as np
+from .footprint_cache import cached_footprint
+
+__all__ = ['Stacked_footprints', 'rolling_footprints', 'alternating_maps']
+
+
+def _wfd_slices(wfd_pixels, nslices):
+    """Split the WFD pixels (in HEALpix order, so by dec) into nslices runs of about equal size
+    """
+    wfd_indices = np.where(wfd_pixels)[0]
+    wfd_accum = np.cumsum(wfd_pixels)
+    split_wfd_indices = np.floor(np.max(wfd_accum)/nslices*(np.arange(nslices)+1)).astype(int)
+    split_wfd_indices = [0] + split_wfd_indices.tolist()
+    return [wfd_indices[split_wfd_indices[i]:split_wfd_indices[i+1]] for i in range(nslices)]
+
+
+def _band_masks(wfd_pixels, nslice, pattern):
+    """
+    Boolean (nslice, npix) array of which WFD pixels are rolled up in each footprint.
+    'bands' is nslice even dec bands. 'quad' splits the WFD into 2*nslice bands and pairs band i
+    with band i+nslice, so each footprint has a northern and a southern stripe.
+    """
+    masks = np.zeros((nslice, wfd_pixels.size), dtype=bool)
+    if pattern == 'bands':
+        slices = _wfd_slices(wfd_pixels, nslice)
+        for i in range(nslice):
+            masks[i, slices[i]] = True
+    elif pattern == 'quad':
+        slices = _wfd_slices(wfd_pixels, nslice*2)
+        for i in range(nslice):
+            masks[i, slices[i]] = True
+            masks[i, slices[i+nslice]] = True
+    else:
+        raise ValueError('pattern should be "bands" or "quad", not %s' % pattern)
+    return masks
+
+
+def _rolling_array(target_array, nslice, pattern, scale_down_factor, include_full):
+    # Make it so things still sum to one.
+    scale_up_factor = nslice - scale_down_factor*(nslice-1)
+    wfd_pixels = (target_array[0] == 1).astype(int)
+    masks = _band_masks(wfd_pixels, nslice, pattern)
+
+    scaled_down = np.where(wfd_pixels == 1, target_array*scale_down_factor, target_array)
+    # (nslice, n_filters, npix)
+    result = np.where(masks[:, np.newaxis, :], target_array[np.newaxis, :, :]*scale_up_factor,
+                      scaled_down[np.newaxis, :, :])
+    if include_full:
+        result = np.concatenate([result, target_array[np.newaxis, :, :]])
+    return result
+
+
+class Stacked_footprints(object):
+    """
+    A set of per-filter footprints held as one (n_footprints, n_filters, npix) array.
+
+    Indexing or iterating gives a dict of filtername: map for each footprint, like the list of
+    dicts the scripts used to build. The maps are views of the one array, so every basis
+    function given them shares the same memory.
+
+    Parameters
+    ----------
+    array : np.array
+        (n_footprints, n_filters, npix)
+    filternames : list of str
+        The filter of each entry along the second axis
+    """
+    def __init__(self, array, filternames):
+        self.array = array
+        self.filternames = list(filternames)
+
+    def __len__(self):
+        return self.array.shape[0]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(len(self))[i]]
+        if i < -len(self) or i >= len(self):
+            raise IndexError(i)
+        return dict([(filtername, self.array[i, j]) for j, filtername in enumerate(self.filternames)])
+
+    def filter_stack(self, filtername):
+        """All the footprints for one filter, as a (n_footprints, npix) view
+        """
+        return self.array[:, self.filternames.index(filtername)]
+
+
+def rolling_footprints(target_map, nslice=2, pattern='bands', scale_down_factor=0.2, include_full=True,
+                       dtype=np.float64):
+    """
+    Make rolling cadence footprints from a target map.
+
+    In each footprint one part of the WFD (pixels where the r target map is 1) is scaled up, and
+    the rest of the WFD is scaled down by scale_down_factor, so the total is unchanged. Results
+    are cached (see cached_footprint).
+
+    Parameters
+    ----------
+    target_map : dict
+        filtername: HEALpix map, e.g., from standard_goals
+    nslice : int (2)
+        Number of rolling footprints
+    pattern : str ('bands')
+        'bands' for nslice even dec bands. 'quad' for 2*nslice bands, with each footprint
+        getting one northern and one southern band.
+    scale_down_factor : float (0.2)
+    include_full : bool (True)
+        Add the unrolled target map as the last footprint, as the Footprint_rolling_basis_function
+        expects.
+    dtype : np.dtype (np.float64)
+        np.float32 halves the memory, which adds up at high nside.
+
+    Returns
+    -------
+    footprints : Stacked_footprints
+    """
+    filternames = list(target_map.keys())
+    target_array = np.array([target_map[filtername] for filtername in filternames], dtype=float)
+    # Put r first, it defines the WFD
+    order = [filternames.index('r')] + [i for i in range(len(filternames)) if filternames[i] != 'r']
+    array = cached_footprint(_rolling_array, target_array[order], nslice, pattern, scale_down_factor,
+                             include_full)
+    array = array[:, np.argsort(order)].astype(dtype, copy=False)
+    return Stacked_footprints(array, filternames)
+
+
+def alternating_maps(target_map, nslice=2):
+    """
+    Maps for alternating between nslice dec bands of the WFD from night to night, as used by the
+    Map_modulo_basis_function. Each map is -nslice in its band and 0 elsewhere.
+
+    Parameters
+    ----------
+    target_map : np.array
+        A HEALpix map that is 1 in the WFD
+
+    Returns
+    -------
+    maps : np.array
+        (nslice, npix)
+    """
+    wfd_pixels = (target_map == 1).astype(int)
+    masks = _band_masks(wfd_pixels, nslice, 'bands')
+    return -(masks*float(nslice))
@@ -0,0 +1,182 @@
+import numpy as np
+import hashlib
+import types
+from .utils import iter_surveys, full_sky_call
+
+__all__ = ['Shared_basis_function', 'share_basis_functions', 'shared_stats', 'print_shared_stats']
+
+# Things to identify by repr rather than by their attributes
+_opaque_types = (types.FunctionType, types.BuiltinFunctionType, types.MethodType, types.ModuleType, type)
+
+
+def _fingerprint(value, hasher, seen):
+    """Feed the full state of value into hasher, following object attributes
+    """
+    if isinstance(value, np.ndarray):
+        hasher.update(str((value.dtype.str, value.shape)).encode())
+        if value.dtype.hasobject:
+            for val in value.ravel():
+                _fingerprint(val, hasher, seen)
+        else:
+            hasher.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (str, bytes, int, float, bool, type(None), np.generic)):
+        hasher.update(repr(value).encode())
+    elif id(value) in seen:
+        hasher.update(b'<cycle>')
+    elif isinstance(value, dict):
+        seen.add(id(value))
+        hasher.update(b'{')
+        for key in sorted(value.keys(), key=str):
+            hasher.update(repr(key).encode())
+            _fingerprint(value[key], hasher, seen)
+        hasher.update(b'}')
+    elif isinstance(value, (list, tuple, set)):
+        seen.add(id(value))
+        hasher.update(b'[')
+        for val in (sorted(value, key=repr) if isinstance(value, set) else value):
+            _fingerprint(val, hasher, seen)
+        hasher.update(b']')
+    elif hasattr(value, '__dict__') and not isinstance(value, _opaque_types):
+        seen.add(id(value))
+        hasher.update(('<%s.%s>' % (type(value).__module__, type(value).__qualname__)).encode())
+        _fingerprint(vars(value), hasher, seen)
+    else:
+        # Functions and the like. The repr includes the address, so these never match anything else.
+        hasher.update(repr(value).encode())
+
+
+def _bf_key(basis_function, survey):
+    hasher = hashlib.sha1()
+    # Surveys skip observations by note, so the basis function only sees the same visits if
+    # the surveys ignore the same things.
+    hasher.update(repr(getattr(survey, 'ignore_obs', None)).encode())
+    _fingerprint(basis_function, hasher, set())
+    return hasher.hexdigest()
+
+
+class Shared_basis_function(object):
+    """
+    Stands in for a basis function that is used by several surveys.
+
+    Every survey holding it is handed the same underlying basis function. Its value is
+    computed once per conditions MJD (and number of observations seen), and each observation
+    is only added once, however many surveys pass it on.
+
+    Parameters
+    ----------
+    basis_function : Base_basis_function
+    """
+    def __init__(self, basis_function):
+        self._shared = basis_function
+        self._n_obs = 0
+        self._last_mjd = -np.inf
+        self._value_key = None
+        self._value = None
+        self.n_users = 1
+        self.calls = 0
+        self.evaluations = 0
+
+    def __getattr__(self, attr):
+        # Everything else goes to the real basis function. Look it up in __dict__ so this
+        # still works while unpickling.
+        shared = self.__dict__.get('_shared')
+        if shared is None or attr.startswith('__'):
+            raise AttributeError(attr)
+        return getattr(shared, attr)
+
+    def __call__(self, conditions, **kwargs):
+        self.calls += 1
+        # Surveys pass indx=every pixel, which is the same as no indx. Only subsets skip the cache.
+        if not full_sky_call(kwargs, getattr(self._shared, 'nside', None)):
+            self.evaluations += 1
+            return self._shared(conditions, **kwargs)
+        key = (conditions.mjd, self._n_obs)
+        if key != self._value_key:
+            self.evaluations += 1
+            self._value = self._shared(conditions, **kwargs)
+            self._value_key = key
+        # Each survey gets its own copy, in case it modifies the value in place
+        if isinstance(self._value, np.ndarray):
+            return self._value.copy()
+        return self._value
+
+    def add_observation(self, observation, **kwargs):
+        # Observations arrive in time order, but maybe survey by survey for a batch
+        if observation['mjd'] <= self._last_mjd:
+            return
+        self._last_mjd = observation['mjd']
+        self._n_obs += 1
+        self._shared.add_observation(observation, **kwargs)
+
+
+def share_basis_functions(scheduler, verbose=True):
+    """
+    Have surveys share basis functions that are identical.
+
+    Basis functions are grouped by class and full state (parameters, footprints and survey
+    features) plus what observations their survey ignores. Each group with more than one member
+    is swapped for a single Shared_basis_function in every survey that used one of them.
+
+    Call this before the scheduler has seen any observations, or at least before the copies
+    have diverged; basis functions with different state are never merged.
+
+    Parameters
+    ----------
+    scheduler : Core_scheduler
+    verbose : bool (True)
+
+    Returns
+    -------
+    shared : list of Shared_basis_function
+    """
+    groups = {}
+    for i, survey in iter_surveys(scheduler):
+        for j, basis_function in enumerate(getattr(survey, 'basis_functions', [])):
+            if isinstance(basis_function, Shared_basis_function):
+                continue
+            key = _bf_key(basis_function, survey)
+            groups.setdefault(key, []).append((survey, j))
+
+    shared = []
+    for key in groups:
+        if len(groups[key]) < 2:
+            continue
+        first_survey, first_j = groups[key][0]
+        shared_bf = Shared_basis_function(first_survey.basis_functions[first_j])
+        shared_bf.n_users = len(groups[key])
+        for survey, j in groups[key]:
+            survey.basis_functions[j] = shared_bf
+        shared.append(shared_bf)
+    if verbose:
+        n_replaced = np.sum([bf.n_users for bf in shared])
+        print('Sharing %i basis functions in place of %i' % (len(shared), n_replaced))
+    return shared
+
+
+def shared_stats(scheduler):
+    """
+    Returns
+    -------
+    stats : list of dict
+        One per shared basis function, with the class, number of surveys using it, calls and
+        evaluations actually done
+    """
+    result = []
+    found = set()
+    for i, survey in iter_surveys(scheduler):
+        for basis_function in getattr(survey, 'basis_functions', []):
+            if isinstance(basis_function, Shared_basis_function) and id(basis_function) not in found:
+                found.add(id(basis_function))
+                result.append({'name': type(basis_function._shared).__name__, 'users': basis_function.n_users,
+                               'calls': basis_function.calls, 'evaluations': basis_function.evaluations})
+    return result
+
+
+def print_shared_stats(scheduler):
+    stats = shared_stats(scheduler)
+    saved = {}
+    for row in stats:
+        saved[row['name']] = saved.get(row['name'], 0) + row['calls'] - row['evaluations']
+    for name in sorted(saved, key=lambda name: saved[name], reverse=True):
+        print('shared %s: saved %i evaluations' % (name, saved[name]))
+    print('Shared basis functions saved %i evaluations in total' % np.sum(list(saved.values())))
@@ -0,0 +1,386 @@
+import numpy as np
+import sys
+import os
+import time
+import warnings
+from lsst.sims.featureScheduler.schedulers import simple_filter_sched
+from lsst.sims.featureScheduler.utils import schema_converter, run_info_table
+from .checkpoint import save_checkpoint, load_checkpoint, checkpoint_filename
+from .fork import fork_from_snapshot
+from .timing import instrument_scheduler, uninstrument
+from .dryrun import preflight
+from .writer import Streaming_writer
+from .conditions_cache import install_conditions_cache
+from .shared_bf import share_basis_functions, print_shared_stats
+from .feature_store import build_feature_store
+from .batch import add_observations
+from .compact import compact_basis_functions
+from .startup import startup_phase, write_startup_report
+from .tours import install_tour_solver, uninstall_tour_solver
+from .sky_index import install_sky_index, uninstall_sky_index
+from .smoothing import install_smoothing, uninstall_smoothing
+from .incremental import incremental_rewards as cache_reward_terms, print_incremental_stats
+from .masks import fuse_masks as fuse_survey_masks, print_mask_stats
+
+__all__ = ['sim_runner', 'last_run']
+
+# Stats from the most recent sim_runner call in this process, for benchmarking.
+last_run = {}
+
+
+def sim_runner(observatory, scheduler, filter_scheduler=None, mjd_start=None, survey_length=3.,
+               filename=None, delete_past=True, n_visit_limit=None, step_none=15., verbose=True,
+               extra_info=None, checkpoint_every=None, checkpoint_file=None, resume=False,
+               snapshot_file=None, fork_from=None, verify_nights=None, timing=False, timing_in_info=False,
+               dry_run=False, dry_run_samples=30, stream=False, conditions_cache=None,
+               share_bfs=False, feature_store=False, batch_obs=False, compact=False, startup_profile=False,
+               tour_solver=False, tour_moves=None, tour_budget=None, sky_index=False, sparse_smoothing=False, incremental_rewards=False,
+               verify_rewards=False, fuse_masks=False):
+    """
+    Run a simulation. A drop-in for lsst.sims.featureScheduler.sim_runner that can checkpoint.
+
+    Parameters
+    ----------
+    observatory : Model_observatory
+    scheduler : Core_scheduler
+    filter_scheduler : simple_filter_sched (None)
+        Decides which filters are mounted each night. Defaults to simple_filter_sched().
+    mjd_start : float (None)
+        MJD to start at. Defaults to the current observatory MJD.
+    survey_length : float (3.)
+        How long to run the survey for (days)
+    filename : str (None)
+        The output database to write
+    delete_past : bool (True)
+        Remove any existing database of the same name
+    n_visit_limit : int (None)
+        Stop after this many visits
+    step_none : float (15.)
+        How far to step forward when the scheduler has nothing to do (minutes)
+    verbose : bool (True)
+        Print progress
+    extra_info : dict (None)
+        Extra information to put in the info table of the output database
+    checkpoint_every : int (None)
+        Write a checkpoint every N simulated nights. None for no checkpoints.
+    checkpoint_file : str (None)
+        Where to write the checkpoint. Defaults to filename + '.ckpt'
+    resume : bool (False)
+        If a checkpoint exists, pick up the simulation from it rather than starting fresh.
+    snapshot_file : str (None)
+        Write a snapshot of the final state here, for other runs to fork from.
+    fork_from : str (None)
+        Start from a snapshot written by a prefix run, replaying its visits through this
+        scheduler's surveys. survey_length is still measured from the prefix run's start.
+    verify_nights : int (None)
+        When forking, first simulate this many nights from scratch and check they match the
+        snapshot prefix.
+    timing : bool (False)
+        Time every basis function, survey, detailer and scheduler tier. The summary is written
+        next to the output database as *_timing.txt
+    timing_in_info : bool (False)
+        Also put the timing summary in extra_info, so it ends up in the output database info table.
+    dry_run : bool (False)
+        Don't run the simulation, just evaluate the surveys at some sampled conditions and report
+        which are feasible (see preflight). Returns None for the observations.
+    dry_run_samples : int (30)
+        How many conditions to sample for a dry run.
+    stream : bool (False)
+        Append each completed night to the output database on a background thread rather than
+        holding every visit in memory and writing at the end. A killed run still leaves a usable
+        database up to the last night. Returns None for the observations.
+    conditions_cache : float (None)
+        If set, reuse the per-pixel sky brightness, seeing and alt/az/airmass maps for
+        conditions requested within this many seconds of each other (see install_conditions_cache).
+    share_bfs : bool (False)
+        Have surveys share basis functions that are identical, so each is only evaluated once
+        per decision (see share_basis_functions).
+    feature_store : bool (False)
+        Replace identical survey features with shared ones stacked into one array per feature
+        class, so each visit updates each distinct feature once (see build_feature_store).
+    batch_obs : bool (False)
+        While the scheduler is working through a queue (e.g., a blob), hold the completed visits
+        and add them to the scheduler as one batch when the queue runs out (see add_observations).
+        The surveys aren't consulted until then, so the result is the same.
+    compact : bool (False)
+        Store the footprint weights of the basis functions as float32 (see compact_basis_functions).
+    startup_profile : bool (False)
+        Don't run the simulation, just report how long the script took to get here, broken down
+        by the phases recorded with startup_phase (observatory, footprints, runner setup).
+        Returns None for the observations.
+    tour_solver : bool (False)
+        Order the pointings of each blob with the vectorized 2-opt/Or-opt solver
+        (see install_tour_solver).
+    tour_moves : int (None)
+        Most improving moves the solver makes per tour. Defaults to 10 per pointing.
+    tour_budget : float (None)
+        Optional wall time limit per tour for the solver (seconds). Results then depend on
+        the machine, so leave unset for reproducible runs.
+    sky_index : bool (False)
+        Have the blob surveys look up the pixels within their search radius in a KD-tree of the
+        HEALpix centers rather than computing the distance to every pixel (see install_sky_index).
+    sparse_smoothing : bool (False)
+        Smooth the rewards of surveys with a smoothing_kernel with a precomputed sparse matrix
+        that ignores masked pixels, rather than with spherical harmonics (see install_smoothing).
+    incremental_rewards : bool (False)
+        Only recompute the reward terms of each survey that can't change between visits after
+        a new observation or night (see run_utils.incremental_rewards).
+    verify_rewards : bool (False)
+        With incremental_rewards, recompute the cached terms on every call anyway and raise an
+        AssertionError if they changed.
+    fuse_masks : bool (False)
+        Compute each distinct zenith, moon and planet mask once per conditions for all the
+        surveys, each survey taking one combined mask (see run_utils.fuse_masks).
+    """
+    if extra_info is None:
+        extra_info = {}
+
+    t0 = time.time()
+
+    if filter_scheduler is None:
+        filter_scheduler = simple_filter_sched()
+
+    if checkpoint_file is None and filename is not None:
+        checkpoint_file = checkpoint_filename(filename)
+
+    if mjd_start is None:
+        mjd = observatory.mjd + 0
+        mjd_start = mjd + 0
+    else:
+        mjd = mjd_start + 0
+        observatory.mjd = mjd
+        observatory.ra = None
+        observatory.dec = None
+        observatory.status = None
+        observatory.filtername = None
+
+    end_mjd = mjd + survey_length
+    observations = []
+    nskip = 0
+    nights_done = 0
+    n_written = None
+
+    if resume and checkpoint_file is not None and os.path.isfile(checkpoint_file):
+        with startup_phase('resume'):
+            observatory, scheduler, filter_scheduler, observations, runner_state = load_checkpoint(checkpoint_file,
+                                                                                                 observatory)
+        mjd_start = runner_state['mjd_start']
+        end_mjd = runner_state['end_mjd']
+        nskip = runner_state['nskip']
+        nights_done = runner_state['nights_done']
+        n_written = runner_state.get('n_written')
+        mjd = observatory.mjd + 0
+        print('Resuming from %s at mjd %.3f with %i observations' % (checkpoint_file, mjd, len(observations)))
+    elif fork_from is not None:
+        with startup_phase('fork'):
+            observatory, scheduler, filter_scheduler, observations, runner_state = fork_from_snapshot(
+                fork_from, observatory, scheduler, filter_scheduler, verify_nights=verify_nights)
+        mjd_start = runner_state['mjd_start']
+        end_mjd = mjd_start + survey_length
+        nskip = runner_state['nskip']
+        nights_done = runner_state['nights_done']
+        mjd = observatory.mjd + 0
+        print('Forked from %s at mjd %.3f with %i observations' % (fork_from, mjd, len(observations)))
+    elif resume:
+        print('No checkpoint found, starting from the beginning')
+
+    store = None
+    with startup_phase('runner setup'):
+        if share_bfs:
+            share_basis_functions(scheduler)
+        if compact:
+            compact_basis_functions(scheduler)
+        if feature_store:
+            store = build_feature_store(scheduler)
+
+    if startup_profile:
+        write_startup_report()
+        return observatory, scheduler, None
+
+    if dry_run:
+        preflight(observatory, scheduler, survey_length=end_mjd-mjd, n_samples=dry_run_samples)
+        return observatory, scheduler, None
+
+    # Masks first, so the fused mask isn't mistaken for a slowly changing term
+    if fuse_masks:
+        fuse_survey_masks(scheduler)
+    if incremental_rewards:
+        cache_reward_terms(scheduler, verify=verify_rewards)
+
+    cache = None
+    writer = None
+    try:
+        # Before timing, so the timing wraps the indexed reward and is undone first
+        if sky_index:
+            install_sky_index()
+        if sparse_smoothing:
+            install_smoothing()
+
+        if timing or timing_in_info:
+            timing_stats = instrument_scheduler(scheduler)
+
+        if conditions_cache is not None:
+            cache = install_conditions_cache(observatory, tolerance=conditions_cache)
+
+        if tour_solver:
+            install_tour_solver(max_moves=tour_moves, time_budget=tour_budget)
+
+        if stream and snapshot_file is not None:
+            warnings.warn('Snapshots need all the observations in memory, not streaming output.')
+        elif stream and filename is not None:
+            # When resuming, keep what was written before the checkpoint and drop anything after.
+            writer = Streaming_writer(filename, delete_past=delete_past and n_written is None, n_keep=n_written)
+        n_completed = len(observations)
+        if writer is not None:
+            n_completed += writer.n_written
+
+        mjd_track = mjd + 0
+        step = 1./24.
+        step_none = step_none/60./24.  # to days
+        mjd_run = end_mjd-mjd_start
+        new_night = False
+
+        mjd_last_flush = -1
+        pending = []
+        while mjd < end_mjd:
+            if not scheduler._check_queue_mjd_only(observatory.mjd):
+                if len(pending) > 0:
+                    # The queue is stale, the surveys need to be up to date to refill it
+                    add_observations(scheduler, np.array(pending))
+                    pending = []
+                scheduler.update_conditions(observatory.return_conditions())
+            desired_obs = scheduler.request_observation(mjd=observatory.mjd)
+            if desired_obs is None:
+                # No observation. Just step into the future and try again.
+                warnings.warn('No observation. Step into the future and trying again.')
+                observatory.mjd = observatory.mjd + step_none
+                scheduler.update_conditions(observatory.return_conditions())
+                nskip += 1
+                continue
+            completed_obs, new_night = observatory.observe(desired_obs)
+
+            if completed_obs is not None:
+                if batch_obs:
+                    pending.append(completed_obs[0])
+                else:
+                    scheduler.add_observation(completed_obs[0])
+                observations.append(completed_obs)
+                filter_scheduler.add_observation(completed_obs[0])
+                n_completed += 1
+            else:
+                # An observation failed to execute, usually it was outside the altitude limits.
+                if observatory.mjd == mjd_last_flush:
+                    raise RuntimeError("Scheduler has failed to provide a valid observation multiple times.")
+                # if this is a first offence, might just be that targets set. Flush queue and get some new targets.
+                if len(pending) > 0:
+                    add_observations(scheduler, np.array(pending))
+                    pending = []
+                scheduler.flush_queue()
+                mjd_last_flush = observatory.mjd + 0
+            if len(pending) > 0 and (len(scheduler.queue) == 0 or new_night or n_completed == n_visit_limit):
+                # The scheduler is about to look at the surveys again, bring them up to date
+                add_observations(scheduler, np.array(pending))
+                pending = []
+            if new_night:
+                # find out what filters we want mounted
+                conditions = observatory.return_conditions()
+                filters_needed = filter_scheduler(conditions)
+                observatory.observatory.mount_filters(filters_needed)
+                nights_done += 1
+                if writer is not None:
+                    writer.write(observations)
+                    observations = []
+                if checkpoint_every is not None and checkpoint_file is not None:
+                    if nights_done % checkpoint_every == 0:
+                        runner_state = {'mjd_start': mjd_start, 'end_mjd': end_mjd, 'nskip': nskip,
+                                        'nights_done': nights_done}
+                        if writer is not None:
+                            # Make sure the database is caught up to the checkpoint
+                            writer.sync()
+                            runner_state['n_written'] = writer.n_written
+                        if cache is not None:
+                            cache.detach()
+                        save_checkpoint(checkpoint_file, observatory, scheduler, filter_scheduler,
+                                        observations, runner_state)
+                        if cache is not None:
+                            cache.attach()
+
+            mjd = observatory.mjd + 0
+            if verbose:
+                if (mjd-mjd_track) > step:
+                    progress = float(mjd-mjd_start)/mjd_run*100
+                    text = "\rprogress = %.2f%%" % progress
+                    sys.stdout.write(text)
+                    sys.stdout.flush()
+                    mjd_track = mjd+0
+            if n_visit_limit is not None:
+                if n_completed == n_visit_limit:
+                    break
+        if len(pending) > 0:
+            add_observations(scheduler, np.array(pending))
+        if cache is not None:
+            cache.print_stats()
+            cache.detach()
+        if share_bfs:
+            print_shared_stats(scheduler)
+        if store is not None:
+            store.print_stats()
+        if incremental_rewards:
+            print_incremental_stats(scheduler)
+        if fuse_masks:
+            print_mask_stats(scheduler)
+        if snapshot_file is not None:
+            runner_state = {'mjd_start': mjd_start, 'end_mjd': end_mjd, 'nskip': nskip,
+                            'nights_done': nights_done}
+            save_checkpoint(snapshot_file, observatory, scheduler, filter_scheduler, observations, runner_state)
+        runtime = time.time() - t0
+        last_run.update({'t_start': t0, 'runtime': runtime, 'n_obs': n_completed,
+                         'sim_days': mjd - mjd_start})
+        print('Skipped %i observations' % nskip)
+        print('Flushed %i observations from queue for being stale' % scheduler.flushed)
+        print('Completed %i observations' % n_completed)
+        print('ran in %i min = %.1f hours' % (runtime/60., runtime/3600.))
+        if timing or timing_in_info:
+            uninstrument()
+            if filename is not None:
+                timing_file = os.path.splitext(filename)[0] + '_timing.txt'
+                timing_stats.write(timing_file)
+                print('Wrote timing summary to ', timing_file)
+            if timing_in_info:
+                timing_stats.to_info(extra_info)
+        print('Writing results to ', filename)
+        if writer is not None:
+            writer.write(observations)
+            observations = []
+            writer.close(info=run_info_table(observatory, extra_info=extra_info))
+            writer = None
+            observations = None
+        else:
+            observations = np.array(observations)[:, 0]
+            if filename is not None:
+                info = run_info_table(observatory, extra_info=extra_info)
+                converter = schema_converter()
+                converter.obs2opsim(observations, filename=filename, info=info, delete_past=delete_past)
+        # Finished cleanly, no need to keep the checkpoint around
+        if checkpoint_file is not None and os.path.isfile(checkpoint_file):
+            os.remove(checkpoint_file)
+        return observatory, scheduler, observations
+    finally:
+        # Also when the run fails, so the nights already queued get written and the patches
+        # don't carry over into the next run in this process
+        if writer is not None:
+            try:
+                writer.write(observations)
+                writer.close()
+            except Exception as err:
+                warnings.warn('Could not finish writing %s: %s' % (filename, err))
+        if cache is not None:
+            cache.detach()
+        if tour_solver:
+            uninstall_tour_solver()
+        if timing or timing_in_info:
+            uninstrument()
+        if sky_index:
+            uninstall_sky_index()
+        if sparse_smoothing:
+            uninstall_smoothing()
@@ -0,0 +1,169 @@
+import numpy as np
+import functools
+import sys
+import warnings
+from collections import OrderedDict
+from .coords import coordinate_table
+
+__all__ = ['Healpix_index', 'sky_index', 'install_sky_index', 'uninstall_sky_index']
+
+# nside -> Healpix_index
+_indexes = {}
+# (object, name) -> original, so install_sky_index can be undone
+_originals = {}
+# Blob surveys whose reward is being calculated
+_active = []
+# Padding on the disc radius (radians)
+_pad = 1e-5
+
+
+def _unit_vectors(ra, dec):
+    cos_dec = np.cos(dec)
+    return np.array([cos_dec*np.cos(ra), cos_dec*np.sin(ra), np.sin(dec)]).T
+
+
+class Healpix_index(object):
+    """
+    KD-tree over the unit vectors of the HEALpix centers, for finding the pixels within some
+    angle of a point without computing the distance to every pixel.
+
+    Discs are cached (least recently used first out), so the pixels around a blob's peak
+    are only looked up once however often that peak comes back.
+
+    Parameters
+    ----------
+    nside : int (32)
+    max_discs : int (4096)
+        Most discs to keep
+    """
+    def __init__(self, nside=32, max_discs=4096):
+        from scipy.spatial import cKDTree
+        self.nside = nside
+        table = coordinate_table(nside)
+        self.ra = table['ra']
+        self.dec = table['dec']
+        self.npix = self.ra.size
+        self.tree = cKDTree(_unit_vectors(self.ra, self.dec))
+        self.max_discs = max_discs
+        self.discs = OrderedDict()
+
+    def query_radius(self, ra, dec, radius):
+        """
+        Indices of the pixels with centers within radius of a point.
+
+        Parameters
+        ----------
+        ra, dec : float
+            The point (radians)
+        radius : float
+            (radians)
+        """
+        key = (float(ra), float(dec), float(radius))
+        if key in self.discs:
+            self.discs.move_to_end(key)
+            return self.discs[key]
+        # Chord length, padded well past the rounding Blob_survey applies to its radius cut, so
+        # pixels right on the edge are never missed. Extra pixels just get their exact distance.
+        chord = 2.*np.sin(min(radius, np.pi)/2.) + _pad
+        indx = np.sort(np.array(self.tree.query_ball_point(_unit_vectors(ra, dec), chord), dtype=np.int32))
+        self.discs[key] = indx
+        if len(self.discs) > self.max_discs:
+            self.discs.popitem(last=False)
+        return indx
+
+    def separations(self, ra, dec, radius, separation_func, pix_ra=None, pix_dec=None):
+        """
+        Angular distance from a point to every pixel, computed only for the pixels within
+        radius (plus a small margin). Everything further away is set to pi, so a cut at radius,
+        even a slightly rounded one, gives the same pixels as the full calculation.
+
+        Parameters
+        ----------
+        ra, dec : float
+            The point (radians)
+        radius : float
+            (radians)
+        separation_func : callable
+            separation_func(ra1, dec1, ra2, dec2) to compute the distances with
+        pix_ra, pix_dec : np.array (None)
+            The pixel centers to pass to separation_func, if they should be some other copy
+            of the HEALpix centers than the index's own.
+        """
+        if pix_ra is None:
+            pix_ra, pix_dec = self.ra, self.dec
+        indx = self.query_radius(ra, dec, radius)
+        result = np.empty(self.npix)
+        result.fill(np.pi)
+        result[indx] = separation_func(ra, dec, pix_ra[indx], pix_dec[indx])
+        return result
+
+
+def sky_index(nside=32):
+    """The Healpix_index for an nside, built the first time it is asked for
+    """
+    if nside not in _indexes:
+        _indexes[nside] = Healpix_index(nside)
+    return _indexes[nside]
+
+
+def _blob_class():
+    from lsst.sims.featureScheduler.surveys import Blob_survey
+    return Blob_survey
+
+
+def install_sky_index():
+    """
+    Have the blob surveys find the pixels within search_radius of their peak with a
+    Healpix_index, rather than computing the distance from the peak to every pixel.
+
+    While a Blob_survey is calculating its reward, separations it asks for from one point to
+    all of its own pixels only cover the pixels within its search radius, and are pi for the
+    rest. Those distances are only used for the search radius cut, so the blobs are unchanged.
+    Surveys with a distance_weight use the distances for more than the cut, so they are left
+    alone.
+
+    Returns
+    -------
+    installed : bool
+        False if the surveys module doesn't compute separations in a way this can replace
+    """
+    blob_class = _blob_class()
+    module = sys.modules[blob_class.__module__]
+    if (module, '_angularSeparation') in _originals:
+        return True
+    if not hasattr(module, '_angularSeparation'):
+        warnings.warn('No separation function found in %s, blob surveys are unchanged' % module.__name__)
+        return False
+    separation = module._angularSeparation
+    calc_reward = blob_class.__dict__['calc_reward_function']
+
+    @functools.wraps(separation)
+    def indexed_separation(long1, lat1, long2, lat2):
+        if len(_active) > 0 and np.isscalar(long1) and np.isscalar(lat1):
+            survey = _active[-1]
+            if long2 is getattr(survey, 'ra', None) and not getattr(survey, 'distance_weight', 0):
+                return sky_index(survey.nside).separations(long1, lat1, survey.search_radius, separation,
+                                                           pix_ra=long2, pix_dec=lat2)
+        return separation(long1, lat1, long2, lat2)
+
+    @functools.wraps(calc_reward)
+    def calc_reward_function(self, conditions):
+        _active.append(self)
+        try:
+            return calc_reward(self, conditions)
+        finally:
+            _active.pop()
+
+    _originals[(module, '_angularSeparation')] = separation
+    _originals[(blob_class, 'calc_reward_function')] = calc_reward
+    module._angularSeparation = indexed_separation
+    blob_class.calc_reward_function = calc_reward_function
+    return True
+
+
+def uninstall_sky_index():
+    """Put back the full-sky separations
+    """
+    for (obj, name) in _originals:
+        setattr(obj, name, _originals[(obj, name)])
+    _originals.clear()
@@ -0,0 +1,166 @@
+import numpy as np
+import warnings
+from .footprint_cache import cached_footprint
+
+__all__ = ['Slew_table', 'slew_table', 'blob_slew_params']
+
+# The kinematic model parameters the table is built from, with the LSST design values used
+# when the model doesn't have them (radians, radians/s, radians/s/s and seconds)
+_model_params = {'telalt_minpos_rad': np.radians(20.), 'telalt_maxpos_rad': np.radians(86.5),
+                 'telalt_maxspeed_rad': np.radians(3.5), 'telalt_accel_rad': np.radians(3.5),
+                 'telaz_maxspeed_rad': np.radians(7.0), 'telaz_accel_rad': np.radians(7.0),
+                 'domalt_maxspeed_rad': np.radians(1.75), 'domalt_accel_rad': np.radians(0.875),
+                 'domaz_maxspeed_rad': np.radians(1.5), 'domaz_accel_rad': np.radians(0.75),
+                 'domaz_free_range': np.radians(4.0), 'mount_settletime': 3.0,
+                 'readtime': 2.0, 'filter_changetime': 120.}
+
+
+def _axis_time(distance, max_speed, accel):
+    """Time to move an axis a distance, accelerating to max_speed and decelerating again
+    """
+    distance = np.abs(distance)
+    ramp = max_speed**2/accel
+    return np.where(distance < ramp, 2.*np.sqrt(distance/accel), 2.*max_speed/accel + (distance - ramp)/max_speed)
+
+
+class Slew_table(object):
+    """
+    Slew times on a regular grid of starting altitude, change in altitude and change in
+    azimuth, with trilinear interpolation.
+
+    Parameters
+    ----------
+    start_alt : np.array
+        Grid of starting altitudes (radians, evenly spaced)
+    delta_alt : np.array
+        Grid of altitude changes (radians, evenly spaced)
+    delta_az : np.array
+        Grid of azimuth changes, 0 to pi (radians, evenly spaced)
+    times : np.array
+        (start_alt, delta_alt, delta_az) slew times (seconds), NaN where the target is out of
+        reach.
+    readtime : float (2.)
+        Shortest time between visits (seconds)
+    filter_changetime : float (120.)
+        (seconds)
+    """
+    def __init__(self, start_alt, delta_alt, delta_az, times, readtime=2., filter_changetime=120.):
+        self.axes = [start_alt, delta_alt, delta_az]
+        self.times = times
+        self.readtime = readtime
+        self.filter_changetime = filter_changetime
+
+    def __call__(self, start_alt, alt, delta_az):
+        """
+        Slew times from start_alt to alt with an azimuth change of delta_az (radians, any
+        range, broadcast against each other).
+        """
+        delta_az = np.abs((np.asarray(delta_az, dtype=float) + np.pi) % (2.*np.pi) - np.pi)
+        start_alt, alt, delta_az = np.broadcast_arrays(np.asarray(start_alt, dtype=float),
+                                                       np.asarray(alt, dtype=float), delta_az)
+        values = [start_alt, alt - start_alt, delta_az]
+        lower = []
+        frac = []
+        for axis, value in zip(self.axes, values):
+            pos = (value - axis[0])/(axis[1] - axis[0])
+            pos = np.clip(pos, 0, axis.size - 1 - 1e-9)
+            lower.append(np.floor(pos).astype(int))
+            frac.append(pos - lower[-1])
+        # Cells along the altitude limits have unreachable (NaN) corners, so only the
+        # reachable corners are interpolated between
+        result = 0.
+        norm = 0.
+        for corner in range(8):
+            weight = 1.
+            indx = []
+            for dim in range(3):
+                upper = (corner >> dim) & 1
+                indx.append(lower[dim] + upper)
+                weight = weight*(frac[dim] if upper else 1. - frac[dim])
+            times = self.times[indx[0], indx[1], indx[2]]
+            good = np.isfinite(times)
+            result = result + np.where(good, weight*times, 0.)
+            norm = norm + np.where(good, weight, 0.)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result = result/norm
+        # Targets outside the grid can't be reached
+        outside = (alt < self.axes[0][0]) | (alt > self.axes[0][-1])
+        return np.where(outside, np.nan, result)
+
+
+def _table_times(params, start_alt, delta_alt, delta_az):
+    start, d_alt, d_az = np.meshgrid(start_alt, delta_alt, delta_az, indexing='ij')
+    end_alt = start + d_alt
+    tel = np.maximum(_axis_time(d_alt, params['telalt_maxspeed_rad'], params['telalt_accel_rad']),
+                     _axis_time(d_az, params['telaz_maxspeed_rad'], params['telaz_accel_rad']))
+    dome_az = np.maximum(np.abs(d_az) - params['domaz_free_range'], 0)
+    dome = np.maximum(_axis_time(d_alt, params['domalt_maxspeed_rad'], params['domalt_accel_rad']),
+                      _axis_time(dome_az, params['domaz_maxspeed_rad'], params['domaz_accel_rad']))
+    times = np.maximum(tel + np.where((d_alt != 0) | (d_az != 0), params['mount_settletime'], 0.), dome)
+    times = np.maximum(times, params['readtime'])
+    reachable = (end_alt >= params['telalt_minpos_rad']) & (end_alt <= params['telalt_maxpos_rad'])
+    return np.where(reachable, times, np.nan)
+
+
+def slew_table(kinematic_model=None, n_alt=30, n_delta_alt=61, n_delta_az=91):
+    """
+    Build a Slew_table from the speeds and accelerations of a kinematic model.
+
+    Each axis (telescope and dome altitude and azimuth) accelerates to its top speed and
+    decelerates again, the slowest sets the slew time, and the telescope settle time is added
+    when it moves. Cable wrap and the rotator are ignored. The table is cached like a footprint.
+
+    Parameters
+    ----------
+    kinematic_model : Kinem_model (None)
+        e.g., observatory.observatory. Parameters it doesn't have (or all of them if None)
+        take the LSST design values, with a warning listing them.
+    n_alt, n_delta_alt, n_delta_az : int (30, 61, 91)
+        Grid size
+
+    Returns
+    -------
+    table : Slew_table
+    """
+    params = dict(_model_params)
+    if kinematic_model is not None:
+        missing = [key for key in params if not hasattr(kinematic_model, key)]
+        if len(missing) > 0:
+            warnings.warn('%s has no %s, using the LSST design values for them in the slew table' %
+                          (type(kinematic_model).__name__, ', '.join(missing)))
+        for key in params:
+            params[key] = float(getattr(kinematic_model, key, params[key]))
+    start_alt = np.linspace(params['telalt_minpos_rad'], params['telalt_maxpos_rad'], n_alt)
+    alt_range = params['telalt_maxpos_rad'] - params['telalt_minpos_rad']
+    delta_alt = np.linspace(-alt_range, alt_range, n_delta_alt)
+    delta_az = np.linspace(0, np.pi, n_delta_az)
+    times = cached_footprint(_table_times, params, start_alt, delta_alt, delta_az)
+    return Slew_table(start_alt, delta_alt, delta_az, times, readtime=params['readtime'],
+                      filter_changetime=params['filter_changetime'])
+
+
+def blob_slew_params(table, nside=32, alt=np.radians(60.)):
+    """
+    Blob_survey slew_approx, filter_change_approx and read_approx from a Slew_table, in place
+    of the hand-set constants.
+
+    A blob steps between neighboring pixels, so slew_approx is the mean time for a one pixel
+    step in altitude and in azimuth, evaluated at the one altitude given. An azimuth step
+    takes longer nearer zenith, so the estimate is off for blobs far from that altitude.
+
+    Parameters
+    ----------
+    table : Slew_table
+    nside : int (32)
+    alt : float (60 degrees)
+        The altitude to evaluate slew_approx at (radians)
+
+    Returns
+    -------
+    params : dict
+        To update the blob survey kwargs with
+    """
+    step = np.sqrt(4.*np.pi/(12.*nside**2))
+    slew = np.mean([table(alt, alt + step, 0.), table(alt, alt, step/np.cos(alt))])
+    return {'slew_approx': float(slew), 'filter_change_approx': float(table.filter_changetime),
+            'read_approx': float(table.readtime)}
@@ -0,0 +1,150 @@
+import numpy as np
+import os
+import warnings
+from .footprint_cache import footprint_cache_dir, _save, _load
+from .sky_index import sky_index, _blob_class
+
+__all__ = ['Smoothing_operator', 'smoothing_operator', 'install_smoothing', 'uninstall_smoothing']
+
+# (nside, fwhm, n_sigma) -> Smoothing_operator
+_operators = {}
+# (class, name) -> original, so install_smoothing can be undone
+_originals = {}
+
+
+class Smoothing_operator(object):
+    """
+    Gaussian smoothing of a HEALpix map as one sparse matrix-vector product.
+
+    Pixels that are NaN (or infinite) are left out, and the weights of the rest are
+    renormalized, so a mask doesn't bleed into the pixels around it. Masked pixels keep their
+    value.
+
+    Parameters
+    ----------
+    weights : scipy.sparse.csr_matrix
+        (npix, npix) kernel weights, row i for the pixels that go into pixel i
+    """
+    def __init__(self, weights):
+        self.weights = weights
+        self.npix = weights.shape[0]
+
+    @property
+    def nbytes(self):
+        return self.weights.data.nbytes + self.weights.indices.nbytes + self.weights.indptr.nbytes
+
+    def __call__(self, values):
+        values = np.asarray(values, dtype=float)
+        good = np.isfinite(values)
+        if np.all(good):
+            total = self.weights.dot(values)
+            norm = self.weights.dot(np.ones(self.npix))
+        else:
+            total = self.weights.dot(np.where(good, values, 0.))
+            norm = self.weights.dot(good.astype(float))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result = np.where(norm > 0, total/norm, np.nan)
+        result[~good] = values[~good]
+        return result
+
+
+def _kernel_arrays(nside, fwhm, n_sigma):
+    """CSR arrays of the Gaussian weights out to n_sigma, found with the sky index KD-tree
+    """
+    from scipy.sparse import coo_matrix
+    sigma = fwhm/np.sqrt(8.*np.log(2.))
+    radius = min(n_sigma*sigma, np.pi)
+    index = sky_index(nside)
+    chord = 2.*np.sin(radius/2.)
+    pairs = index.tree.sparse_distance_matrix(index.tree, chord, output_type='ndarray')
+    # Put the diagonal in separately, zero distances may or may not be listed
+    off_diag = pairs['i'] != pairs['j']
+    rows = np.concatenate([pairs['i'][off_diag], np.arange(index.npix)])
+    cols = np.concatenate([pairs['j'][off_diag], np.arange(index.npix)])
+    angle = 2.*np.arcsin(np.clip(pairs['v'][off_diag]/2., 0, 1))
+    data = np.concatenate([np.exp(-0.5*(angle/sigma)**2), np.ones(index.npix)])
+    weights = coo_matrix((data.astype(np.float32), (rows, cols)), shape=(index.npix, index.npix)).tocsr()
+    return {'data': weights.data, 'indices': weights.indices, 'indptr': weights.indptr}
+
+
+def smoothing_operator(nside, fwhm, n_sigma=3.):
+    """
+    The Smoothing_operator for a HEALpix nside and kernel width.
+
+    Built once per (nside, fwhm, n_sigma) and saved under the footprint cache directory, so
+    later processes just memory map it.
+
+    Parameters
+    ----------
+    nside : int
+    fwhm : float
+        Full width at half maximum of the Gaussian kernel (radians)
+    n_sigma : float (3.)
+        Where to cut off the kernel, in standard deviations
+
+    Returns
+    -------
+    operator : Smoothing_operator
+    """
+    from scipy.sparse import csr_matrix
+    key = (nside, float(fwhm), float(n_sigma))
+    if key not in _operators:
+        path = os.path.join(footprint_cache_dir(), 'smoothing_nside%i_fwhm%.6f_nsigma%.2f' % key)
+        if os.path.isdir(path):
+            arrays = _load(path)
+        else:
+            arrays = _kernel_arrays(nside, fwhm, n_sigma)
+            os.makedirs(footprint_cache_dir(), exist_ok=True)
+            _save(arrays, path)
+        npix = arrays['indptr'].size - 1
+        weights = csr_matrix((arrays['data'], arrays['indices'], arrays['indptr']), shape=(npix, npix))
+        _operators[key] = Smoothing_operator(weights)
+    return _operators[key]
+
+
+def install_smoothing(n_sigma=3.):
+    """
+    Have surveys with a smoothing_kernel smooth their reward with a Smoothing_operator rather
+    than with spherical harmonics.
+
+    The smooth_reward method is replaced on the survey base class, so every survey uses it
+    without being rebuilt. smoothing_kernel is taken to be the FWHM in radians, as the
+    surveys store it.
+
+    Parameters
+    ----------
+    n_sigma : float (3.)
+        Where to cut off the kernel, in standard deviations
+
+    Returns
+    -------
+    installed : bool
+        False if the surveys have no smooth_reward to replace
+    """
+    owners = [cls for cls in _blob_class().__mro__ if 'smooth_reward' in cls.__dict__]
+    if len(owners) == 0:
+        warnings.warn('No smooth_reward found on the surveys, smoothing is unchanged')
+        return False
+    cls = owners[-1]
+    if (cls, 'smooth_reward') in _originals:
+        return True
+    original = cls.__dict__['smooth_reward']
+
+    def smooth_reward(self):
+        if np.size(self.reward) != 12*self.nside**2:
+            return original(self)
+        operator = smoothing_operator(self.nside, self.smoothing_kernel, n_sigma=n_sigma)
+        self.reward_smooth = operator(self.reward)
+        self.reward = self.reward_smooth
+
+    _originals[(cls, 'smooth_reward')] = original
+    cls.smooth_reward = smooth_reward
+    return True
+
+
+def uninstall_smoothing():
+    """Put back the spherical harmonic smoothing
+    """
+    for (cls, name) in _originals:
+        setattr(cls, name, _originals[(cls, name)])
+    _originals.clear()
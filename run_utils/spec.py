@@ -0,0 +1,213 @@
+import numpy as np
+import copy
+import hashlib
+import importlib
+import json
+import os
+import pickle
+import time
+from .footprint_cache import footprint_cache_dir, _package_versions
+
+__all__ = ['read_spec', 'compile_spec', 'load_surveys', 'sum_maps']
+
+# Short names that can start a dotted path in a spec
+_aliases = {'bf': 'lsst.sims.featureScheduler.basis_functions',
+            'surveys': 'lsst.sims.featureScheduler.surveys',
+            'detailers': 'lsst.sims.featureScheduler.detailers',
+            'utils': 'lsst.sims.featureScheduler.utils',
+            'np': 'numpy'}
+
+
+def sum_maps(maps):
+    """Total of all the maps in a dict, e.g., the all_footprints_sum of a set of footprints
+    """
+    return np.sum([np.sum(maps[key]) for key in maps])
+
+
+def _resolve(path):
+    """Import a dotted path like bf.M5_diff_basis_function
+    """
+    parts = path.split('.')
+    if parts[0] in _aliases:
+        parts = _aliases[parts[0]].split('.') + parts[1:]
+    for i in range(len(parts)-1, 0, -1):
+        try:
+            module = importlib.import_module('.'.join(parts[:i]))
+        except ImportError:
+            continue
+        result = module
+        for part in parts[i:]:
+            result = getattr(result, part)
+        return result
+    raise ImportError('Could not import %s' % path)
+
+
+def _build(node, env):
+    """
+    Turn one node of a spec into objects.
+
+    Strings starting with $ are variables. Mappings with one of these keys are special:
+
+    call : dotted path of a function or class to call with args and kwargs, then take item
+    survey : a survey class, called with the basis functions and weights listed in bfs
+        ([[basis_function, weight], ...]) and kwargs
+    ref : a variable, then take item
+    object : dotted path of something to use as it is (e.g., a function to pass to another)
+    format : a %-format string, filled in with args
+    foreach : mapping of variable: list of values, looped over together, building do for each
+        and giving a list
+
+    Anything else is built recursively.
+    """
+    if isinstance(node, str) and node.startswith('$'):
+        name = node[1:]
+        if name not in env:
+            raise KeyError('Undefined spec variable %s' % node)
+        return env[name]
+    if isinstance(node, list):
+        return [_build(val, env) for val in node]
+    if not isinstance(node, dict):
+        return node
+    if 'call' in node:
+        func = _resolve(node['call'])
+        result = func(*_build(node.get('args', []), env), **_build(node.get('kwargs', {}), env))
+    elif 'survey' in node:
+        cls = _resolve(node['survey'])
+        bfs = _build(node.get('bfs', []), env)
+        result = cls([val[0] for val in bfs], [val[1] for val in bfs], **_build(node.get('kwargs', {}), env))
+    elif 'ref' in node:
+        result = env[node['ref']]
+    elif 'object' in node:
+        result = _resolve(node['object'])
+    elif 'format' in node:
+        result = node['format'] % tuple(_build(node.get('args', []), env))
+    elif 'foreach' in node:
+        loop = _build(node['foreach'], env)
+        names = list(loop.keys())
+        result = []
+        for values in zip(*[loop[name] for name in names]):
+            loop_env = dict(env)
+            loop_env.update(dict(zip(names, values)))
+            result.append(_build(node['do'], loop_env))
+        return result
+    else:
+        return dict([(key, _build(node[key], env)) for key in node])
+    if 'item' in node:
+        result = result[_build(node['item'], env)]
+    return result
+
+
+def _flatten(items):
+    result = []
+    for item in items:
+        if isinstance(item, list):
+            result.extend(_flatten(item))
+        else:
+            result.append(item)
+    return result
+
+
+def read_spec(filename, overrides=None):
+    """
+    Read an experiment spec from a YAML (or JSON) file.
+
+    Parameters
+    ----------
+    filename : str
+    overrides : dict (None)
+        Values to replace in the spec's vars, e.g., from the command line
+
+    Returns
+    -------
+    spec : dict
+    """
+    with open(filename) as f:
+        if filename.endswith('.json'):
+            spec = json.load(f)
+        else:
+            import yaml
+            spec = yaml.safe_load(f)
+    if overrides:
+        spec = copy.deepcopy(spec)
+        spec.setdefault('vars', {})
+        for key in overrides:
+            if key not in spec['vars'] and key not in spec:
+                raise KeyError('%s is not a var of %s' % (key, filename))
+            if key in spec['vars']:
+                spec['vars'][key] = overrides[key]
+            else:
+                spec[key] = overrides[key]
+    return spec
+
+
+def compile_spec(spec):
+    """
+    Build the surveys an experiment spec describes.
+
+    A spec has:
+
+    name : used for the output file names
+    nside : int
+    vars : mapping of name: node, built in order, each available as $name to the ones after it
+        and to the tiers. nside is available as $nside.
+    tiers : list of lists of nodes, each of which builds a survey or a list of surveys
+
+    Parameters
+    ----------
+    spec : dict
+
+    Returns
+    -------
+    tiers : list of lists of surveys, ready for Core_scheduler
+    """
+    env = {'nside': spec.get('nside', 32)}
+    for name in spec.get('vars', {}) or {}:
+        env[name] = _build(spec['vars'][name], env)
+    return [_flatten(_build(tier, env)) for tier in spec['tiers']]
+
+
+def _spec_hash(spec):
+    text = _package_versions() + '\n' + json.dumps(spec, sort_keys=True, default=repr)
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def load_surveys(spec, rebuild=False, verbose=True):
+    """
+    Return the surveys for a spec, compiling it only if there isn't a cached copy.
+
+    The compiled tiers are pickled under the footprint cache directory, keyed by a hash of the
+    spec and the installed scheduler version, so repeated launches and sweep points with the
+    same spec just unpickle them. Clear the cache (or pass rebuild=True) after changing the
+    code a spec calls.
+
+    Parameters
+    ----------
+    spec : dict or str
+        The spec, or a file to read it from
+    rebuild : bool (False)
+        Compile even if there is a cached copy
+
+    Returns
+    -------
+    tiers : list of lists of surveys
+    """
+    if isinstance(spec, str):
+        spec = read_spec(spec)
+    t0 = time.time()
+    cache_dir = os.path.join(footprint_cache_dir(), 'specs')
+    path = os.path.join(cache_dir, '%s_%s.pkl' % (spec.get('name', 'spec'), _spec_hash(spec)))
+    if os.path.isfile(path) and not rebuild:
+        with open(path, 'rb') as f:
+            tiers = pickle.load(f)
+        if verbose:
+            print('Loaded compiled surveys from %s in %.2f s' % (path, time.time() - t0))
+        return tiers
+    tiers = compile_spec(spec)
+    os.makedirs(cache_dir, exist_ok=True)
+    temp_file = path + '.tmp%i' % os.getpid()
+    with open(temp_file, 'wb') as f:
+        pickle.dump(tiers, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_file, path)
+    if verbose:
+        print('Compiled surveys in %.2f s, saved to %s' % (time.time() - t0, path))
+    return tiers
@@ -0,0 +1,190 @@
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+__all__ = ['startup_phase', 'startup_phases', 'process_start_time', 'read_importtime',
+           'startup_report', 'write_startup_report', 'profile_startup']
+
+# name: accumulated wall time (s), in the order first seen
+_phases = {}
+# The phases currently running, as [name, time spent in phases inside it]
+_stack = []
+
+
+@contextlib.contextmanager
+def startup_phase(name):
+    """
+    Add the wall time of a block to the startup profile under name.
+
+    Time spent in a phase inside another (e.g., a lazy data set loaded while building the
+    observatory) only counts towards the inner one, so the phases add up to the total. A
+    phase inside one with the same name (e.g., a cached footprint built from another) is
+    just part of the outer one.
+    """
+    if len(_stack) > 0 and _stack[-1][0] == name:
+        yield
+        return
+    _stack.append([name, 0.])
+    t0 = time.time()
+    try:
+        yield
+    finally:
+        elapsed = time.time() - t0
+        inner = _stack.pop()[1]
+        _phases[name] = _phases.get(name, 0.) + elapsed - inner
+        if len(_stack) > 0:
+            _stack[-1][1] += elapsed
+
+
+def startup_phases():
+    """The startup phases timed so far in this process, as a dict of name: seconds
+    """
+    return dict(_phases)
+
+
+def process_start_time():
+    """
+    When this process started, as a unix time, or None if that can't be found (non-linux).
+    """
+    try:
+        with open('/proc/self/stat') as f:
+            # Fields after the command name, starttime is field 22 counting from 1
+            start_ticks = float(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - uptime + start_ticks/os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def read_importtime(text):
+    """
+    Total the output of python -X importtime by top level package.
+
+    Parameters
+    ----------
+    text : str
+        stderr of a process run with -X importtime
+
+    Returns
+    -------
+    imports : dict
+        package: self time (s), e.g., {'lsst': 4.1, 'astropy': 1.9, ...}
+    """
+    imports = {}
+    for line in text.split('\n'):
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3:
+            continue
+        try:
+            self_us = float(parts[0])
+        except ValueError:
+            # The header line
+            continue
+        package = parts[2].strip().split('.')[0]
+        imports[package] = imports.get(package, 0.) + self_us/1e6
+    return imports
+
+
+def startup_report(phases, total=None, imports=None, n_imports=12):
+    """
+    Format a startup profile as a table.
+
+    Parameters
+    ----------
+    phases : dict
+        name: seconds, from startup_phases
+    total : float (None)
+        Wall time from process start to the start of the simulation (s)
+    imports : dict (None)
+        package: seconds, from read_importtime
+    n_imports : int (12)
+        How many of the slowest packages to list
+
+    Returns
+    -------
+    text : str
+    """
+    lines = ['%-40s %10s' % ('startup phase', 'time (s)')]
+    if imports:
+        import_total = sum(imports.values())
+        lines.append('%-40s %10.2f' % ('imports', import_total))
+        for package in sorted(imports, key=imports.get, reverse=True)[:n_imports]:
+            lines.append('%-40s %10.2f' % ('    ' + package, imports[package]))
+    for name in phases:
+        lines.append('%-40s %10.2f' % (name, phases[name]))
+    if total is not None:
+        accounted = sum(phases.values())
+        if imports:
+            accounted += sum(imports.values())
+        lines.append('%-40s %10.2f' % ('everything else', total - accounted))
+        lines.append('%-40s %10.2f' % ('total', total))
+    return '\n'.join(lines)
+
+
+def write_startup_report(t_end=None):
+    """
+    Print the startup profile of this process, and write it as JSON to $FBS_STARTUP_REPORT if
+    that is set (which is how profile_startup gets it back from the script it runs).
+
+    Parameters
+    ----------
+    t_end : float (None)
+        Unix time startup finished. Defaults to now.
+    """
+    if t_end is None:
+        t_end = time.time()
+    t_start = process_start_time()
+    total = None if t_start is None else t_end - t_start
+    print(startup_report(startup_phases(), total=total))
+    report_file = os.environ.get('FBS_STARTUP_REPORT')
+    if report_file:
+        with open(report_file, 'w') as f:
+            json.dump({'phases': startup_phases(), 'total': total}, f)
+
+
+def profile_startup(script, argv=None, python=None):
+    """
+    Run an experiment script up to the start of its simulation and profile where the time went.
+
+    The script is run in a new process with python -X importtime and --startup_profile, so the
+    imports are broken down by package as well as the observatory, footprints and runner setup.
+
+    Parameters
+    ----------
+    script : str
+        Path to the experiment script
+    argv : list of str (None)
+        Command line arguments for the script
+    python : str (None)
+        Python executable. Defaults to this one.
+
+    Returns
+    -------
+    result : dict
+        phases (name: s), imports (package: s) and total (s)
+    """
+    if python is None:
+        python = sys.executable
+    if argv is None:
+        argv = []
+    handle, report_file = tempfile.mkstemp(prefix='fbs_startup_', suffix='.json')
+    os.close(handle)
+    env = dict(os.environ)
+    env['FBS_STARTUP_REPORT'] = report_file
+    proc = subprocess.run([python, '-X', 'importtime', script] + list(argv) + ['--startup_profile'],
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env, universal_newlines=True)
+    if proc.returncode != 0:
+        os.remove(report_file)
+        raise RuntimeError('%s failed:\n%s' % (script, proc.stderr[-2000:]))
+    with open(report_file) as f:
+        result = json.load(f)
+    os.remove(report_file)
+    result['imports'] = read_importtime(proc.stderr)
+    return result
@@ -0,0 +1,198 @@
+import itertools
+import importlib
+import multiprocessing
+import os
+import resource
+import runpy
+import shlex
+import sys
+import time
+import traceback
+from .observatory import preload_observatory
+from .sim_runner import last_run
+
+__all__ = ['expand_grid', 'point_argv', 'read_command_file', 'run_point', 'run_sweep',
+           'write_sweep_report']
+
+# Imported once in the parent process, so forked workers don't have to.
+default_preload = ['numpy', 'healpy', 'lsst.sims.featureScheduler.modelObservatory',
+                   'lsst.sims.featureScheduler.schedulers', 'lsst.sims.featureScheduler.surveys',
+                   'lsst.sims.featureScheduler.basis_functions', 'lsst.sims.featureScheduler.detailers',
+                   'lsst.sims.featureScheduler.utils']
+
+
+def expand_grid(grid):
+    """
+    Expand a parameter grid into a list of points.
+
+    Parameters
+    ----------
+    grid : dict
+        Keys are command line option names (without the leading --), values are lists of
+        values to try. e.g., {'splits': [2, 3, 6], 'scale_down_factor': [0.2, 0.1]}
+
+    Returns
+    -------
+    points : list of dict
+        One dict per combination of values
+    """
+    keys = list(grid.keys())
+    points = [dict(zip(keys, vals)) for vals in itertools.product(*[grid[key] for key in keys])]
+    return points
+
+
+def point_argv(point, extra_args=None):
+    """
+    Turn a grid point into a list of command line arguments.
+    """
+    argv = []
+    for key in point:
+        if point[key] is True:
+            argv.append('--%s' % key)
+        elif point[key] is not False and point[key] is not None:
+            argv.extend(['--%s' % key, str(point[key])])
+    if extra_args is not None:
+        argv.extend(extra_args)
+    return argv
+
+
+def read_command_file(filename):
+    """
+    Read one of the slurm/run_*.script files of 'python script.py --args' lines.
+
+    Returns
+    -------
+    runs : list of tuple
+        (script, argv) for each line
+    """
+    runs = []
+    with open(filename) as f:
+        for line in f:
+            words = shlex.split(line)
+            if len(words) < 2 or words[0].startswith('#'):
+                continue
+            runs.append((words[1], words[2:]))
+    return runs
+
+
+def run_point(script, argv):
+    """
+    Run an experiment script in this process, as if from the command line.
+
+    Parameters
+    ----------
+    script : str
+        Path to the experiment script
+    argv : list of str
+        Command line arguments for the script
+
+    Returns
+    -------
+    result : dict
+        status ('ok' or 'failed'), wall time (s), peak RSS (MB), and the error if it failed.
+        If the script ran sim_runner, also the startup time (s) before the simulation started,
+        the simulation run time (s), number of visits and number of days simulated.
+    """
+    result = {'script': script, 'args': ' '.join(argv), 'status': 'ok', 'error': ''}
+    t0 = time.time()
+    old_argv = sys.argv
+    old_path = list(sys.path)
+    old_modules = set(sys.modules)
+    # Scripts import their neighbors (e.g., generate_ddf), as python does for a script
+    script_dir = os.path.dirname(os.path.abspath(script))
+    sys.argv = [script] + list(argv)
+    sys.path.insert(0, script_dir)
+    try:
+        runpy.run_path(script, run_name='__main__')
+    except SystemExit as err:
+        if err.code not in (None, 0):
+            result['status'] = 'failed'
+            result['error'] = 'exit code %s' % err.code
+    except Exception:
+        result['status'] = 'failed'
+        result['error'] = traceback.format_exc().strip().split('\n')[-1]
+    finally:
+        sys.argv = old_argv
+        sys.path[:] = old_path
+        # Different directories have neighbors with the same name (generate_ddf.py), so
+        # forget the ones this script imported
+        for name in set(sys.modules) - old_modules:
+            filename = getattr(sys.modules[name], '__file__', None)
+            if filename is not None and os.path.dirname(os.path.abspath(filename)) == script_dir:
+                del sys.modules[name]
+    result['wall_time'] = time.time() - t0
+    # ru_maxrss is in kilobytes on linux
+    result['peak_rss'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.
+    if 't_start' in last_run:
+        result['startup_time'] = last_run['t_start'] - t0
+        result['runtime'] = last_run['runtime']
+        result['n_obs'] = last_run['n_obs']
+        result['sim_days'] = last_run['sim_days']
+    return result
+
+
+def _run_point_star(args):
+    return run_point(*args)
+
+
+def write_sweep_report(results, filename):
+    """
+    Write a table of sweep results.
+    """
+    with open(filename, 'w') as f:
+        f.write('status\twall_time(min)\tpeak_rss(MB)\tscript\targs\terror\n')
+        for res in results:
+            f.write('%s\t%.1f\t%.0f\t%s\t%s\t%s\n' % (res['status'], res['wall_time']/60., res['peak_rss'],
+                                                     res['script'], res['args'], res['error']))
+
+
+def run_sweep(runs, n_workers=20, preload=None, observatory_kwargs={'nside': 32}, report_file=None,
+              verbose=True):
+    """
+    Run a set of experiment script invocations in a pool of worker processes.
+
+    The heavy imports are done once in the parent, and each run gets a fresh worker process
+    forked from it, so runs can't leak state into each other. A Model_observatory is also built
+    in the parent, so the workers share its read-only data rather than each loading a copy
+    (see get_observatory).
+
+    Parameters
+    ----------
+    runs : list of tuple
+        (script, argv) pairs, e.g., from read_command_file, or
+        [(script, point_argv(point)) for point in expand_grid(grid)]
+    n_workers : int (20)
+        How many simulations to run at once
+    preload : list of str (None)
+        Modules to import before forking. Defaults to the numpy/healpy/featureScheduler stack.
+    observatory_kwargs : dict ({'nside': 32})
+        kwargs for the Model_observatory to build before forking. None to skip.
+    report_file : str (None)
+        If set, write a table of results here as runs finish.
+    verbose : bool (True)
+        Print a line as each run finishes.
+
+    Returns
+    -------
+    results : list of dict
+        See run_point
+    """
+    if preload is None:
+        preload = default_preload
+    for module in preload:
+        importlib.import_module(module)
+    if observatory_kwargs is not None:
+        preload_observatory(**observatory_kwargs)
+
+    ctx = multiprocessing.get_context('fork')
+    results = []
+    with ctx.Pool(processes=n_workers, maxtasksperchild=1) as pool:
+        for result in pool.imap_unordered(_run_point_star, runs):
+            results.append(result)
+            if verbose:
+                print('%s %.1f min %.0f MB: %s %s %s' % (result['status'], result['wall_time']/60.,
+                                                        result['peak_rss'], result['script'],
+                                                        result['args'], result['error']))
+            if report_file is not None:
+                write_sweep_report(results, report_file)
+    return results
@@ -0,0 +1,158 @@
+import numpy as np
+import time
+import functools
+from .utils import survey_label, iter_surveys
+
+__all__ = ['Timing_stats', 'instrument_scheduler', 'uninstrument']
+
+# Methods to time on each kind of object
+_bf_methods = ['__call__', 'check_feasibility', 'add_observation']
+_survey_methods = ['calc_reward_function', 'generate_observations', 'add_observation']
+_detailer_methods = ['__call__']
+_scheduler_methods = ['update_conditions', 'request_observation', 'add_observation', '_fill_queue']
+
+# (class, method name) -> original function, so the patches can be undone
+_originals = {}
+# id(object) -> list of keys to charge calls on that object to
+_labels = {}
+# Keys currently being timed, so a subclass calling its parent's method isn't counted twice
+_active = set()
+_stats = None
+
+
+class Timing_stats(object):
+    """
+    Accumulate call counts and wall time for a set of keys.
+
+    Keys are tuples of (kind, name, method), e.g., ('basis_function', 'M5_diff_basis_function', '__call__')
+    """
+    def __init__(self):
+        self.calls = {}
+        self.time = {}
+
+    def add(self, key, dt):
+        if key in self.calls:
+            self.calls[key] += 1
+            self.time[key] += dt
+        else:
+            self.calls[key] = 1
+            self.time[key] = dt
+
+    def rows(self):
+        """Return (kind, name, method, calls, total time, time per call) sorted by total time
+        """
+        keys = sorted(self.time.keys(), key=lambda key: self.time[key], reverse=True)
+        result = [key + (self.calls[key], self.time[key], self.time[key]/self.calls[key]) for key in keys]
+        return result
+
+    def write(self, filename):
+        """Write a summary table
+        """
+        with open(filename, 'w') as f:
+            f.write('kind\tname\tmethod\tcalls\ttotal(s)\tper_call(ms)\n')
+            for row in self.rows():
+                f.write('%s\t%s\t%s\t%i\t%.2f\t%.4f\n' % (row[0], row[1], row[2], row[3], row[4], row[5]*1e3))
+
+    def to_info(self, extra_info, max_rows=None):
+        """Add the summary to an extra_info dict, as written to the output database info table
+        """
+        rows = self.rows()
+        if max_rows is not None:
+            rows = rows[:max_rows]
+        for row in rows:
+            extra_info['timing %s %s.%s' % (row[0], row[1], row[2])] = '%i calls, %.2f s' % (row[3], row[4])
+        return extra_info
+
+    def total(self, kind):
+        """Total time for all keys of a kind
+        """
+        return np.sum([self.time[key] for key in self.time if key[0] == kind])
+
+
+def _timed(func, method):
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        keys = _labels.get(id(self))
+        if keys is None or _stats is None:
+            return func(self, *args, **kwargs)
+        active_key = (id(self), method)
+        if active_key in _active:
+            return func(self, *args, **kwargs)
+        _active.add(active_key)
+        t0 = time.perf_counter()
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            dt = time.perf_counter() - t0
+            _active.discard(active_key)
+            for key in keys:
+                _stats.add(key + (method,), dt)
+    return wrapper
+
+
+def _patch(obj, methods, keys):
+    """Patch the methods on the class of obj and register the keys to charge obj's calls to
+    """
+    for cls in type(obj).__mro__:
+        for method in methods:
+            if method in cls.__dict__ and (cls, method) not in _originals:
+                _originals[(cls, method)] = cls.__dict__[method]
+                setattr(cls, method, _timed(cls.__dict__[method], method))
+    _labels.setdefault(id(obj), [])
+    for key in keys:
+        if key not in _labels[id(obj)]:
+            _labels[id(obj)].append(key)
+
+
+def instrument_scheduler(scheduler, stats=None):
+    """
+    Time every basis function, survey, detailer and scheduler tier in a Core_scheduler.
+
+    Methods are patched on the classes (so instances still pickle for checkpoints) and calls
+    are charged by object. Basis functions and detailers are summed by class, surveys by
+    survey name and filters, and the reward calculations of all the surveys in a tier are
+    also summed for the tier.
+
+    Parameters
+    ----------
+    scheduler : Core_scheduler
+    stats : Timing_stats (None)
+        Where to accumulate the timing. A new one is made if None.
+
+    Returns
+    -------
+    stats : Timing_stats
+    """
+    global _stats
+    if stats is None:
+        stats = Timing_stats()
+    _stats = stats
+    _patch(scheduler, _scheduler_methods, [('scheduler', type(scheduler).__name__)])
+    seen = {}
+    for i, survey in iter_surveys(scheduler):
+        label = 'tier %i, %s' % (i, survey_label(survey))
+        # Keep surveys with the same name and filters apart
+        seen[label] = seen.get(label, 0) + 1
+        if seen[label] > 1:
+            label = '%s (%i)' % (label, seen[label])
+        survey_key = ('survey', label)
+        _patch(survey, _survey_methods, [survey_key, ('tier', 'tier %i' % i)])
+        for basis_function in getattr(survey, 'basis_functions', []):
+            # Time the real basis function behind a Shared_basis_function
+            basis_function = getattr(basis_function, '_shared', basis_function)
+            _patch(basis_function, _bf_methods, [('basis_function', type(basis_function).__name__)])
+        for detailer in getattr(survey, 'detailers', []):
+            _patch(detailer, _detailer_methods, [('detailer', type(detailer).__name__)])
+    return stats
+
+
+def uninstrument():
+    """Put back all the original methods and stop timing
+    """
+    global _stats
+    for (cls, method) in _originals:
+        setattr(cls, method, _originals[(cls, method)])
+    _originals.clear()
+    _labels.clear()
+    _active.clear()
+    _stats = None
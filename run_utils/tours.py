@@ -0,0 +1,269 @@
+import numpy as np
+import sys
+import time
+import warnings
+
+__all__ = ['tour_order', 'tour_length', 'install_tour_solver', 'uninstall_tour_solver',
+           'compare_tour_solvers']
+
+# Names the blob surveys call to order their pointings
+_solver_names = ['tsp_convex']
+# (module, name) -> original solver, so install_tour_solver can be undone
+_originals = {}
+
+
+def _distances(points):
+    diff = points[:, np.newaxis, :] - points[np.newaxis, :, :]
+    return np.sqrt(np.sum(diff**2, axis=-1))
+
+
+def tour_length(points, order):
+    """Length of the path visiting points in order (not returning to the start)
+    """
+    steps = np.diff(np.asarray(points, dtype=float)[order], axis=0)
+    return np.sum(np.sqrt(np.sum(steps**2, axis=-1)))
+
+
+def _nearest_neighbor(dist, start):
+    n = dist.shape[0]
+    order = np.empty(n, dtype=int)
+    visited = np.zeros(n, dtype=bool)
+    order[0] = start
+    visited[start] = True
+    for i in range(1, n):
+        order[i] = np.argmin(np.where(visited, np.inf, dist[order[i-1]]))
+        visited[order[i]] = True
+    return order
+
+
+def _two_opt(dist, tour):
+    """
+    The best single segment reversal, as (change in length, i, j) for reversing tour[i+1:j+1].
+    Every pair of edges is tried at once.
+    """
+    a = tour[:-1]
+    b = tour[1:]
+    edge = dist[a, b]
+    delta = dist[a[:, np.newaxis], a] + dist[b[:, np.newaxis], b] - edge[:, np.newaxis] - edge
+    # Only edge pairs that aren't adjacent, each once
+    delta = np.triu(delta, 2)
+    best = np.argmin(delta)
+    i, j = divmod(best, delta.shape[1])
+    return delta[i, j], i, j
+
+
+def _or_opt(dist, tour, seg_len):
+    """
+    The best move of a run of seg_len stops to between two others, possibly reversed, as
+    (change in length, new tour).
+    """
+    m = tour.size
+    starts = np.arange(1, m - seg_len)
+    if starts.size == 0:
+        return 0., tour
+    first = tour[starts]
+    last = tour[starts + seg_len - 1]
+    prev = tour[starts - 1]
+    after = tour[starts + seg_len]
+    removed = dist[prev, first] + dist[last, after] - dist[prev, after]
+    u = tour[:-1]
+    v = tour[1:]
+    base = dist[u, v]
+    forward = dist[u, first[:, np.newaxis]] + dist[last[:, np.newaxis], v] - base
+    backward = dist[u, last[:, np.newaxis]] + dist[first[:, np.newaxis], v] - base
+    added = np.minimum(forward, backward)
+    # Can't insert next to (or inside) the run itself
+    edges = np.arange(m - 1)
+    inside = (edges >= (starts - 1)[:, np.newaxis]) & (edges <= (starts + seg_len - 1)[:, np.newaxis])
+    added[inside] = np.inf
+    delta = added - removed[:, np.newaxis]
+    best = np.argmin(delta)
+    p, q = divmod(best, delta.shape[1])
+    if delta[p, q] >= 0:
+        return 0., tour
+    start = starts[p]
+    seg = tour[start:start + seg_len]
+    if backward[p, q] < forward[p, q]:
+        seg = seg[::-1]
+    rest = np.concatenate([tour[:start], tour[start + seg_len:]])
+    insert = q + 1 if q < start else q + 1 - seg_len
+    return delta[p, q], np.concatenate([rest[:insert], seg, rest[insert:]])
+
+
+def tour_order(points, max_moves=None, time_budget=None, start=None):
+    """
+    Order points for a short path through all of them.
+
+    A nearest neighbor path is improved with 2-opt (segment reversals) and Or-opt (moving
+    runs of 1-3 stops) until neither helps or max_moves have been made. Each step evaluates
+    every possible move at once with numpy. The path is open: a dummy stop at zero distance
+    from everything closes it, so the ends are free to move.
+
+    The result only depends on the points, so a simulation comes out the same on any machine.
+    A time_budget can be set as a safety limit, but then the result depends on CPU speed.
+
+    Parameters
+    ----------
+    points : np.array
+        (n, 2) positions, e.g., the projected x, y of a blob's pointings
+    max_moves : int (None)
+        Most improving moves to make. Defaults to 10 per point.
+    time_budget : float (None)
+        If set, also stop improving the path after this long (seconds)
+    start : int (None)
+        Point to start the nearest neighbor path from. Defaults to the one with the smallest x.
+
+    Returns
+    -------
+    order : np.array
+        Indices into points
+    """
+    points = np.asarray(points, dtype=float)
+    if points.ndim == 1:
+        points = points[:, np.newaxis]
+    n = points.shape[0]
+    if n < 3:
+        return np.arange(n)
+    if max_moves is None:
+        max_moves = 10*n
+    t0 = time.time()
+    dist = np.zeros((n+1, n+1))
+    dist[:n, :n] = _distances(points)
+    tol = 1e-9*np.max(dist)
+    if start is None:
+        start = np.argmin(points[:, 0])
+    tour = np.concatenate([[n], _nearest_neighbor(dist[:n, :n], start), [n]])
+    n_moves = 0
+    improved = True
+    while improved and n_moves < max_moves:
+        if time_budget is not None and (time.time() - t0) > time_budget:
+            break
+        improved = False
+        delta, i, j = _two_opt(dist, tour)
+        if delta < -tol:
+            tour[i+1:j+1] = tour[i+1:j+1][::-1]
+            improved = True
+        else:
+            for seg_len in [1, 2, 3]:
+                delta, new_tour = _or_opt(dist, tour, seg_len)
+                if delta < -tol:
+                    tour = new_tour
+                    improved = True
+                    break
+        n_moves += improved
+    return tour[1:-1]
+
+
+def _blob_module():
+    from lsst.sims.featureScheduler.surveys import Blob_survey
+    return sys.modules[Blob_survey.__module__]
+
+
+def install_tour_solver(max_moves=None, time_budget=None):
+    """
+    Have the blob surveys order their pointings with tour_order.
+
+    The solver the surveys module calls is replaced for this process, so every Blob_survey
+    (and subclass) uses it without being rebuilt, and pickled surveys are unaffected.
+
+    Parameters
+    ----------
+    max_moves : int (None)
+        Most improving moves per tour, see tour_order
+    time_budget : float (None)
+        If set, also stop improving each tour after this long (seconds). Runs are then no
+        longer reproducible from machine to machine.
+
+    Returns
+    -------
+    installed : bool
+        False if the surveys module has no solver to replace
+    """
+    module = _blob_module()
+
+    def solver(points, *args, **kwargs):
+        return tour_order(points, max_moves=max_moves, time_budget=time_budget)
+
+    installed = False
+    for name in _solver_names:
+        if hasattr(module, name):
+            _originals.setdefault((module, name), getattr(module, name))
+            setattr(module, name, solver)
+            installed = True
+    if not installed:
+        warnings.warn('No tour solver found in %s, blob tours are unchanged' % module.__name__)
+    return installed
+
+
+def uninstall_tour_solver():
+    """Put back the original blob tour solver
+    """
+    for (module, name) in _originals:
+        setattr(module, name, _originals[(module, name)])
+    _originals.clear()
+
+
+def _original_solver():
+    module = _blob_module()
+    for name in _solver_names:
+        if (module, name) in _originals:
+            return _originals[(module, name)]
+        if hasattr(module, name):
+            return getattr(module, name)
+    raise ValueError('No tour solver found in %s' % module.__name__)
+
+
+def compare_tour_solvers(sizes=[20, 50, 100, 200, 400], n_trials=20, max_moves=None, time_budget=None,
+                         seed=42, verbose=True):
+    """
+    Compare tour_order to the scheduler's own solver on random blobs.
+
+    Points are scattered uniformly over a disk, like the pointings of a blob projected onto
+    a plane.
+
+    Parameters
+    ----------
+    sizes : list of int ([20, 50, 100, 200, 400])
+        Numbers of points per blob
+    n_trials : int (20)
+        Blobs of each size
+    max_moves : int (None)
+        Passed to tour_order
+    time_budget : float (None)
+        Passed to tour_order
+    seed : int (42)
+    verbose : bool (True)
+        Print a table of the results
+
+    Returns
+    -------
+    results : list of dict
+        For each size, the mean time per tour of each solver (s) and the mean ratio of the
+        path lengths (tour_order/original, less than 1 is better).
+    """
+    original = _original_solver()
+    rng = np.random.RandomState(seed)
+    results = []
+    for size in sizes:
+        times = {'original': 0., 'tour_order': 0.}
+        ratios = []
+        for i in range(n_trials):
+            radius = np.sqrt(rng.uniform(size=size))
+            angle = rng.uniform(0, 2*np.pi, size=size)
+            points = np.array([radius*np.cos(angle), radius*np.sin(angle)]).T
+            t0 = time.time()
+            order_orig = np.asarray(original(points))
+            times['original'] += time.time() - t0
+            t0 = time.time()
+            order_new = tour_order(points, max_moves=max_moves, time_budget=time_budget)
+            times['tour_order'] += time.time() - t0
+            # Some solvers close the loop by repeating the first point
+            order_orig = order_orig[:size]
+            ratios.append(tour_length(points, order_new)/tour_length(points, order_orig))
+        row = {'size': size, 'original_time': times['original']/n_trials,
+               'tour_order_time': times['tour_order']/n_trials, 'length_ratio': np.mean(ratios)}
+        results.append(row)
+        if verbose:
+            print('%5i points: original %.2f ms, tour_order %.2f ms, length ratio %.3f' %
+                  (size, row['original_time']*1e3, row['tour_order_time']*1e3, row['length_ratio']))
+    return results
@@ -0,0 +1,59 @@
+import numpy as np
+
+__all__ = ['survey_label', 'iter_surveys', 'full_sky_call']
+
+
+def survey_label(survey):
+    """A readable name for a survey object, with its filters if the name doesn't give them
+    """
+    name = getattr(survey, 'survey_name', '')
+    if name == '' or name is None:
+        name = getattr(survey, 'survey_note', None)
+    if name == '' or name is None:
+        name = type(survey).__name__
+    filters = getattr(survey, 'filtername', None)
+    if filters is None:
+        filters = ''.join([filtername for filtername in [getattr(survey, 'filtername1', None),
+                                                         getattr(survey, 'filtername2', None)]
+                           if filtername is not None])
+    if isinstance(filters, str) and filters != '' and not name.endswith(filters):
+        name = '%s, %s' % (name, filters)
+    return name
+
+
+def iter_surveys(scheduler):
+    """Loop over (tier index, survey) for all the surveys in a Core_scheduler
+    """
+    for i, survey_list in enumerate(scheduler.survey_lists):
+        for survey in survey_list:
+            yield i, survey
+
+
+def full_sky_call(kwargs, nside):
+    """
+    Whether basis function call kwargs ask for the whole sky, so a full-sky value computed
+    without them can be used. Surveys pass indx=all the pixels, which counts.
+
+    Parameters
+    ----------
+    kwargs : dict
+        The kwargs of the call
+    nside : int
+        HEALpix nside of the basis function, None if not known
+    """
+    if len(kwargs) == 0:
+        return True
+    if set(kwargs.keys()) != set(['indx']):
+        return False
+    indx = kwargs['indx']
+    if indx is None:
+        return True
+    if nside is None:
+        return False
+    npix = 12*nside**2
+    indx = np.asarray(indx)
+    if indx.size != npix:
+        return False
+    if indx.dtype == bool:
+        return bool(np.all(indx))
+    return bool(np.all(indx == np.arange(npix)))
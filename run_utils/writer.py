@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import os
+import queue
+import sqlite3
+import threading
+from lsst.sims.featureScheduler.utils import schema_converter
+
+__all__ = ['Streaming_writer']
+
+
+class Streaming_writer(object):
+    """
+    Append completed observations to the output database in batches on a background thread.
+
+    Each batch is written in its own transaction, so the database always holds every batch
+    handed over, up to the last one written. The simulation loop only pays for queueing the
+    batch.
+
+    Parameters
+    ----------
+    filename : str
+        The output database
+    delete_past : bool (True)
+        Remove an existing database of the same name before starting
+    n_keep : int (None)
+        When resuming, drop any visits past the first n_keep (written after the checkpoint).
+    max_queue : int (10)
+        Most batches to hold in memory before write() blocks.
+    """
+    def __init__(self, filename, delete_past=True, n_keep=None, max_queue=10):
+        self.filename = filename
+        self.converter = schema_converter()
+        if delete_past and os.path.isfile(filename):
+            os.remove(filename)
+        if n_keep is not None and os.path.isfile(filename):
+            con = sqlite3.connect(filename)
+            try:
+                with con:
+                    con.execute('DELETE FROM SummaryAllProps WHERE rowid > ?', (n_keep,))
+            except sqlite3.OperationalError:
+                # No table yet, nothing to drop
+                pass
+            con.close()
+        self.n_written = 0 if n_keep is None else n_keep
+        self.error = None
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        # sqlite connections can only be used from the thread that made them
+        con = sqlite3.connect(self.filename)
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    break
+                table, data = item
+                if table == 'SummaryAllProps':
+                    df = self.converter.obs2opsim(data)
+                    with con:
+                        df.to_sql(table, con, index=False, if_exists='append')
+                else:
+                    with con:
+                        pd.DataFrame(data).to_sql(table, con, if_exists='replace')
+            except Exception as err:
+                self.error = err
+            finally:
+                self.queue.task_done()
+        con.close()
+
+    def _check(self):
+        if self.error is not None:
+            raise self.error
+
+    def write(self, observations):
+        """
+        Queue a batch of observations to be written.
+
+        Parameters
+        ----------
+        observations : list
+            Completed observations, as accumulated by sim_runner
+        """
+        self._check()
+        if len(observations) == 0:
+            return
+        self.queue.put(('SummaryAllProps', np.array(observations)[:, 0]))
+        self.n_written += len(observations)
+
+    def sync(self):
+        """Wait until everything queued has been written
+        """
+        self.queue.join()
+        self._check()
+
+    def close(self, info=None):
+        """
+        Write the info table (if given), finish writing and stop the background thread.
+        """
+        if info is not None:
+            self.queue.put(('info', info))
+        self.queue.put(None)
+        self.thread.join()
+        self._check()
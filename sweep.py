@@ -0,0 +1,48 @@
+import argparse
+from run_utils import expand_grid, point_argv, read_command_file, run_sweep
+
+
+if __name__ == "__main__":
+    """
+    Run a parameter sweep of an experiment script in a pool of worker processes.
+
+    e.g.,
+    python sweep.py --script rolling/rolling.py --grid splits=2,3,6 --grid scale_down_factor=0.2,0.1 \
+        --args "--outDir rolling"
+    or, to run an existing list of commands:
+    python sweep.py --commands slurm/run_dcr.script
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--script", type=str, default=None, help="Experiment script to sweep")
+    parser.add_argument("--grid", type=str, action='append', default=[],
+                        help="Option and comma separated values, e.g., splits=2,3,6. Can be repeated.")
+    parser.add_argument("--args", type=str, default='', help="Extra arguments passed to every run")
+    parser.add_argument("--commands", type=str, default=None,
+                        help="File of 'python script.py --args' lines to run instead of a grid")
+    parser.add_argument("--n_workers", type=int, default=20)
+    parser.add_argument("--report", type=str, default='sweep_report.txt')
+    parser.add_argument("--no_preload", dest='no_preload', action='store_true',
+                        help="Don't build a shared Model_observatory before forking the workers")
+    parser.set_defaults(no_preload=False)
+    args = parser.parse_args()
+
+    if args.commands is not None:
+        runs = read_command_file(args.commands)
+    else:
+        if args.script is None:
+            raise ValueError('Need either --script or --commands')
+        grid = {}
+        for item in args.grid:
+            key, vals = item.split('=')
+            grid[key] = vals.split(',')
+        extra_args = args.args.split()
+        runs = [(args.script, point_argv(point, extra_args=extra_args)) for point in expand_grid(grid)]
+
+    if args.no_preload:
+        observatory_kwargs = None
+    else:
+        observatory_kwargs = {'nside': 32}
+    results = run_sweep(runs, n_workers=args.n_workers, observatory_kwargs=observatory_kwargs,
+                        report_file=args.report)
+    n_failed = len([res for res in results if res['status'] != 'ok'])
+    print('%i runs, %i failed. Report in %s' % (len(results), n_failed, args.report))
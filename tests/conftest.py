@@ -0,0 +1,97 @@
+import os
+import sys
+import types
+import numpy as np
+import pytest
+
+repo_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..')
+sys.path.insert(0, repo_dir)
+
+# run_utils/__init__ pulls in the scheduler (sim_runner and friends). Most of what is tested
+# here only needs numpy, so without the scheduler installed the modules are imported one by
+# one, skipping the package __init__.
+try:
+    import run_utils
+    have_lsst = True
+except ImportError:
+    have_lsst = False
+    package = types.ModuleType('run_utils')
+    package.__path__ = [os.path.join(repo_dir, 'run_utils')]
+    sys.modules['run_utils'] = package
+
+
+@pytest.fixture(autouse=True)
+def footprint_cache_dir(tmp_path, monkeypatch):
+    """Keep cached footprints, tables and kernels out of the repo"""
+    monkeypatch.setenv('FBS_FOOTPRINT_CACHE', str(tmp_path / 'footprint_cache'))
+    return tmp_path / 'footprint_cache'
+
+
+@pytest.fixture
+def healpix_coords(monkeypatch):
+    """
+    Fill in the coordinate tables from healpy, as lsst.sims.utils._hpid2RaDec would, so the
+    sky index and smoothing can be tested without the sims stack.
+    """
+    hp = pytest.importorskip('healpy')
+    from run_utils import coords
+
+    def table(nside):
+        theta, phi = hp.pix2ang(nside, np.arange(hp.nside2npix(nside)))
+        return {'ra': phi, 'dec': np.pi/2. - theta}
+
+    tables = {}
+    for nside in [4, 8, 16]:
+        tables[nside] = table(nside)
+    monkeypatch.setattr(coords, '_tables', tables)
+    return tables
+
+
+class Survey(object):
+    """
+    The parts of a feature based survey the run_utils wrappers use: basis functions and
+    weights, the observations it ignores, the weighted reward sum over the full sky and passing
+    observations on to its basis functions.
+
+    Parameters
+    ----------
+    basis_functions : list
+    basis_weights : list or np.array (None)
+        Defaults to 1 for every basis function
+    ignore_obs : str (None)
+    nside : int (None)
+        Defaults to the nside of the first basis function
+    """
+    def __init__(self, basis_functions, basis_weights=None, ignore_obs=None, nside=None):
+        self.basis_functions = basis_functions
+        if basis_weights is None:
+            basis_weights = [1.]*len(basis_functions)
+        self.basis_weights = basis_weights
+        self.ignore_obs = ignore_obs
+        if nside is None:
+            nside = getattr(basis_functions[0], 'nside', None)
+        self.nside = nside
+
+    def calc_reward_function(self, conditions):
+        indx = np.arange(12*self.nside**2)
+        reward = 0
+        for basis_function, weight in zip(self.basis_functions, self.basis_weights):
+            reward = reward + basis_function(conditions, indx=indx)*weight
+        return reward
+
+    def add_observation(self, observation, indx=None):
+        for basis_function in self.basis_functions:
+            basis_function.add_observation(observation, indx=indx)
+
+
+class Scheduler(object):
+    """
+    Surveys in tiers, as a Core_scheduler holds them. The first survey goes in a tier of its own
+    and the rest in a second one, so anything looping over the tiers sees more than one.
+    """
+    def __init__(self, surveys):
+        self.survey_lists = [surveys[:1], surveys[1:]]
+
+    @property
+    def surveys(self):
+        return [survey for survey_list in self.survey_lists for survey in survey_list]
@@ -0,0 +1,90 @@
+import numpy as np
+from conftest import Survey, Scheduler
+from run_utils.batch import add_observations
+
+NPIX = 48
+
+
+class Pointing_scheduler(Scheduler):
+    """Adds the Core_scheduler pointing lookup and add_observation"""
+    def __init__(self, surveys, vector_pointing=True):
+        Scheduler.__init__(self, surveys)
+        self.vector_pointing = vector_pointing
+
+    def pointing2hpindx(self, ra, dec, rotSkyPos=None):
+        if np.size(ra) > 1:
+            if not self.vector_pointing:
+                raise TypeError('one pointing at a time')
+            return [self.pointing2hpindx(r, d) for r, d in zip(ra, dec)]
+        center = int(ra*7 + dec*3) % NPIX
+        return np.arange(center, center + 4) % NPIX
+
+    def add_observation(self, observation):
+        indx = self.pointing2hpindx(observation['RA'], observation['dec'], rotSkyPos=observation['rotSkyPos'])
+        for survey in self.surveys:
+            survey.add_observation(observation, indx=indx)
+
+
+class Filter_counts(object):
+    """Visits per pixel in one filter, and the time of the last visit in any"""
+    def __init__(self, filtername):
+        self.filtername = filtername
+        self.counts = np.zeros(NPIX)
+        self.last_mjd = None
+
+    def add_observation(self, observation, indx=None):
+        if observation['filter'] == self.filtername:
+            self.counts[indx] += 1
+        self.last_mjd = observation['mjd']
+
+
+class Batch_survey(Survey):
+    def add_observations(self, observations, indx=None):
+        for observation, obs_indx in zip(observations, indx):
+            self.add_observation(observation, indx=obs_indx)
+
+
+def observations(n=50, seed=3):
+    rng = np.random.RandomState(seed)
+    obs = np.zeros(n, dtype=[('RA', float), ('dec', float), ('rotSkyPos', float), ('mjd', float),
+                             ('filter', 'U1')])
+    obs['RA'] = rng.uniform(0, 2*np.pi, n)
+    obs['dec'] = rng.uniform(-np.pi/2, 0, n)
+    obs['mjd'] = 59000. + np.arange(n)/100.
+    obs['filter'] = rng.choice(['g', 'r', 'i'], n)
+    return obs
+
+
+def make_surveys():
+    return [Survey([Filter_counts('g')]), Survey([Filter_counts('r')]), Batch_survey([Filter_counts('i')]),
+            Batch_survey([Filter_counts('r')])]
+
+
+def check_same(vector_pointing):
+    obs = observations()
+    sequential = Pointing_scheduler(make_surveys(), vector_pointing=vector_pointing)
+    for observation in obs:
+        sequential.add_observation(observation)
+    batch = Pointing_scheduler(make_surveys(), vector_pointing=vector_pointing)
+    add_observations(batch, obs[:20])
+    add_observations(batch, obs[20:21])
+    add_observations(batch, obs[21:])
+    for survey_a, survey_b in zip(sequential.surveys, batch.surveys):
+        counts_a = survey_a.basis_functions[0]
+        counts_b = survey_b.basis_functions[0]
+        np.testing.assert_array_equal(counts_a.counts, counts_b.counts)
+        assert counts_a.last_mjd == counts_b.last_mjd
+
+
+def test_batch_matches_sequential():
+    check_same(True)
+
+
+def test_batch_matches_sequential_scalar_pointing():
+    check_same(False)
+
+
+def test_empty_batch():
+    scheduler = Pointing_scheduler(make_surveys())
+    add_observations(scheduler, observations()[:0])
+    assert scheduler.surveys[0].basis_functions[0].last_mjd is None
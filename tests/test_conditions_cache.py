@@ -0,0 +1,74 @@
+import numpy as np
+from run_utils.conditions_cache import Conditions_cache
+
+
+class Counter(object):
+    def __init__(self):
+        self.n = 0
+
+    def __call__(self, value):
+        def compute():
+            self.n += 1
+            return value
+        return compute
+
+
+def test_same_bin_hits():
+    cache = Conditions_cache(tolerance=30.)
+    count = Counter()
+    mjd = 59000.
+    assert cache.get('sky', mjd, count(1)) == 1
+    # 10 s later, same bin
+    assert cache.get('sky', mjd + 10./3600./24., count(2)) == 1
+    assert count.n == 1
+    # A minute later, new bin
+    assert cache.get('sky', mjd + 60./3600./24., count(3)) == 3
+    assert count.n == 2
+
+
+def test_arguments_in_key():
+    cache = Conditions_cache(tolerance=30.)
+    count = Counter()
+    full = cache.get('sky', 59000., count('full'), args=((), {}))
+    subset = cache.get('sky', 59000., count('subset'), args=((), {'indx': np.arange(10)}))
+    other = cache.get('sky', 59000., count('other'), args=((), {'indx': np.arange(5)}))
+    assert (full, subset, other) == ('full', 'subset', 'other')
+    # Arrays are compared by content, not identity
+    assert cache.get('sky', 59000., count('again'), args=((), {'indx': np.arange(10)})) == 'subset'
+    assert cache.get('sky', 59000., count('again'), args=((), {})) == 'full'
+    assert count.n == 3
+
+
+def test_filter_lists_in_key():
+    cache = Conditions_cache()
+    count = Counter()
+    assert cache.get('seeing', 59000., count('ug'), args=((np.ones(3),), {'filters': ['u', 'g']})) == 'ug'
+    assert cache.get('seeing', 59000., count('r'), args=((np.ones(3),), {'filters': ['r']})) == 'r'
+    assert cache.get('seeing', 59000., count('airmass'), args=((np.ones(3)*2,), {'filters': ['r']})) == 'airmass'
+
+
+def test_lru_eviction():
+    cache = Conditions_cache(tolerance=30., maxsize=2)
+    count = Counter()
+    step = 60./3600./24.
+    for i in range(3):
+        cache.get('sky', 59000. + i*step, count(i))
+    assert len(cache.cache) == 2
+    # The oldest bin was dropped, so it is recomputed
+    assert cache.get('sky', 59000., count('new')) == 'new'
+
+
+def test_detach_twice():
+    class Thing(object):
+        def value(self):
+            return 'original'
+
+    thing = Thing()
+    cache = Conditions_cache()
+    cache.patch(thing, 'value', lambda: 'cached')
+    assert thing.value() == 'cached'
+    cache.detach()
+    cache.detach()
+    assert thing.value() == 'original'
+    cache.attach()
+    assert thing.value() == 'cached'
@@ -0,0 +1,41 @@
+import numpy as np
+from conftest import Survey
+from run_utils.dryrun import _footprint_checks
+
+
+class Footprint_basis_function(object):
+    def __init__(self, footprint=None, footprints=None):
+        if footprint is not None:
+            self.footprint = footprint
+        if footprints is not None:
+            self.footprints = footprints
+
+
+def checks(**kwargs):
+    return _footprint_checks(Survey([Footprint_basis_function(**kwargs)]))
+
+
+def test_arrays():
+    assert checks(footprint=np.ones(12)) == []
+    assert checks(footprint=np.zeros(12)) == ['Footprint_basis_function has an empty footprint']
+    assert checks(footprint=np.array([np.nan, 0.])) == ['Footprint_basis_function has an empty footprint']
+
+
+def test_per_filter_dicts_and_lists():
+    assert checks(footprints={'r': np.zeros(12), 'g': np.ones(12)}) == []
+    assert checks(footprints={'r': np.zeros(12), 'g': np.zeros(12)}) == \
+        ['Footprint_basis_function has an empty footprints']
+    assert checks(footprints=[{'r': np.zeros(12)}, {'r': np.ones(12)}]) == []
+    assert len(checks(footprints=[{'r': np.zeros(12)}, {'r': np.zeros(12)}])) == 1
+
+
+def test_structured_array():
+    fp = np.zeros(12, dtype=[('u', float), ('g', float)])
+    assert len(checks(footprint=fp)) == 1
+    fp['g'] = 1.
+    assert checks(footprint=fp) == []
+
+
+def test_not_numeric_skipped():
+    assert checks(footprint=object()) == ['Footprint_basis_function footprint could not be checked']
+    assert checks(footprints={'r': 'north'}) == ['Footprint_basis_function footprints could not be checked']
@@ -0,0 +1,104 @@
+import types
+import numpy as np
+from conftest import Survey, Scheduler
+from run_utils.feature_store import Shared_feature, build_feature_store
+
+NPIX = 48
+
+
+class N_observations(object):
+    """Visits per pixel"""
+    def __init__(self):
+        self.feature = np.zeros(NPIX)
+
+    def add_observation(self, observation, indx=None):
+        self.feature[indx] += 1
+
+
+class Basis_function(object):
+    """Passes every visit to its features, like Base_basis_function"""
+    def __init__(self):
+        self.survey_features = {'N_obs': N_observations()}
+
+    def __call__(self, conditions, indx=None):
+        return self.survey_features['N_obs'].feature
+
+    def add_observation(self, observation, indx=None):
+        for name in self.survey_features:
+            self.survey_features[name].add_observation(observation, indx=indx)
+
+
+class Filter_basis_function(Basis_function):
+    """Only passes on visits in its filter"""
+    def __init__(self, filtername):
+        Basis_function.__init__(self)
+        self.filtername = filtername
+
+    def add_observation(self, observation, indx=None):
+        if observation['filter'] == self.filtername:
+            Basis_function.add_observation(self, observation, indx=indx)
+
+
+def observations(n=30, seed=4):
+    rng = np.random.RandomState(seed)
+    return [{'mjd': 59000. + i/100., 'filter': rng.choice(['g', 'r']), 'pix': rng.choice(NPIX, 3)}
+            for i in range(n)]
+
+
+def run(scheduler):
+    for observation in observations():
+        for survey in scheduler.surveys:
+            survey.add_observation(observation, indx=observation['pix'])
+
+
+def make_scheduler():
+    return Scheduler([Survey([Basis_function(), Filter_basis_function('g')]),
+                      Survey([Basis_function(), Filter_basis_function('r')]),
+                      Survey([Filter_basis_function('g')])])
+
+
+def counts(scheduler):
+    return [bf.survey_features['N_obs'].feature.copy() for survey in scheduler.surveys
+            for bf in survey.basis_functions]
+
+
+def test_identical_features_shared():
+    scheduler = make_scheduler()
+    store = build_feature_store(scheduler, verbose=False)
+    assert store.n_replaced == 5
+    # One for the unfiltered basis functions, one per filter
+    assert len(store.features) == 3
+    first = scheduler.surveys[0].basis_functions[0].survey_features['N_obs']
+    assert isinstance(first, Shared_feature)
+    assert scheduler.surveys[1].basis_functions[0].survey_features['N_obs'] is first
+    assert scheduler.surveys[2].basis_functions[0].survey_features['N_obs'] is \
+        scheduler.surveys[0].basis_functions[1].survey_features['N_obs']
+
+
+def test_owners_filtering_differently_kept_apart():
+    plain = make_scheduler()
+    shared = make_scheduler()
+    build_feature_store(shared, verbose=False)
+    run(plain)
+    run(shared)
+    for count_a, count_b in zip(counts(plain), counts(shared)):
+        np.testing.assert_array_equal(count_b, count_a)
+    g_counts = shared.surveys[0].basis_functions[1].survey_features['N_obs'].feature
+    r_counts = shared.surveys[1].basis_functions[1].survey_features['N_obs'].feature
+    assert np.sum(g_counts) + np.sum(r_counts) == np.sum(shared.surveys[0].basis_functions[0](None))
+
+
+def test_stacked_views():
+    scheduler = make_scheduler()
+    store = build_feature_store(scheduler, verbose=False)
+    assert store.arrays['N_observations'].shape == (3, NPIX)
+    run(scheduler)
+    assert store.check_views() == []
+    feature = scheduler.surveys[0].basis_functions[0].survey_features['N_obs'].feature
+    assert np.shares_memory(feature, store.arrays['N_observations'])
+
+
+def test_ignore_obs_kept_apart():
+    scheduler = Scheduler([Survey([Basis_function()]), Survey([Basis_function()], ignore_obs='DD')])
+    store = build_feature_store(scheduler, verbose=False)
+    assert len(store.features) == 2
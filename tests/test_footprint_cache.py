@@ -0,0 +1,35 @@
+import numpy as np
+from run_utils import footprint_cache
+from run_utils.footprint_cache import cached_footprint, clear_footprint_cache
+
+n_calls = []
+
+
+def goals(nside=4, level=1.):
+    n_calls.append(nside)
+    return {'r': np.ones(12*nside**2)*level, 'g': np.zeros(12*nside**2)}
+
+
+def test_saved_and_copied(footprint_cache_dir):
+    del n_calls[:]
+    first = cached_footprint(goals, nside=4)
+    first['r'][:] = 5.
+    second = cached_footprint(goals, 4)
+    np.testing.assert_array_equal(second['r'], 1.)
+    clear_footprint_cache()
+    third = cached_footprint(goals, nside=4)
+    np.testing.assert_array_equal(third['r'], 1.)
+    assert n_calls == [4]
+    assert len(list(footprint_cache_dir.iterdir())) == 1
+    cached_footprint(goals, nside=4, level=2.)
+    assert n_calls == [4, 4]
+
+
+def test_versions_in_key(monkeypatch):
+    key = footprint_cache._cache_key(goals, (), {'nside': 4})
+    assert 'cache format' in footprint_cache._package_versions()
+    monkeypatch.setattr(footprint_cache, '_versions', footprint_cache._package_versions() + '\nhealpy 0.0')
+    assert footprint_cache._cache_key(goals, (), {'nside': 4}) != key
+    monkeypatch.setattr(footprint_cache, '_versions', None)
+    monkeypatch.setattr(footprint_cache, '_cache_version', footprint_cache._cache_version + 1)
+    assert footprint_cache._cache_key(goals, (), {'nside': 4}) != key
@@ -0,0 +1,147 @@
+import types
+import numpy as np
+import pytest
+from conftest import Survey, Scheduler
+from run_utils.incremental import reward_kind, incremental_rewards, Cached_reward_terms
+
+NSIDE = 2
+NPIX = 12*NSIDE**2
+
+
+class Footprint_basis_function(object):
+    """Changes only with observations"""
+    def __init__(self, seed=0):
+        self.nside = NSIDE
+        self.footprint = np.random.RandomState(seed).uniform(size=NPIX)
+        self.counts = np.zeros(NPIX)
+        self.n_calls = 0
+
+    def __call__(self, conditions, indx=None):
+        self.n_calls += 1
+        value = self.footprint - self.counts/10.
+        if indx is not None:
+            value = value[indx]
+        return value
+
+    def add_observation(self, observation, indx=None):
+        self.counts[observation['pix']] += 1
+
+    def check_feasibility(self, conditions):
+        return True
+
+
+class Map_modulo_basis_function(Footprint_basis_function):
+    """Changes with observations and the night"""
+    def __call__(self, conditions, indx=None):
+        value = Footprint_basis_function.__call__(self, conditions) + (conditions.night % 2)
+        if indx is not None:
+            value = value[indx]
+        return value
+
+
+class Slewtime_basis_function(Footprint_basis_function):
+    """Changes with the conditions"""
+    def __call__(self, conditions, indx=None):
+        value = np.cos(np.arange(NPIX) + conditions.mjd)
+        if indx is not None:
+            value = value[indx]
+        return value
+
+
+def make_scheduler(weights_type=list):
+    surveys = []
+    for i in range(2):
+        bfs = [Footprint_basis_function(i), Slewtime_basis_function(i), Map_modulo_basis_function(i + 5)]
+        surveys.append(Survey(bfs, weights_type([1., 0.5, 2.])))
+    return Scheduler(surveys)
+
+
+def run(scheduler, n_nights=3, n_per_night=4):
+    rewards = []
+    for night in range(n_nights):
+        for j in range(n_per_night):
+            conditions = types.SimpleNamespace(night=night, mjd=59000. + night + j/10.)
+            rewards.append([survey.calc_reward_function(conditions) for survey in scheduler.surveys])
+            observation = {'pix': (night*7 + j*3) % NPIX}
+            for survey in scheduler.surveys:
+                survey.add_observation(observation)
+    return np.array(rewards)
+
+
+def test_kinds():
+    assert reward_kind(Footprint_basis_function()) == 'observations'
+    assert reward_kind(Map_modulo_basis_function()) == 'night'
+    assert reward_kind(Slewtime_basis_function()) == 'conditions'
+    static = Slewtime_basis_function()
+    static.update_on_mjd = False
+    static.update_on_newobs = False
+    assert reward_kind(static) == 'static'
+    bad = Slewtime_basis_function()
+    bad.reward_kind = 'often'
+    with pytest.raises(ValueError):
+        reward_kind(bad)
+
+
+@pytest.mark.parametrize('weights_type', [list, np.array])
+def test_rewards_unchanged(weights_type):
+    plain = make_scheduler(weights_type)
+    cached = make_scheduler(weights_type)
+    terms = incremental_rewards(cached, verbose=False)
+    assert len(terms) == 2
+    for survey in cached.surveys:
+        assert isinstance(survey.basis_functions[0], Cached_reward_terms)
+        assert len(survey.basis_functions) == 2
+        assert type(survey.basis_weights) is type(plain.survey_lists[0][0].basis_weights)
+    np.testing.assert_allclose(run(cached), run(plain), rtol=1e-12)
+    # Recomputed once per observation (and the night changes with one), not per call
+    assert terms[0].calls == 12
+    assert terms[0].evaluations == 12
+    # Applying it again leaves the surveys alone
+    assert len(incremental_rewards(cached, verbose=False)) == 0
+
+
+def test_cached_between_observations():
+    scheduler = make_scheduler()
+    terms = incremental_rewards(scheduler, verbose=False)[0]
+    survey = scheduler.surveys[0]
+    survey.calc_reward_function(types.SimpleNamespace(night=0, mjd=59000.))
+    conditions = types.SimpleNamespace(night=0, mjd=59000.1)
+    survey.calc_reward_function(conditions)
+    assert terms.evaluations == 1
+    # The survey can't change the cached sum in place
+    value = terms(conditions)
+    expected = value.copy()
+    value += 100.
+    np.testing.assert_array_equal(terms(conditions), expected)
+    assert terms.evaluations == 1
+
+
+def test_subset_not_cached():
+    scheduler = make_scheduler()
+    terms = incremental_rewards(scheduler, verbose=False)[0]
+    conditions = types.SimpleNamespace(night=0, mjd=59000.)
+    full = terms(conditions, indx=np.arange(NPIX))
+    subset = terms(conditions, indx=np.arange(5))
+    np.testing.assert_array_equal(subset, full[:5])
+    assert terms.evaluations == 2
+
+
+def test_verify_catches_wrong_kind():
+    scheduler = make_scheduler()
+    # Says it only changes with observations, but changes with the conditions
+    wrong = Slewtime_basis_function()
+    wrong.reward_kind = 'observations'
+    survey = scheduler.surveys[0]
+    survey.basis_functions.append(wrong)
+    survey.basis_weights.append(1.)
+    incremental_rewards(scheduler, verify=True, verbose=False)
+    survey.calc_reward_function(types.SimpleNamespace(night=0, mjd=59000.))
+    with pytest.raises(AssertionError):
+        survey.calc_reward_function(types.SimpleNamespace(night=0, mjd=59000.3))
+
+
+def test_verify_passes():
+    plain = make_scheduler()
+    cached = make_scheduler()
+    incremental_rewards(cached, verify=True, verbose=False)
+    np.testing.assert_allclose(run(cached), run(plain), rtol=1e-12)
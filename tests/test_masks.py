@@ -0,0 +1,154 @@
+import types
+import numpy as np
+import pytest
+from conftest import Survey, Scheduler
+from run_utils.masks import Mask_layer, Fused_mask, fuse_masks
+
+NSIDE = 4
+NPIX = 12*NSIDE**2
+counts = {}
+
+
+class Zenith_shadow_mask_basis_function(object):
+    """Masks the pixels within some distance of a moving zenith"""
+    def __init__(self, width=10):
+        self.nside = NSIDE
+        self.width = width
+        self.n_obs = 0
+
+    def __call__(self, conditions, indx=None):
+        counts[self.width] = counts.get(self.width, 0) + 1
+        value = np.zeros(NPIX)
+        start = int(conditions.mjd*10) % NPIX
+        value[np.arange(start, start + self.width) % NPIX] = np.nan
+        if indx is not None:
+            value = value[indx]
+        return value
+
+    def check_feasibility(self, conditions):
+        return True
+
+    def add_observation(self, observation, indx=None):
+        self.n_obs += 1
+
+
+class Moon_avoidance_basis_function(Zenith_shadow_mask_basis_function):
+    """Returns ones, with NaN near the moon"""
+    def __call__(self, conditions, indx=None):
+        value = np.ones(NPIX)
+        value[(np.arange(NPIX) % 13) == int(conditions.mjd) % 13] = np.nan
+        if indx is not None:
+            value = value[indx]
+        return value
+
+
+class M5_diff_basis_function(Zenith_shadow_mask_basis_function):
+    """Not a mask, some reward"""
+    def __call__(self, conditions, indx=None):
+        value = np.cos(np.arange(NPIX) + conditions.mjd)
+        if indx is not None:
+            value = value[indx]
+        return value
+
+
+def make_scheduler(weights_type=list):
+    surveys = []
+    for width in [10, 10, 20]:
+        bfs = [M5_diff_basis_function(), Zenith_shadow_mask_basis_function(width), Moon_avoidance_basis_function()]
+        surveys.append(Survey(bfs, weights_type([1., 0., 0.])))
+    return Scheduler(surveys)
+
+
+@pytest.fixture(autouse=True)
+def reset_counts():
+    counts.clear()
+
+
+@pytest.mark.parametrize('weights_type', [list, np.array])
+def test_rewards_unchanged(weights_type):
+    plain = make_scheduler(weights_type)
+    fused = make_scheduler(weights_type)
+    layer = fuse_masks(fused, verbose=False)
+    # The two width 10 zenith masks are the same mask
+    assert len(layer.masks) == 3
+    for survey in fused.surveys:
+        assert len(survey.basis_functions) == 2
+        assert isinstance(survey.basis_functions[1], Fused_mask)
+        assert type(survey.basis_weights) is type(plain.survey_lists[0][0].basis_weights)
+        np.testing.assert_array_equal(survey.basis_weights, [1., 0.])
+    for mjd in [59000., 59000.1, 59001.3]:
+        conditions = types.SimpleNamespace(mjd=mjd)
+        for survey_a, survey_b in zip(plain.surveys, fused.surveys):
+            np.testing.assert_array_equal(survey_b.calc_reward_function(conditions),
+                                          survey_a.calc_reward_function(conditions))
+
+
+def test_masks_evaluated_once_per_mjd():
+    scheduler = make_scheduler()
+    layer = fuse_masks(scheduler, verbose=False)
+    for mjd in [59000., 59000.1]:
+        conditions = types.SimpleNamespace(mjd=mjd)
+        for survey in scheduler.surveys:
+            survey.calc_reward_function(conditions)
+            survey.calc_reward_function(conditions)
+    assert layer.calls == 12
+    assert layer.evaluations == 6
+    assert counts == {10: 2, 20: 2}
+
+
+def test_subset_falls_back():
+    scheduler = make_scheduler()
+    layer = fuse_masks(scheduler, verbose=False)
+    fused = scheduler.surveys[0].basis_functions[1]
+    conditions = types.SimpleNamespace(mjd=59000.)
+    full = fused(conditions, indx=np.arange(NPIX))
+    indx = np.arange(0, NPIX, 7)
+    np.testing.assert_array_equal(fused(conditions, indx=indx), full[indx])
+    assert layer.calls == 1
+    # The full sky as a boolean mask counts as the full sky
+    fused(conditions, indx=np.ones(NPIX, dtype=bool))
+    assert layer.calls == 2
+
+
+def test_weighted_mask_not_fused():
+    survey = Survey([M5_diff_basis_function(), Zenith_shadow_mask_basis_function(), Moon_avoidance_basis_function()],
+                    [1., 0.5, 0.])
+    layer = fuse_masks(Scheduler([survey]), verbose=False)
+    assert len(layer.masks) == 1
+    assert isinstance(survey.basis_functions[1], Zenith_shadow_mask_basis_function)
+    assert isinstance(survey.basis_functions[2], Fused_mask)
+    assert survey.basis_weights == [1., 0.5, 0.]
+
+
+def test_fuse_twice():
+    scheduler = make_scheduler()
+    fuse_masks(scheduler, verbose=False)
+    layer = fuse_masks(scheduler, verbose=False)
+    assert len(layer.masks) == 0
+
+
+def test_observations_passed_on():
+    scheduler = make_scheduler()
+    fuse_masks(scheduler, verbose=False)
+    fused = scheduler.surveys[0].basis_functions[1]
+    fused.add_observation({'mjd': 59000.})
+    assert all([basis_function.n_obs == 1 for basis_function in fused.basis_functions])
+    assert fused.check_feasibility(types.SimpleNamespace(mjd=59000.))
+
+
+def test_packed_and_good():
+    layer = Mask_layer()
+    layer.add('zenith', Zenith_shadow_mask_basis_function(10))
+    layer.add('moon', Moon_avoidance_basis_function())
+    conditions = types.SimpleNamespace(mjd=59000.5)
+    keys = ('moon', 'zenith')
+    good = layer.good(conditions, keys)
+    expected = np.isfinite(Zenith_shadow_mask_basis_function(10)(conditions) +
+                           Moon_avoidance_basis_function()(conditions))
+    np.testing.assert_array_equal(good, expected)
+    assert layer.packed(conditions, keys).size == NPIX//8
+    np.testing.assert_array_equal(layer.value(conditions, keys), np.where(expected, 0., np.nan))
+    # Values handed out are copies
+    value = layer.value(conditions, keys)
+    value[:] = 5.
+    assert np.all(layer.value(conditions, keys)[expected] == 0)
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+from run_utils import multires
+from run_utils.multires import degrade_conditions, Coarse_basis_function
+
+hp = pytest.importorskip('healpy')
+
+
+class Conditions(object):
+    """Per-pixel maps and telescope state, updated in place like the scheduler's Conditions"""
+    def __init__(self, nside=8):
+        self.nside = nside
+        self.mjd = 59000.
+        npix = hp.nside2npix(nside)
+        self.slewtime = np.arange(npix, dtype=float)
+        self.skybrightness = {'r': np.arange(npix)*2., 'g': np.arange(npix)*3.}
+        self.tel_alt = 1.
+        self.current_filter = 'r'
+        self.mounted_filters = ['g', 'r', 'i']
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(multires, '_degraded', {})
+
+
+def test_resampled_at_centers():
+    conditions = Conditions()
+    coarse = degrade_conditions(conditions, 4)
+    theta, phi = hp.pix2ang(4, np.arange(hp.nside2npix(4)))
+    centers = hp.ang2pix(8, theta, phi)
+    assert coarse.nside == 4
+    np.testing.assert_array_equal(coarse.slewtime, conditions.slewtime[centers])
+    np.testing.assert_array_equal(coarse.skybrightness['g'], conditions.skybrightness['g'][centers])
+    assert coarse.current_filter == 'r'
+    assert degrade_conditions(conditions, 8) is conditions
+
+
+def test_cached_while_unchanged():
+    conditions = Conditions()
+    assert degrade_conditions(conditions, 4) is degrade_conditions(conditions, 4)
+
+
+@pytest.mark.parametrize('update', ['tel_alt', 'current_filter', 'mounted_filters', 'slewtime', 'skybrightness'])
+def test_same_mjd_changes_seen(update):
+    conditions = Conditions()
+    first = degrade_conditions(conditions, 4)
+    # Same object, same mjd, something else moved on
+    if update == 'tel_alt':
+        conditions.tel_alt = 1.2
+    elif update == 'current_filter':
+        conditions.current_filter = 'g'
+    elif update == 'mounted_filters':
+        conditions.mounted_filters.append('z')
+    elif update == 'slewtime':
+        conditions.slewtime = conditions.slewtime + 1.
+    else:
+        conditions.skybrightness['r'] = conditions.skybrightness['r'] + 1.
+    second = degrade_conditions(conditions, 4)
+    assert second is not first
+    np.testing.assert_array_equal(second.slewtime, degrade_conditions(Conditions(), 4).slewtime +
+                                  (update == 'slewtime'))
+    assert second.mounted_filters == conditions.mounted_filters
+
+
+def test_coarse_basis_function():
+    class Counts_basis_function(object):
+        def __init__(self, nside):
+            self.nside = nside
+            self.counts = np.zeros(hp.nside2npix(nside))
+
+        def __call__(self, conditions, indx=None):
+            return self.counts + conditions.slewtime
+
+        def add_observation(self, observation, indx=None):
+            self.counts[indx] += 1
+
+    coarse = Coarse_basis_function(Counts_basis_function(4), 8)
+    fine_pix = np.array([0, 1, 100])
+    coarse.add_observation({}, indx=fine_pix)
+    parents = hp.ang2pix(4, *hp.pix2ang(8, fine_pix))
+    assert np.sum(coarse.counts) == np.unique(parents).size
+    value = coarse(Conditions())
+    assert value.size == hp.nside2npix(8)
+    assert np.all(value[fine_pix] >= 1)
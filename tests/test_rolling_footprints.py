@@ -0,0 +1,155 @@
+import numpy as np
+import pytest
+from run_utils.rolling_footprints import rolling_footprints, alternating_maps
+
+FILTERS = ['u', 'g', 'r', 'i', 'z', 'y']
+
+
+# The helpers rolling_footprints replaced, as they were in the alt_roll_dust scripts
+
+def slice_wfd_area(nslice, target_map, scale_down_factor=0.2):
+    scale_up_factor = nslice - scale_down_factor*(nslice-1)
+
+    wfd = target_map['r'] * 0
+    wfd_indices = np.where(target_map['r'] == 1)[0]
+    wfd[wfd_indices] = 1
+    wfd_accum = np.cumsum(wfd)
+    split_wfd_indices = np.floor(np.max(wfd_accum)/nslice*(np.arange(nslice)+1)).astype(int)
+    split_wfd_indices = split_wfd_indices.tolist()
+    split_wfd_indices = [0] + split_wfd_indices
+
+    all_scaled_down = {}
+    for filtername in target_map:
+        all_scaled_down[filtername] = target_map[filtername]+0
+        all_scaled_down[filtername][wfd_indices] *= scale_down_factor
+
+    scaled_maps = []
+    for i in range(len(split_wfd_indices)-1):
+        new_map = {}
+        indices = wfd_indices[split_wfd_indices[i]:split_wfd_indices[i+1]]
+        for filtername in all_scaled_down:
+            new_map[filtername] = all_scaled_down[filtername] + 0
+            new_map[filtername][indices] = target_map[filtername][indices]*scale_up_factor
+        scaled_maps.append(new_map)
+
+    return scaled_maps
+
+
+def slice_wfd_area_quad(target_map, scale_down_factor=0.2):
+    nslice = 2
+    scale_up_factor = nslice - scale_down_factor*(nslice-1)
+    nslice2 = nslice * 2
+
+    wfd = target_map['r'] * 0
+    wfd_indices = np.where(target_map['r'] == 1)[0]
+    wfd[wfd_indices] = 1
+    wfd_accum = np.cumsum(wfd)
+    split_wfd_indices = np.floor(np.max(wfd_accum)/nslice2*(np.arange(nslice2)+1)).astype(int)
+    split_wfd_indices = split_wfd_indices.tolist()
+    split_wfd_indices = [0] + split_wfd_indices
+
+    all_scaled_down = {}
+    for filtername in target_map:
+        all_scaled_down[filtername] = target_map[filtername]+0
+        all_scaled_down[filtername][wfd_indices] *= scale_down_factor
+
+    scaled_maps = []
+    for i in range(nslice):
+        new_map = {}
+        indices = wfd_indices[split_wfd_indices[i]:split_wfd_indices[i+1]]
+        for filtername in all_scaled_down:
+            new_map[filtername] = all_scaled_down[filtername] + 0
+            new_map[filtername][indices] = target_map[filtername][indices]*scale_up_factor
+        indices = wfd_indices[split_wfd_indices[i+2]:split_wfd_indices[i+2+1]]
+        for filtername in all_scaled_down:
+            new_map[filtername][indices] = target_map[filtername][indices]*scale_up_factor
+        scaled_maps.append(new_map)
+
+    return scaled_maps
+
+
+def wfd_half(target_map):
+    wfd_pix = np.where(target_map == 1)[0]
+    wfd_map = target_map*0
+    wfd_map[wfd_pix] = 1
+    wfd_halves = slice_wfd_area(2, {'r': wfd_map}, scale_down_factor=0)
+    result = [-wfd_halves[0]['r'], -wfd_halves[1]['r']]
+    return result
+
+
+def target_map(npix=768, seed=11):
+    """Something like standard_goals: WFD of 1 in r, other levels and filters elsewhere"""
+    rng = np.random.RandomState(seed)
+    wfd = np.zeros(npix, dtype=bool)
+    wfd[150:620] = True
+    wfd[rng.choice(npix, 40)] = False
+    result = {}
+    for filtername in FILTERS:
+        level = rng.uniform(0.1, 0.5, npix)
+        level[rng.choice(npix, 30)] = 0.
+        result[filtername] = np.where(wfd, rng.uniform(0.2, 1.), level)
+    result['r'] = np.where(wfd, 1., result['r'])
+    return result
+
+
+def assert_same(footprints, expected):
+    assert len(footprints) == len(expected)
+    for footprint, old in zip(footprints, expected):
+        assert sorted(footprint.keys()) == sorted(old.keys())
+        for filtername in old:
+            np.testing.assert_allclose(footprint[filtername], old[filtername], rtol=1e-12, atol=0)
+
+
+@pytest.mark.parametrize('nslice', [2, 3, 6])
+@pytest.mark.parametrize('scale_down_factor', [0.2, 0.1, 0.5])
+def test_bands_match_slice_wfd_area(nslice, scale_down_factor):
+    goal = target_map()
+    footprints = rolling_footprints(goal, nslice=nslice, scale_down_factor=scale_down_factor, include_full=False)
+    assert_same(footprints, slice_wfd_area(nslice, goal, scale_down_factor=scale_down_factor))
+
+
+@pytest.mark.parametrize('scale_down_factor', [0.2, 0.5])
+def test_quad_matches_slice_wfd_area_quad(scale_down_factor):
+    goal = target_map()
+    footprints = rolling_footprints(goal, nslice=2, pattern='quad', scale_down_factor=scale_down_factor,
+                                    include_full=False)
+    assert_same(footprints, slice_wfd_area_quad(goal, scale_down_factor=scale_down_factor))
+
+
+def test_include_full():
+    goal = target_map()
+    footprints = rolling_footprints(goal, nslice=2)
+    assert len(footprints) == 3
+    for filtername in FILTERS:
+        np.testing.assert_array_equal(footprints[-1][filtername], goal[filtername])
+
+
+def test_totals_kept():
+    goal = target_map()
+    footprints = rolling_footprints(goal, nslice=3, include_full=False)
+    for filtername in FILTERS:
+        total = np.sum([footprint[filtername] for footprint in footprints])
+        np.testing.assert_allclose(total, 3*np.sum(goal[filtername]))
+
+
+def test_shared_views():
+    goal = target_map()
+    footprints = rolling_footprints(goal, nslice=2, dtype=np.float32)
+    stack = footprints.filter_stack('g')
+    assert stack.dtype == np.float32
+    assert np.shares_memory(stack, footprints[0]['g'])
+    for footprint in footprints:
+        for filtername in FILTERS:
+            assert np.shares_memory(footprint[filtername], footprints.array)
+
+
+def test_alternating_maps_match_wfd_half():
+    goal = target_map()
+    maps = alternating_maps(goal['r'], nslice=2)
+    for new, old in zip(maps, wfd_half(goal['r'])):
+        np.testing.assert_array_equal(new, old)
+
+
+def test_bad_pattern():
+    with pytest.raises(ValueError):
+        rolling_footprints(target_map(), pattern='stripes')
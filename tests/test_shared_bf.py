@@ -0,0 +1,112 @@
+import hashlib
+import types
+import numpy as np
+from conftest import Survey, Scheduler
+from run_utils.shared_bf import _fingerprint, share_basis_functions, shared_stats
+
+NSIDE = 2
+NPIX = 12*NSIDE**2
+
+
+def fingerprint(value):
+    hasher = hashlib.sha1()
+    _fingerprint(value, hasher, set())
+    return hasher.hexdigest()
+
+
+class M5_diff_basis_function(object):
+    def __init__(self, filtername='r', footprint=None):
+        self.filtername = filtername
+        self.nside = NSIDE
+        self.footprint = np.ones(NPIX) if footprint is None else footprint
+        self.n_obs = 0
+        self.n_calls = 0
+
+    def __call__(self, conditions, indx=None):
+        self.n_calls += 1
+        value = self.footprint*conditions.mjd + self.n_obs
+        if indx is not None:
+            value = value[indx]
+        return value
+
+    def add_observation(self, observation, indx=None):
+        self.n_obs += 1
+
+
+def test_fingerprint_equal_state():
+    assert fingerprint(M5_diff_basis_function('u')) == fingerprint(M5_diff_basis_function('u'))
+
+
+def test_fingerprint_different_state():
+    base = fingerprint(M5_diff_basis_function('u'))
+    assert fingerprint(M5_diff_basis_function('g')) != base
+    footprint = np.ones(NPIX)
+    footprint[3] = 0.5
+    assert fingerprint(M5_diff_basis_function('u', footprint=footprint)) != base
+    assert fingerprint(M5_diff_basis_function('u', footprint=np.ones(NPIX, dtype=np.float32))) != base
+
+
+def test_fingerprint_containers_and_cycles():
+    a = {'x': [1, 2, (3, 4)], 'y': {5, 6}}
+    b = {'y': {6, 5}, 'x': [1, 2, (3, 4)]}
+    assert fingerprint(a) == fingerprint(b)
+    assert fingerprint({'x': [1, 2, (3, 5)], 'y': {5, 6}}) != fingerprint(a)
+    node = M5_diff_basis_function()
+    node.parent = node
+    fingerprint(node)
+
+
+def test_share_identical():
+    surveys = [Survey([M5_diff_basis_function('u')]) for i in range(3)]
+    surveys.append(Survey([M5_diff_basis_function('g')]))
+    # Sees different observations, so can't share
+    surveys.append(Survey([M5_diff_basis_function('u')], ignore_obs='blob'))
+    sched = Scheduler(surveys)
+    shared = share_basis_functions(sched, verbose=False)
+    assert len(shared) == 1
+    assert shared[0].n_users == 3
+    assert surveys[0].basis_functions[0] is surveys[2].basis_functions[0]
+    assert surveys[3].basis_functions[0] is not surveys[0].basis_functions[0]
+
+
+def test_full_sky_calls_cached():
+    surveys = [Survey([M5_diff_basis_function('u')]) for i in range(3)]
+    sched = Scheduler(surveys)
+    share_basis_functions(sched, verbose=False)
+    conditions = types.SimpleNamespace(mjd=2.)
+    values = [survey.basis_functions[0](conditions, indx=np.arange(NPIX)) for survey in surveys]
+    values.append(surveys[0].basis_functions[0](conditions))
+    for value in values:
+        np.testing.assert_array_equal(value, np.ones(NPIX)*2.)
+    stats = shared_stats(sched)[0]
+    assert stats['calls'] == 4
+    assert stats['evaluations'] == 1
+    # New conditions, new value
+    conditions = types.SimpleNamespace(mjd=3.)
+    np.testing.assert_array_equal(surveys[1].basis_functions[0](conditions, indx=np.arange(NPIX)),
+                                  np.ones(NPIX)*3.)
+    assert shared_stats(sched)[0]['evaluations'] == 2
+
+
+def test_subset_calls_not_cached():
+    surveys = [Survey([M5_diff_basis_function('u')]) for i in range(2)]
+    sched = Scheduler(surveys)
+    share_basis_functions(sched, verbose=False)
+    conditions = types.SimpleNamespace(mjd=2.)
+    surveys[0].basis_functions[0](conditions, indx=np.arange(NPIX))
+    value = surveys[1].basis_functions[0](conditions, indx=np.arange(5))
+    assert value.size == 5
+    assert shared_stats(sched)[0]['evaluations'] == 2
+
+
+def test_observation_added_once():
+    surveys = [Survey([M5_diff_basis_function('u')]) for i in range(3)]
+    sched = Scheduler(surveys)
+    share_basis_functions(sched, verbose=False)
+    observation = {'mjd': 1.}
+    for survey in surveys:
+        survey.basis_functions[0].add_observation(observation)
+    assert surveys[0].basis_functions[0].n_obs == 1
+    # And the cached value moves on with it
+    conditions = types.SimpleNamespace(mjd=2.)
+    np.testing.assert_array_equal(surveys[0].basis_functions[0](conditions), np.ones(NPIX)*2. + 1)
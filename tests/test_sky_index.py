@@ -0,0 +1,122 @@
+import sys
+import types
+import numpy as np
+import pytest
+from run_utils import sky_index
+from run_utils.sky_index import Healpix_index, install_sky_index, uninstall_sky_index
+
+
+def separation(ra1, dec1, ra2, dec2):
+    """Haversine, like lsst.sims.utils._angularSeparation"""
+    term = np.sin((dec2 - dec1)/2.)**2 + np.cos(dec1)*np.cos(dec2)*np.sin((ra2 - ra1)/2.)**2
+    return 2.*np.arcsin(np.sqrt(term))
+
+
+@pytest.fixture
+def fresh_indexes(healpix_coords, monkeypatch):
+    monkeypatch.setattr(sky_index, '_indexes', {})
+    monkeypatch.setattr(sky_index, '_originals', {})
+    return healpix_coords
+
+
+def points(n=20, seed=5):
+    rng = np.random.RandomState(seed)
+    return rng.uniform(0, 2*np.pi, n), np.arcsin(rng.uniform(-1, 1, n))
+
+
+@pytest.mark.parametrize('nside', [4, 16])
+@pytest.mark.parametrize('radius', [0.05, 0.3, 1.2, 3.])
+def test_query_radius_matches_brute_force(fresh_indexes, nside, radius):
+    index = Healpix_index(nside)
+    for ra, dec in zip(*points()):
+        dist = separation(ra, dec, index.ra, index.dec)
+        indx = index.query_radius(ra, dec, radius)
+        assert np.all(np.diff(indx) > 0)
+        assert set(np.where(dist <= radius)[0]) <= set(indx)
+        # Anything extra is only there because of the padding
+        assert np.all(dist[indx] <= radius + 1e-4)
+
+
+def test_pixel_on_edge(fresh_indexes):
+    index = Healpix_index(16)
+    ra, dec = 0.3, -0.4
+    dist = separation(ra, dec, index.ra, index.dec)
+    # Radius exactly to a pixel center, then rounded down a hair
+    radius = np.sort(dist)[30]*(1. - 1e-9)
+    assert np.argsort(dist)[30] in index.query_radius(ra, dec, radius)
+
+
+def test_separations(fresh_indexes):
+    index = Healpix_index(16)
+    for ra, dec in zip(*points(5)):
+        dist = separation(ra, dec, index.ra, index.dec)
+        result = index.separations(ra, dec, 0.4, separation)
+        inside = dist <= 0.4
+        np.testing.assert_array_equal(result[inside], dist[inside])
+        assert np.all((result == np.pi) | (result == dist))
+        np.testing.assert_array_equal(np.where(result <= 0.4)[0], np.where(inside)[0])
+
+
+def test_discs_cached(fresh_indexes):
+    index = Healpix_index(8, max_discs=2)
+    first = index.query_radius(1., 0.2, 0.3)
+    assert index.query_radius(1., 0.2, 0.3) is first
+    index.query_radius(2., 0.2, 0.3)
+    index.query_radius(3., 0.2, 0.3)
+    assert len(index.discs) == 2
+    assert (1., 0.2, 0.3) not in index.discs
+
+
+def test_sky_index_shared(fresh_indexes):
+    assert sky_index.sky_index(8) is sky_index.sky_index(8)
+    assert sky_index.sky_index(8).nside == 8
+
+
+@pytest.fixture
+def blob_module(fresh_indexes, monkeypatch):
+    """A surveys module with a Blob_survey that uses the separations the way the real one does"""
+    module = types.ModuleType('fake_surveys')
+    module._angularSeparation = separation
+
+    class Blob_survey(object):
+        def __init__(self, peak, distance_weight=0):
+            self.nside = 16
+            self.ra = fresh_indexes[16]['ra']
+            self.dec = fresh_indexes[16]['dec']
+            self.search_radius = 0.5
+            self.distance_weight = distance_weight
+            self.peak = peak
+
+        def calc_reward_function(self, conditions):
+            dist = module._angularSeparation(self.peak[0], self.peak[1], self.ra, self.dec)
+            return np.where(dist <= self.search_radius)[0], dist
+
+    Blob_survey.__module__ = module.__name__
+    module.Blob_survey = Blob_survey
+    monkeypatch.setitem(sys.modules, module.__name__, module)
+    monkeypatch.setattr(sky_index, '_blob_class', lambda: Blob_survey)
+    yield module
+    uninstall_sky_index()
+
+
+def test_install_keeps_blobs(blob_module):
+    surveys = [blob_module.Blob_survey((ra, dec)) for ra, dec in zip(*points(5))]
+    before = [survey.calc_reward_function(None) for survey in surveys]
+    assert install_sky_index()
+    assert blob_module._angularSeparation is not separation
+    for survey, (indx, dist) in zip(surveys, before):
+        new_indx, new_dist = survey.calc_reward_function(None)
+        np.testing.assert_array_equal(new_indx, indx)
+        assert np.sum(new_dist == np.pi) > 0
+    # Outside of a blob reward, nothing changes
+    np.testing.assert_array_equal(blob_module._angularSeparation(0., 0., surveys[0].ra, surveys[0].dec),
+                                  separation(0., 0., surveys[0].ra, surveys[0].dec))
+    uninstall_sky_index()
+    assert blob_module._angularSeparation is separation
+
+
+def test_distance_weight_left_alone(blob_module):
+    survey = blob_module.Blob_survey((1., -0.5), distance_weight=1.)
+    install_sky_index()
+    indx, dist = survey.calc_reward_function(None)
+    np.testing.assert_array_equal(dist, separation(1., -0.5, survey.ra, survey.dec))
@@ -0,0 +1,93 @@
+import types
+import numpy as np
+import pytest
+from run_utils.slew_table import Slew_table, slew_table, blob_slew_params, _table_times, _model_params
+
+
+@pytest.fixture(scope='module')
+def table():
+    return slew_table()
+
+
+def test_grid_nodes_exact(table):
+    start_alt, delta_alt, delta_az = table.axes
+    times = _table_times(_model_params, start_alt, delta_alt, delta_az)
+    i, j, k = 7, 40, 13
+    assert table(start_alt[i], start_alt[i] + delta_alt[j], delta_az[k]) == pytest.approx(times[i, j, k])
+    np.testing.assert_array_equal(np.isnan(table.times), np.isnan(times))
+
+
+def test_no_move_is_readtime(table):
+    alt = np.radians([30., 50., 80.])
+    np.testing.assert_allclose(table(alt, alt, 0.), _model_params['readtime'])
+
+
+def test_azimuth_wrap_and_sign(table):
+    start, end = np.radians(40.), np.radians(55.)
+    for delta_az in np.radians([10., 95., 170.]):
+        value = table(start, end, delta_az)
+        assert table(start, end, -delta_az) == pytest.approx(value)
+        assert table(start, end, delta_az + 2.*np.pi) == pytest.approx(value)
+        assert table(start, end, 2.*np.pi - delta_az) == pytest.approx(value)
+
+
+def test_out_of_reach(table):
+    start = np.radians(45.)
+    assert np.isnan(table(start, np.radians(10.), 0.))
+    assert np.isnan(table(start, np.radians(89.), 0.))
+    assert np.isfinite(table(start, np.radians(25.), 0.))
+    # Right up to the limits, where the grid cells have unreachable corners
+    assert np.all(np.isfinite(table(start, np.radians([20.01, 86.49]), np.radians(30.))))
+
+
+def test_monotone(table):
+    delta_az = np.linspace(0, np.pi, 50)
+    times = table(np.radians(50.), np.radians(50.), delta_az)
+    assert np.all(np.diff(times) >= -1e-9)
+    end_alt = np.radians(np.linspace(50., 85., 50))
+    times = table(np.radians(50.), end_alt, 0.)
+    assert np.all(np.diff(times) >= -1e-9)
+
+
+def test_broadcast(table):
+    alt = np.radians(np.linspace(30., 80., 4))
+    result = table(alt[:, np.newaxis], alt[np.newaxis, :], np.radians(20.))
+    assert result.shape == (4, 4)
+    np.testing.assert_allclose(np.diag(result), table(alt, alt, np.radians(20.)))
+
+
+def test_model_params_used():
+    slow = types.SimpleNamespace(telaz_maxspeed_rad=np.radians(1.), telaz_accel_rad=np.radians(1.),
+                                 readtime=3., filter_changetime=100.)
+    with pytest.warns(UserWarning):
+        table = slew_table(slow)
+    default = slew_table()
+    assert table.readtime == 3.
+    assert table.filter_changetime == 100.
+    alt = np.radians(50.)
+    assert table(alt, alt, np.radians(90.)) > default(alt, alt, np.radians(90.))
+
+
+def test_blob_slew_params(table):
+    params = blob_slew_params(table, nside=32)
+    assert sorted(params.keys()) == ['filter_change_approx', 'read_approx', 'slew_approx']
+    assert params['read_approx'] == _model_params['readtime']
+    assert params['filter_change_approx'] == _model_params['filter_changetime']
+    # A one pixel step at nside 32 is under 2 degrees, a few seconds with settling
+    assert _model_params['readtime'] < params['slew_approx'] < 10.
+    assert blob_slew_params(table, nside=16)['slew_approx'] > params['slew_approx']
+
+
+def test_table_interpolates():
+    axis = np.linspace(0., 1., 3)
+    times = np.zeros((3, 3, 3))
+    times[:, :, :] = axis[np.newaxis, np.newaxis, :]*10.
+    table = Slew_table(axis, axis - 0.5, axis, times)
+    assert table(0.5, 0.5, 0.25) == pytest.approx(2.5)
+
+
+def test_missing_model_params_warned():
+    model = types.SimpleNamespace(**dict([(key, value) for key, value in _model_params.items()
+                                          if key != 'domaz_free_range']))
+    with pytest.warns(UserWarning, match='domaz_free_range'):
+        slew_table(model)
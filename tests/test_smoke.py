@@ -0,0 +1,44 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import numpy as np
+import pytest
+
+repo_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..')
+
+
+def _run_baseline(out_dir, *args):
+    pytest.importorskip('lsst.sims.featureScheduler')
+    os.makedirs(str(out_dir), exist_ok=True)
+    subprocess.check_call([sys.executable, os.path.join(repo_dir, 'baseline', 'baselines.py'),
+                           '--survey_length', '1', '--outDir', str(out_dir)] + list(args))
+    filename = os.path.join(str(out_dir), 'baseline_v1.4_0yrs.db')
+    con = sqlite3.connect(filename)
+    visits = np.array(con.execute('SELECT observationStartMJD, fieldRA, fieldDec, filter FROM SummaryAllProps '
+                                  'ORDER BY observationStartMJD').fetchall())
+    con.close()
+    return visits
+
+
+def test_baseline_night(tmp_path):
+    visits = _run_baseline(tmp_path)
+    assert len(visits) > 0
+
+
+def test_shared_and_fused_rewards_unchanged(tmp_path):
+    plain = _run_baseline(tmp_path / 'plain')
+    shared = _run_baseline(tmp_path / 'shared', '--share_bfs', '--fuse_masks')
+    np.testing.assert_array_equal(plain, shared)
+
+
+def test_verified_incremental_rewards(tmp_path):
+    # Raises if any cached reward term changes between observations
+    visits = _run_baseline(tmp_path, '--incremental_rewards', '--verify_rewards')
+    assert len(visits) > 0
+
+
+def test_batch_obs_matches(tmp_path):
+    plain = _run_baseline(tmp_path / 'plain')
+    batch = _run_baseline(tmp_path / 'batch', '--batch_obs')
+    np.testing.assert_array_equal(plain, batch)
@@ -0,0 +1,126 @@
+import numpy as np
+import pytest
+from scipy.sparse import csr_matrix
+from run_utils import smoothing, sky_index
+from run_utils.smoothing import Smoothing_operator, smoothing_operator
+
+
+def separation(ra1, dec1, ra2, dec2):
+    term = np.sin((dec2 - dec1)/2.)**2 + np.cos(dec1)*np.cos(dec2)*np.sin((ra2 - ra1)/2.)**2
+    return 2.*np.arcsin(np.sqrt(np.clip(term, 0, 1)))
+
+
+@pytest.fixture
+def fresh_operators(healpix_coords, monkeypatch):
+    monkeypatch.setattr(smoothing, '_operators', {})
+    monkeypatch.setattr(sky_index, '_indexes', {})
+    return healpix_coords
+
+
+def ring_operator(npix=6):
+    """Each pixel averages itself (weight 2) and its neighbours on a ring (weight 1)"""
+    weights = np.zeros((npix, npix))
+    for i in range(npix):
+        weights[i, i] = 2.
+        weights[i, (i-1) % npix] = 1.
+        weights[i, (i+1) % npix] = 1.
+    return Smoothing_operator(csr_matrix(weights))
+
+
+def test_constant_map():
+    operator = ring_operator()
+    np.testing.assert_allclose(operator(np.ones(6)*3.), np.ones(6)*3.)
+
+
+def test_weighted_average():
+    operator = ring_operator()
+    values = np.arange(6.)
+    expected = (2.*values + np.roll(values, 1) + np.roll(values, -1))/4.
+    np.testing.assert_allclose(operator(values), expected)
+
+
+def test_nan_renormalized():
+    operator = ring_operator()
+    values = np.arange(6.)
+    values[2] = np.nan
+    result = operator(values)
+    assert np.isnan(result[2])
+    # Pixel 1 only averages over 0 and itself, pixel 3 over itself and 4
+    assert result[1] == pytest.approx((0. + 2.*1.)/3.)
+    assert result[3] == pytest.approx((2.*3. + 4.)/3.)
+    assert result[0] == pytest.approx((2.*0. + 5. + 1.)/4.)
+
+
+def test_all_neighbours_masked():
+    weights = csr_matrix(np.array([[1., 1.], [1., 1.]]))
+    result = Smoothing_operator(weights)(np.array([np.nan, np.inf]))
+    assert np.isnan(result[0])
+    assert result[1] == np.inf
+
+
+@pytest.mark.parametrize('nside', [4, 8])
+def test_matches_dense_gaussian(fresh_operators, nside):
+    fwhm = np.radians(20.)
+    sigma = fwhm/np.sqrt(8.*np.log(2.))
+    ra = fresh_operators[nside]['ra']
+    dec = fresh_operators[nside]['dec']
+    dist = separation(ra[:, np.newaxis], dec[:, np.newaxis], ra[np.newaxis, :], dec[np.newaxis, :])
+    dense = np.where(dist <= 3.*sigma, np.exp(-0.5*(dist/sigma)**2), 0.)
+
+    rng = np.random.RandomState(2)
+    values = rng.uniform(size=ra.size)
+    values[rng.choice(ra.size, 10)] = np.nan
+    good = np.isfinite(values)
+    expected = dense.dot(np.where(good, values, 0.))/dense.dot(good.astype(float))
+    expected[~good] = np.nan
+
+    operator = smoothing_operator(nside, fwhm)
+    # The kernel is symmetric
+    np.testing.assert_allclose(operator.weights.toarray(), operator.weights.toarray().T)
+    np.testing.assert_allclose(operator(values), expected, rtol=1e-5, equal_nan=True)
+
+
+def test_saved_and_reloaded(fresh_operators, footprint_cache_dir):
+    operator = smoothing_operator(8, np.radians(10.))
+    assert smoothing_operator(8, np.radians(10.)) is operator
+    assert len(list(footprint_cache_dir.glob('smoothing_nside8_*'))) == 1
+    smoothing._operators.clear()
+    reloaded = smoothing_operator(8, np.radians(10.))
+    assert reloaded is not operator
+    values = np.arange(operator.npix, dtype=float)
+    np.testing.assert_array_equal(reloaded(values), operator(values))
+
+
+def test_install_keeps_reward_smooth(fresh_operators, monkeypatch):
+    class BaseMarkovDF_survey(object):
+        def __init__(self, reward):
+            self.nside = 8
+            self.smoothing_kernel = np.radians(10.)
+            self.reward = reward
+
+        def smooth_reward(self):
+            self.reward_smooth = self.reward*0 + 1.
+            self.reward = self.reward_smooth
+
+    class Blob_survey(BaseMarkovDF_survey):
+        pass
+
+    monkeypatch.setattr(smoothing, '_blob_class', lambda: Blob_survey)
+    monkeypatch.setattr(smoothing, '_originals', {})
+    original = BaseMarkovDF_survey.smooth_reward
+    assert smoothing.install_smoothing()
+    try:
+        reward = np.arange(768, dtype=float)
+        reward[5] = np.nan
+        survey = Blob_survey(reward)
+        survey.smooth_reward()
+        expected = smoothing_operator(8, np.radians(10.))(reward)
+        np.testing.assert_array_equal(survey.reward_smooth, expected)
+        assert survey.reward is survey.reward_smooth
+        # Anything other than a full-sky map goes to the original
+        survey = Blob_survey(3.)
+        survey.smooth_reward()
+        assert survey.reward_smooth == 1.
+    finally:
+        smoothing.uninstall_smoothing()
+    assert BaseMarkovDF_survey.smooth_reward is original
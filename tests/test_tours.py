@@ -0,0 +1,84 @@
+import itertools
+import numpy as np
+import pytest
+from run_utils.tours import tour_order, tour_length, _two_opt, _or_opt, _distances
+
+
+def disk_points(n, seed=42):
+    rng = np.random.RandomState(seed)
+    radius = np.sqrt(rng.uniform(size=n))
+    angle = rng.uniform(0, 2*np.pi, size=n)
+    return np.array([radius*np.cos(angle), radius*np.sin(angle)]).T
+
+
+def open_distances(points):
+    n = points.shape[0]
+    dist = np.zeros((n+1, n+1))
+    dist[:n, :n] = _distances(points)
+    return dist
+
+
+@pytest.mark.parametrize('n', [0, 1, 2, 3, 10, 57, 200])
+def test_permutation(n):
+    order = tour_order(disk_points(n))
+    assert sorted(order) == list(range(n))
+
+
+def test_deterministic():
+    points = disk_points(150)
+    np.testing.assert_array_equal(tour_order(points), tour_order(points))
+
+
+def test_improves_nearest_neighbor():
+    for seed in range(5):
+        points = disk_points(100, seed=seed)
+        nearest = tour_order(points, max_moves=0)
+        improved = tour_order(points)
+        assert tour_length(points, improved) <= tour_length(points, nearest)
+
+
+def test_move_cap():
+    points = disk_points(100)
+    lengths = [tour_length(points, tour_order(points, max_moves=n_moves)) for n_moves in [0, 1, 5, 20, 1000]]
+    assert np.all(np.diff(lengths) <= 1e-12)
+
+
+def test_line():
+    # Points on a line, shuffled. The best open path is just the line.
+    rng = np.random.RandomState(1)
+    x = rng.permutation(30).astype(float)
+    points = np.array([x, np.zeros(30)]).T
+    order = tour_order(points)
+    assert tour_length(points, order) == pytest.approx(29.)
+
+
+def test_local_optimum():
+    points = disk_points(80, seed=7)
+    order = tour_order(points, max_moves=100000)
+    n = points.shape[0]
+    dist = open_distances(points)
+    tol = 1e-9*np.max(dist)
+    tour = np.concatenate([[n], order, [n]])
+    assert _two_opt(dist, tour)[0] >= -tol
+    for seg_len in [1, 2, 3]:
+        assert _or_opt(dist, tour, seg_len)[0] >= -tol
+
+
+def test_or_opt_delta():
+    points = disk_points(40, seed=3)
+    n = points.shape[0]
+    dist = open_distances(points)
+    tour = np.concatenate([[n], np.arange(n), [n]])
+    for seg_len in [1, 2, 3]:
+        delta, new_tour = _or_opt(dist, tour, seg_len)
+        assert sorted(new_tour[1:-1]) == list(range(n))
+        before = np.sum(dist[tour[:-1], tour[1:]])
+        after = np.sum(dist[new_tour[:-1], new_tour[1:]])
+        assert after - before == pytest.approx(delta)
+
+
+def test_near_brute_force():
+    for seed in range(5):
+        points = disk_points(7, seed=seed)
+        best = min([tour_length(points, list(order)) for order in itertools.permutations(range(7))])
+        assert tour_length(points, tour_order(points)) <= best*1.05